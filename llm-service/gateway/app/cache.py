@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import orjson
+import structlog
+from fastapi import Response
+from prometheus_client import Counter, Gauge
+
+logger = structlog.get_logger()
+
+CACHE_HITS = Counter('llm_cache_hits', 'Responses served from the gateway cache', ['model', 'match'])
+CACHE_MISSES = Counter('llm_cache_misses', 'Cacheable requests forwarded to a model', ['model'])
+CACHE_ENTRIES = Gauge('llm_cache_entries', 'Responses held in the gateway cache')
+CACHE_BYTES = Gauge('llm_cache_bytes', 'Response bytes held in the gateway cache')
+
+# Request fields that never change the generated text
+IGNORED_FIELDS = ("prompt", "stream")
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    headers: Dict[str, str]
+    partition: str
+    expires_at: float
+    embedding: Optional[np.ndarray] = None
+
+
+class ResponseCache:
+    """
+    Completion responses shared by every caller of the gateway.
+
+    Entries are keyed by the requested model, the generation parameters and
+    the prompt with whitespace normalized, so identical prompts from different
+    users and tenants hit the same entry. With an embeddings endpoint
+    configured, a miss can also be served by a near-duplicate prompt sent with
+    the same model and parameters. Entries expire after ttl_seconds and are
+    evicted least-recently-used beyond max_entries or max_bytes. Concurrent
+    identical misses share one upstream request.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        embedding_url: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+        similarity_threshold: float = 0.97,
+        embedding_timeout: float = 5.0,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.embedding_url = embedding_url
+        self.embedding_model = embedding_model
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._embedding_client = (
+            httpx.AsyncClient(timeout=embedding_timeout) if embedding_url else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        return " ".join(prompt.split())
+
+    @staticmethod
+    def keys(model: str, payload: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Cache key and partition for a request.
+
+        The partition covers everything but the prompt; only prompts in the same
+        partition may stand in for each other as near-duplicates.
+        """
+        params = {k: v for k, v in payload.items() if k not in IGNORED_FIELDS}
+        partition = hashlib.sha256(orjson.dumps([model, params], option=orjson.OPT_SORT_KEYS)).hexdigest()
+        prompt = ResponseCache.normalize_prompt(payload.get("prompt", ""))
+        key = hashlib.sha256(f"{partition}\n{prompt}".encode()).hexdigest()
+        return key, partition
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        CACHE_ENTRIES.set(len(self._entries))
+        CACHE_BYTES.set(self._bytes)
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of a prompt, or None when embeddings are off or failing."""
+        if self._embedding_client is None:
+            return None
+        try:
+            response = await self._embedding_client.post(
+                self.embedding_url, json={"model": self.embedding_model, "input": text}
+            )
+            response.raise_for_status()
+            vector = np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            logger.warning(f"Embedding lookup failed, using exact cache matches only: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _nearest(self, partition: str, embedding: np.ndarray) -> Optional[CacheEntry]:
+        """The most similar live entry in a partition, if it clears the similarity threshold."""
+        now = time.monotonic()
+        candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.partition == partition and entry.embedding is not None and entry.expires_at >= now
+        ]
+        if not candidates:
+            return None
+        similarities = np.stack([entry.embedding for _, entry in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        key, entry = candidates[best]
+        self._entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _respond(entry: CacheEntry, match: str) -> Response:
+        return Response(
+            content=entry.body,
+            media_type="application/json",
+            headers={**entry.headers, "X-Cache": match}
+        )
+
+    async def get_or_compute(
+        self,
+        model: str,
+        payload: Dict[str, Any],
+        compute: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """
+        Serve a request from the cache, or compute it and cache a successful response.
+
+        Only responses served by the requested model itself are cached; a
+        fallback model's response is returned to the requests waiting on it.
+        """
+        key, partition = self.keys(model, payload)
+
+        while True:
+            entry = self._get(key)
+            if entry is not None:
+                CACHE_HITS.labels(model=model, match="exact").inc()
+                return self._respond(entry, "hit")
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            entry = await asyncio.shield(inflight)
+            if entry is not None:
+                CACHE_HITS.labels(model=model, match="inflight").inc()
+                return self._respond(entry, "hit")
+            # The leading request failed; the first waiter to get here leads the retry
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        entry = None
+        try:
+            embedding = await self._embed(self.normalize_prompt(payload.get("prompt", "")))
+            if embedding is not None:
+                entry = self._nearest(partition, embedding)
+                if entry is not None:
+                    CACHE_HITS.labels(model=model, match="semantic").inc()
+                    return self._respond(entry, "hit-semantic")
+
+            CACHE_MISSES.labels(model=model).inc()
+            response = await compute()
+            if response.status_code == 200:
+                entry = CacheEntry(
+                    body=bytes(response.body),
+                    headers={k: v for k, v in response.headers.items() if k.lower().startswith("x-")},
+                    partition=partition,
+                    expires_at=time.monotonic() + self.ttl_seconds,
+                    embedding=embedding,
+                )
+                # A fallback model's answer is shared with concurrent waiters but not
+                # cached, so it is not served later as the requested model's
+                if response.headers.get("X-Routed-Model", model) == model:
+                    self._store(key, entry)
+            response.headers["X-Cache"] = "miss"
+            return response
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_result(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic": self._embedding_client is not None,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        CACHE_ENTRIES.set(0)
+        CACHE_BYTES.set(0)
+
+    async def aclose(self) -> None:
+        if self._embedding_client is not None:
+            await self._embedding_client.aclose()
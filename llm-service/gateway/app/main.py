@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 import os
 import json
@@ -13,6 +13,10 @@ import prometheus_client
 from prometheus_client import Counter, Histogram, Gauge
 import structlog
 
+from app.cache import ResponseCache
+from app.routing import estimate_tokens, load_router
+from app.upstream import RelayedStream, UpstreamClients
+
 # Initialize logging
 logger = structlog.get_logger()
 
@@ -21,6 +25,9 @@ REQUEST_COUNT = Counter('llm_request_count', 'Count of requests by model and end
 LATENCY = Histogram('llm_request_latency_seconds', 'Latency of requests by model', ['model'])
 MODEL_TOKENS = Counter('llm_tokens_generated', 'Tokens generated by model', ['model'])
 MODEL_LOAD = Gauge('llm_model_loaded', 'Whether a model is currently loaded', ['model'])
+UPSTREAM_IN_FLIGHT = Gauge('llm_upstream_in_flight', 'Requests in flight per model server', ['model'])
+UPSTREAM_HEALTHY = Gauge('llm_upstream_healthy', 'Whether the router considers a model server healthy', ['model'])
+FALLBACK_COUNT = Counter('llm_fallback_count', 'Requests moved to another model', ['model', 'fallback'])
 
 # Initialize the FastAPI app
 app = FastAPI(
@@ -40,17 +47,52 @@ app.add_middleware(
 
 # Environment variables
 MODEL_SERVERS = {
-    server.split(':')[0]: server.split(':')[1] 
+    server.split(':', 1)[0]: server.split(':', 1)[1]
     for server in os.getenv('MODEL_SERVERS', 'llama-7b:http://llama-7b:8000').split(',')
 }
 DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'llama-7b')
 API_KEY = os.getenv('API_KEY', 'default_dev_key')
 MAX_CONCURRENT = int(os.getenv('MAX_CONCURRENT_REQUESTS', '20'))
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '120'))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_MAX_CONNECTIONS', '32'))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv('UPSTREAM_MAX_KEEPALIVE', '16'))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv('UPSTREAM_KEEPALIVE_EXPIRY', '60'))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '5'))
+UPSTREAM_HTTP2 = os.getenv('UPSTREAM_HTTP2', 'true').lower() == 'true'
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+RESPONSE_CACHE_MAX_MB = int(os.getenv('RESPONSE_CACHE_MAX_MB', '64'))
+CACHE_EMBEDDING_URL = os.getenv('CACHE_EMBEDDING_URL')
+CACHE_EMBEDDING_MODEL = os.getenv('CACHE_EMBEDDING_MODEL', 'text-embedding-3-small')
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv('CACHE_SIMILARITY_THRESHOLD', '0.97'))
 
 # Semaphore to limit concurrent requests
 REQUEST_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT)
 
+# Long-lived pooled clients, one per model server
+UPSTREAMS = UpstreamClients(
+    MODEL_SERVERS,
+    max_connections=UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    timeout=REQUEST_TIMEOUT,
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+    http2=UPSTREAM_HTTP2,
+)
+
+# Routing engine driven by config/models.json
+ROUTER = load_router(MODEL_SERVERS)
+
+# Responses to deterministic requests, shared across every caller
+RESPONSE_CACHE = ResponseCache(
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+    embedding_url=CACHE_EMBEDDING_URL,
+    embedding_model=CACHE_EMBEDDING_MODEL,
+    similarity_threshold=CACHE_SIMILARITY_THRESHOLD,
+)
+
 # Models
 class ChatMessage(BaseModel):
     role: str
@@ -64,6 +106,14 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: Optional[int] = 1024
     stream: Optional[bool] = False
     stop: Optional[Union[str, List[str]]] = None
+    # "priority", "load_balance" or "context_length"; used when model is "auto"
+    routing_strategy: Optional[str] = None
+    # Cache the response; defaults to caching only temperature 0 requests
+    cache: Optional[bool] = None
+
+    @property
+    def cacheable(self) -> bool:
+        return self.cache if self.cache is not None else self.temperature == 0
 
 class GenerationRequest(BaseModel):
     model: str = Field(default=DEFAULT_MODEL)
@@ -73,6 +123,14 @@ class GenerationRequest(BaseModel):
     max_tokens: Optional[int] = 1024
     stream: Optional[bool] = False
     stop: Optional[Union[str, List[str]]] = None
+    # "priority", "load_balance" or "context_length"; used when model is "auto"
+    routing_strategy: Optional[str] = None
+    # Cache the response; defaults to caching only temperature 0 requests
+    cache: Optional[bool] = None
+
+    @property
+    def cacheable(self) -> bool:
+        return self.cache if self.cache is not None else self.temperature == 0
 
 class ModelList(BaseModel):
     models: List[str]
@@ -95,33 +153,157 @@ async def verify_api_key(request: Request):
     return api_key
 
 # Utility functions
-async def forward_request(model: str, endpoint: str, json_data: Dict[str, Any], stream: bool = False):
-    """Forward a request to the appropriate model server."""
-    if model not in MODEL_SERVERS:
+def observe_upstream(model: str):
+    """Export an upstream's routing state to Prometheus."""
+    upstream = ROUTER.upstreams[model]
+    UPSTREAM_IN_FLIGHT.labels(model=model).set(upstream.in_flight)
+    UPSTREAM_HEALTHY.labels(model=model).set(1 if upstream.healthy else 0)
+
+def retry_after(error: HTTPException) -> Optional[float]:
+    """
+    Seconds a model server asked callers to back off, if the error says it is busy.
+
+    A 429, or a 503 with Retry-After, is the server shedding load: it is
+    saturated rather than unhealthy.
+    """
+    headers = error.headers or {}
+    if error.status_code == 429 or (error.status_code == 503 and "Retry-After" in headers):
+        try:
+            return float(headers.get("Retry-After", 1))
+        except ValueError:
+            return 1.0
+    return None
+
+async def forward_request(
+    model: str,
+    endpoint: str,
+    json_data: Dict[str, Any],
+    stream: bool = False,
+    strategy: Optional[str] = None,
+):
+    """
+    Route a request to a model server, falling back to other models on failure.
+
+    Candidates come from the router: the requested model and its fallback
+    chain, with saturated or unhealthy servers moved back or skipped. A 5xx,
+    timeout or connection error moves on to the next candidate and counts
+    against the server's health; a busy response (429, or 503 with
+    Retry-After) moves on without affecting health. Streaming
+    requests can only fall back before the first byte has been relayed.
+
+    Non-streaming requests return the upstream JSON body. Streaming requests
+    return a StreamingResponse that relays the upstream SSE body as it arrives
+    and holds the concurrency slot until the stream ends.
+    """
+    try:
+        candidates = ROUTER.candidates(
+            model,
+            prompt_tokens=estimate_tokens(json_data.get("prompt", "")),
+            max_tokens=json_data.get("max_tokens") or 0,
+            strategy=strategy,
+        )
+    except KeyError:
         raise HTTPException(status_code=404, detail=f"Model {model} not found")
-    
-    server_url = MODEL_SERVERS[model]
-    url = f"{server_url}/{endpoint}"
-    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await REQUEST_SEMAPHORE.acquire()
+    handed_off = False
     try:
-        async with REQUEST_SEMAPHORE:
-            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        last_error: Optional[HTTPException] = None
+        for attempt, candidate in enumerate(candidates):
+            if attempt:
+                FALLBACK_COUNT.labels(model=candidates[attempt - 1], fallback=candidate).inc()
+                logger.warning(f"Falling back from {candidates[attempt - 1]} to {candidate}")
+
+            ROUTER.acquire(candidate)
+            observe_upstream(candidate)
+            in_flight = True
+            try:
+                start_time = time.time()
                 if stream:
-                    response = await client.post(url, json=json_data, headers={"Accept": "text/event-stream"})
-                    return response
-                else:
-                    start_time = time.time()
-                    response = await client.post(url, json=json_data)
-                    end_time = time.time()
-                    LATENCY.labels(model=model).observe(end_time - start_time)
-                    
-                    return response.json()
-    except httpx.RequestError as e:
-        logger.error(f"Error forwarding request to {url}: {e}")
-        raise HTTPException(status_code=503, detail=f"Model server {model} is unavailable: {str(e)}")
+                    response = await UPSTREAMS.open_stream(candidate, endpoint, json_data)
+                    ROUTER.record_success(candidate)
+
+                    def on_close(candidate: str = candidate):
+                        ROUTER.release(candidate)
+                        observe_upstream(candidate)
+                        REQUEST_SEMAPHORE.release()
+
+                    in_flight = False
+                    handed_off = True
+                    return RelayedStream(
+                        response,
+                        on_close=on_close,
+                        media_type="text/event-stream",
+                        headers={"X-Routed-Model": candidate}
+                    )
+
+                response = await UPSTREAMS.post(candidate, endpoint, json_data)
+                if response.status_code >= 500 or response.status_code == 429:
+                    upstream_retry_after = response.headers.get("Retry-After")
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=response.text,
+                        headers={"Retry-After": upstream_retry_after} if upstream_retry_after else None
+                    )
+                ROUTER.record_success(candidate)
+                LATENCY.labels(model=candidate).observe(time.time() - start_time)
+
+                return JSONResponse(
+                    content=response.json(),
+                    status_code=response.status_code,
+                    headers={"X-Routed-Model": candidate}
+                )
+            except HTTPException as e:
+                if e.status_code < 500 and retry_after(e) is None:
+                    raise
+                last_error = e
+            except httpx.TimeoutException as e:
+                last_error = HTTPException(status_code=504, detail=f"Model server {candidate} timed out: {str(e)}")
+            except httpx.RequestError as e:
+                last_error = HTTPException(status_code=503, detail=f"Model server {candidate} is unavailable: {str(e)}")
+            finally:
+                if in_flight:
+                    ROUTER.release(candidate)
+
+            backoff = retry_after(last_error)
+            if backoff is not None:
+                # Busy, not failing: try the next candidate without counting a health failure
+                logger.warning(f"Model server {candidate} is busy, retry after {backoff}s")
+                ROUTER.record_saturation(candidate, backoff)
+                observe_upstream(candidate)
+                continue
+
+            logger.error(f"Error forwarding request to {candidate}: {last_error.detail}")
+            ROUTER.record_failure(candidate)
+            observe_upstream(candidate)
+
+        raise last_error or HTTPException(status_code=503, detail="No model server available")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if not handed_off:
+            REQUEST_SEMAPHORE.release()
+
+async def complete(
+    model: str,
+    json_data: Dict[str, Any],
+    stream: bool = False,
+    strategy: Optional[str] = None,
+    cacheable: bool = False,
+):
+    """Forward a completion, serving cacheable non-streaming requests from the response cache."""
+    if stream or not cacheable or not RESPONSE_CACHE.enabled:
+        return await forward_request(model, "completion", json_data, stream=stream, strategy=strategy)
+    return await RESPONSE_CACHE.get_or_compute(
+        model,
+        json_data,
+        lambda: forward_request(model, "completion", json_data, strategy=strategy)
+    )
 
 # Routes
 @app.get("/health")
@@ -142,6 +324,22 @@ async def list_models(_: str = Depends(verify_api_key)):
     """List available models."""
     return ModelList(models=list(MODEL_SERVERS.keys()))
 
+@app.get("/v1/routing")
+async def routing_status(_: str = Depends(verify_api_key)):
+    """Current routing configuration, health and load per model server."""
+    return ROUTER.status()
+
+@app.get("/v1/cache")
+async def cache_status(_: str = Depends(verify_api_key)):
+    """Response cache size and settings."""
+    return RESPONSE_CACHE.stats()
+
+@app.delete("/v1/cache")
+async def clear_cache(_: str = Depends(verify_api_key)):
+    """Drop every cached response."""
+    RESPONSE_CACHE.clear()
+    return {"status": "cleared"}
+
 @app.post("/v1/chat/completions")
 async def chat_completions(
     request: ChatCompletionRequest,
@@ -185,17 +383,14 @@ async def chat_completions(
     
     formatted_request["prompt"] = prompt
     
-    # Handle streaming
-    if request.stream:
-        response = await forward_request(request.model, "completion", formatted_request, stream=True)
-        return StreamingResponse(
-            content=response.aiter_text(),
-            media_type="text/event-stream"
-        )
-    
-    # Non-streaming request
-    response = await forward_request(request.model, "completion", formatted_request)
-    return response
+    # Streaming requests get a StreamingResponse relaying the upstream body
+    return await complete(
+        request.model,
+        formatted_request,
+        stream=request.stream,
+        strategy=request.routing_strategy,
+        cacheable=request.cacheable
+    )
 
 @app.post("/v1/completions")
 async def completions(
@@ -221,17 +416,14 @@ async def completions(
         else:
             formatted_request["stop"] = [request.stop]
     
-    # Handle streaming
-    if request.stream:
-        response = await forward_request(request.model, "completion", formatted_request, stream=True)
-        return StreamingResponse(
-            content=response.aiter_text(),
-            media_type="text/event-stream"
-        )
-    
-    # Non-streaming request
-    response = await forward_request(request.model, "completion", formatted_request)
-    return response
+    # Streaming requests get a StreamingResponse relaying the upstream body
+    return await complete(
+        request.model,
+        formatted_request,
+        stream=request.stream,
+        strategy=request.routing_strategy,
+        cacheable=request.cacheable
+    )
 
 # Startup and shutdown events
 @app.on_event("startup")
@@ -240,12 +432,15 @@ async def startup_event():
     logger.info("Starting up the LLM Gateway...")
     for model in MODEL_SERVERS:
         MODEL_LOAD.labels(model=model).set(1)
+        observe_upstream(model)
     logger.info(f"Loaded models: {list(MODEL_SERVERS.keys())}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run when the server shuts down."""
     logger.info("Shutting down the LLM Gateway...")
+    await UPSTREAMS.aclose()
+    await RESPONSE_CACHE.aclose()
 
 if __name__ == "__main__":
     import uvicorn
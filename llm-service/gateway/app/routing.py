@@ -0,0 +1,220 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+ROUTING_STRATEGIES = ("priority", "load_balance", "context_length")
+
+
+@dataclass
+class UpstreamState:
+    """Health and load of one model server as seen by the gateway."""
+    model: str
+    priority: int
+    context_length: int
+    fallback: Optional[str]
+    max_in_flight: int
+    in_flight: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+    busy_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    @property
+    def available(self) -> bool:
+        """Healthy, or its failure cooldown has passed and it may be retried."""
+        return self.healthy or time.monotonic() >= self.unhealthy_until
+
+    @property
+    def saturated(self) -> bool:
+        """At its in-flight limit, or it recently turned a request away as busy."""
+        return self.in_flight >= self.max_in_flight or time.monotonic() < self.busy_until
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_in_flight
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for routing decisions (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class ModelRouter:
+    """
+    Routes requests across model servers using gateway/config/models.json.
+
+    Implements the config's routing strategies (priority, load_balance,
+    context_length). Tracks in-flight load and health per upstream, so traffic
+    spills to the next model when one is saturated or failing, and falls back
+    along each model's ``fallback`` chain.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        servers: Dict[str, str],
+        default_max_in_flight: int = 4,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+    ):
+        self.servers = servers
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        config = self._load_config(config_path)
+        model_configs = config.get("models", {})
+        self.default_model = config.get("default_model")
+        self.default_strategy = config.get("default_routing_strategy", "priority")
+
+        # Only models with a configured server are routable; servers missing from the
+        # config are routed with defaults so nothing configured via env disappears
+        self.upstreams: Dict[str, UpstreamState] = {}
+        for index, model in enumerate(servers):
+            model_config = model_configs.get(model, {})
+            self.upstreams[model] = UpstreamState(
+                model=model,
+                priority=model_config.get("priority", len(model_configs) + index + 1),
+                context_length=model_config.get("context_length", 4096),
+                fallback=model_config.get("fallback"),
+                max_in_flight=model_config.get("max_in_flight", default_max_in_flight),
+            )
+
+    @staticmethod
+    def _load_config(config_path: str) -> Dict[str, Any]:
+        try:
+            with open(config_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not load model config from {config_path}, using defaults: {e}")
+            return {}
+
+    def _fallback_chain(self, model: str) -> List[str]:
+        """The model followed by its fallbacks, in order, stopping at cycles and unknown models."""
+        chain = []
+        while model in self.upstreams and model not in chain:
+            chain.append(model)
+            model = self.upstreams[model].fallback
+        return chain
+
+    def candidates(
+        self,
+        model: Optional[str],
+        prompt_tokens: int = 0,
+        max_tokens: int = 0,
+        strategy: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Models to try for a request, best first.
+
+        A specific model is tried first, then its fallback chain, then the
+        remaining models in priority order. "auto" (or no model) orders every
+        model by the routing strategy. Models that are unhealthy or cannot fit
+        the request's context are left out; saturated models move to the back.
+        """
+        strategy = strategy or self.default_strategy
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+
+        by_priority = sorted(self.upstreams.values(), key=lambda u: u.priority)
+
+        if model and model != "auto":
+            if model not in self.upstreams:
+                raise KeyError(model)
+            chain = self._fallback_chain(model)
+            ordered = [self.upstreams[m] for m in chain] + [u for u in by_priority if u.model not in chain]
+        elif strategy == "load_balance":
+            ordered = sorted(by_priority, key=lambda u: (u.load, u.priority))
+        elif strategy == "context_length":
+            # Smallest context that fits first, keeping large-context models free for long prompts
+            ordered = sorted(by_priority, key=lambda u: (u.context_length, u.priority))
+        else:
+            ordered = by_priority
+
+        needed = prompt_tokens + max_tokens
+        fitting = [u for u in ordered if u.available and (not needed or u.context_length >= needed)]
+        if not fitting:
+            # Nothing fits or everything is cooling down; let the best-effort order through
+            fitting = [u for u in ordered if u.available] or ordered
+
+        # Spill past saturated upstreams, but keep them as a last resort
+        return [u.model for u in fitting if not u.saturated] + [u.model for u in fitting if u.saturated]
+
+    def acquire(self, model: str) -> None:
+        """Count a request as in flight on a model."""
+        upstream = self.upstreams[model]
+        upstream.in_flight += 1
+        upstream.requests += 1
+
+    def release(self, model: str) -> None:
+        """Count a request on a model as finished."""
+        self.upstreams[model].in_flight -= 1
+
+    def record_success(self, model: str) -> None:
+        upstream = self.upstreams[model]
+        upstream.consecutive_failures = 0
+        if not upstream.healthy:
+            logger.info(f"Upstream {model} recovered")
+        upstream.healthy = True
+
+    def record_failure(self, model: str) -> None:
+        """Count a 5xx, timeout or connection failure; enough in a row take the upstream out of rotation."""
+        upstream = self.upstreams[model]
+        upstream.failures += 1
+        upstream.consecutive_failures += 1
+        if upstream.consecutive_failures >= self.failure_threshold:
+            if upstream.healthy:
+                logger.warning(f"Marking upstream {model} unhealthy for {self.cooldown_seconds}s")
+            upstream.healthy = False
+            upstream.unhealthy_until = time.monotonic() + self.cooldown_seconds
+
+    def record_saturation(self, model: str, retry_after: float) -> None:
+        """
+        Count a busy response (429, or 503 with Retry-After) from a live server.
+
+        The upstream moves to the back of the candidate order until retry_after
+        has passed, but its health is unaffected.
+        """
+        upstream = self.upstreams[model]
+        upstream.busy_until = time.monotonic() + min(retry_after, self.cooldown_seconds)
+
+    def status(self) -> Dict[str, Any]:
+        """Current routing state of every upstream."""
+        return {
+            "default_model": self.default_model,
+            "default_strategy": self.default_strategy,
+            "strategies": list(ROUTING_STRATEGIES),
+            "upstreams": {
+                model: {
+                    "priority": u.priority,
+                    "context_length": u.context_length,
+                    "fallback": u.fallback,
+                    "healthy": u.healthy,
+                    "saturated": u.saturated,
+                    "in_flight": u.in_flight,
+                    "max_in_flight": u.max_in_flight,
+                    "requests": u.requests,
+                    "failures": u.failures,
+                }
+                for model, u in self.upstreams.items()
+            },
+        }
+
+
+def load_router(servers: Dict[str, str]) -> ModelRouter:
+    """Build the router from the environment."""
+    default_config = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "models.json")
+    return ModelRouter(
+        config_path=os.getenv("MODELS_CONFIG", default_config),
+        servers=servers,
+        default_max_in_flight=int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "4")),
+        failure_threshold=int(os.getenv("UPSTREAM_FAILURE_THRESHOLD", "3")),
+        cooldown_seconds=float(os.getenv("UPSTREAM_COOLDOWN_SECONDS", "30")),
+    )
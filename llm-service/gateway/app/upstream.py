@@ -0,0 +1,133 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import anyio
+import httpx
+import structlog
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+logger = structlog.get_logger()
+
+
+class UpstreamClients:
+    """
+    One long-lived HTTP client per upstream model server.
+
+    Each client keeps its own keep-alive pool, so completions reuse open
+    connections instead of paying connection setup per request, and one busy
+    upstream cannot take connections from the others.
+    """
+
+    def __init__(
+        self,
+        servers: Dict[str, str],
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 120.0,
+        connect_timeout: float = 5.0,
+        http2: bool = True,
+    ):
+        self.servers = servers
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def client(self, model: str) -> httpx.AsyncClient:
+        """Get the pooled client for a model's server, creating it on first use."""
+        if model not in self.servers:
+            raise HTTPException(status_code=404, detail=f"Model {model} not found")
+        client = self._clients.get(model)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.servers[model],
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+            )
+            self._clients[model] = client
+        return client
+
+    async def post(self, model: str, endpoint: str, json_data: Dict[str, Any]) -> httpx.Response:
+        """POST to a model server and read the whole response."""
+        return await self.client(model).post(f"/{endpoint}", json=json_data)
+
+    async def open_stream(self, model: str, endpoint: str, json_data: Dict[str, Any]) -> httpx.Response:
+        """
+        POST to a model server and return as soon as response headers arrive.
+
+        The body is left unread; the caller must hand it to a RelayedStream (or
+        close it), which keeps the upstream connection open until the stream ends.
+        """
+        client = self.client(model)
+        request = client.build_request(
+            "POST", f"/{endpoint}", json=json_data, headers={"Accept": "text/event-stream"}
+        )
+        response = await client.send(request, stream=True)
+        if response.status_code >= 400:
+            body = await response.aread()
+            await response.aclose()
+            retry_after = response.headers.get("Retry-After")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=body.decode(errors="ignore"),
+                headers={"Retry-After": retry_after} if retry_after else None
+            )
+        return response
+
+    async def aclose(self) -> None:
+        """Close every upstream client and its pooled connections."""
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()), return_exceptions=True)
+
+
+class RelayedStream(StreamingResponse):
+    """
+    Streams an upstream body to the client, then closes it and calls on_close.
+
+    Cleanup runs when the response finishes, however it finishes, rather than in
+    the body iterator: Starlette cancels the iterator when the client disconnects,
+    which can happen before its first step, and an async generator closed before
+    it started never runs its finally. Cleanup runs at most once.
+    """
+
+    def __init__(
+        self,
+        upstream: httpx.Response,
+        on_close: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ):
+        self.upstream = upstream
+        self.on_close = on_close
+        self._closed = False
+        super().__init__(content=self._relay(), **kwargs)
+
+    async def _relay(self) -> AsyncIterator[bytes]:
+        async for chunk in self.upstream.aiter_raw():
+            yield chunk
+
+    async def aclose(self) -> None:
+        """Close the upstream body and call on_close, once."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            # Shielded, so a cancelled request still returns its connection to the pool
+            with anyio.CancelScope(shield=True):
+                await self.upstream.aclose()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.aclose()
@@ -0,0 +1,81 @@
+"""Unit tests for the gateway response cache."""
+
+import asyncio
+
+from fastapi.responses import JSONResponse
+
+from app.cache import ResponseCache
+
+PAYLOAD = {"prompt": "What is  photosynthesis?", "max_tokens": 64}
+
+
+def response(text: str, routed_model: str, status_code: int = 200) -> JSONResponse:
+    return JSONResponse(
+        content={"text": text},
+        status_code=status_code,
+        headers={"X-Routed-Model": routed_model},
+    )
+
+
+def test_identical_misses_share_one_upstream_request():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return response("answer", "llama-7b")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("llama-7b", PAYLOAD, compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [r.headers["X-Cache"] for r in results].count("miss") == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_waiters_retry_one_at_a_time_after_leader_fails():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            return response("overloaded", "llama-7b", status_code=503)
+        return response("answer", "llama-7b")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("llama-7b", PAYLOAD, compute) for _ in range(3)))
+
+    results = asyncio.run(run())
+    # The leader fails; one waiter leads the retry and the other is served its result
+    assert len(calls) == 2
+    assert sorted(r.status_code for r in results) == [200, 200, 503]
+    assert cache._inflight == {}
+
+
+def test_fallback_response_is_not_cached():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return response("fallback answer", "phi-3")
+
+    async def run():
+        first = await cache.get_or_compute("llama-7b", PAYLOAD, compute)
+        second = await cache.get_or_compute("llama-7b", PAYLOAD, compute)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 2
+    assert second.headers["X-Cache"] == "miss"
+    assert cache.stats()["entries"] == 0
+
+
+def test_whitespace_differences_share_an_entry():
+    assert ResponseCache.keys("llama-7b", PAYLOAD) == ResponseCache.keys(
+        "llama-7b", {**PAYLOAD, "prompt": " What is photosynthesis? "}
+    )
@@ -0,0 +1,175 @@
+"""Unit tests for gateway routing across model servers."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import main
+from app.routing import ModelRouter
+
+MODELS = {
+    "models": {
+        "large": {"priority": 1, "context_length": 8192, "fallback": "medium", "max_in_flight": 2},
+        "medium": {"priority": 2, "context_length": 4096, "fallback": "small", "max_in_flight": 2},
+        "small": {"priority": 3, "context_length": 2048, "fallback": None, "max_in_flight": 2},
+    },
+    "default_model": "large",
+    "default_routing_strategy": "priority",
+}
+
+
+def make_router(tmp_path, models=MODELS, **kwargs) -> ModelRouter:
+    config = tmp_path / "models.json"
+    config.write_text(json.dumps(models))
+    servers = {model: f"http://{model}:8000" for model in models["models"]}
+    return ModelRouter(str(config), servers, **kwargs)
+
+
+@pytest.fixture
+def router(tmp_path):
+    return make_router(tmp_path)
+
+
+def test_requested_model_comes_first_then_its_fallback_chain(router):
+    assert router.candidates("medium") == ["medium", "small", "large"]
+
+
+def test_auto_uses_priority_order(router):
+    assert router.candidates("auto") == ["large", "medium", "small"]
+    assert router.candidates(None) == ["large", "medium", "small"]
+
+
+def test_load_balance_prefers_the_least_loaded(router):
+    router.acquire("large")
+    assert router.candidates("auto", strategy="load_balance") == ["medium", "small", "large"]
+
+
+def test_context_length_prefers_the_smallest_model_that_fits(router):
+    assert router.candidates("auto", strategy="context_length") == ["small", "medium", "large"]
+    assert router.candidates("auto", prompt_tokens=3000, max_tokens=500, strategy="context_length") == [
+        "medium", "large"
+    ]
+
+
+def test_models_that_cannot_fit_the_request_are_left_out(router):
+    assert router.candidates("small", prompt_tokens=5000, max_tokens=1000) == ["large"]
+
+
+def test_best_effort_order_when_nothing_fits(router):
+    assert router.candidates("medium", prompt_tokens=10000) == ["medium", "small", "large"]
+
+
+def test_fallback_cycles_stop(tmp_path):
+    models = {
+        "models": {
+            "a": {"priority": 1, "fallback": "b"},
+            "b": {"priority": 2, "fallback": "a"},
+            "c": {"priority": 3, "fallback": "a"},
+        }
+    }
+    router = make_router(tmp_path, models)
+    assert router.candidates("a") == ["a", "b", "c"]
+    assert router.candidates("c") == ["c", "a", "b"]
+
+
+def test_unknown_model_and_strategy_are_rejected(router):
+    with pytest.raises(KeyError):
+        router.candidates("missing")
+    with pytest.raises(ValueError):
+        router.candidates("auto", strategy="random")
+
+
+def test_saturated_models_move_to_the_back(router):
+    router.acquire("large")
+    router.acquire("large")
+    assert router.candidates("large") == ["medium", "small", "large"]
+
+    router.release("large")
+    assert router.candidates("large") == ["large", "medium", "small"]
+
+
+def test_busy_response_moves_a_model_back_without_affecting_health(router):
+    for _ in range(5):
+        router.record_saturation("large", 30)
+
+    assert router.candidates("large") == ["medium", "small", "large"]
+    assert router.upstreams["large"].healthy
+
+
+def test_repeated_failures_take_a_model_out_until_its_cooldown(tmp_path):
+    router = make_router(tmp_path, failure_threshold=2, cooldown_seconds=0)
+    router.record_failure("large")
+    assert router.upstreams["large"].healthy
+    router.record_failure("large")
+    assert not router.upstreams["large"].healthy
+
+    # A zero cooldown has already passed, so the model may be retried
+    assert "large" in router.candidates("auto")
+    router.record_success("large")
+    assert router.upstreams["large"].healthy
+
+
+def test_unhealthy_models_are_skipped(tmp_path):
+    router = make_router(tmp_path, failure_threshold=1, cooldown_seconds=60)
+    router.record_failure("large")
+    assert router.candidates("large") == ["medium", "small"]
+
+
+class FakeUpstreams:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def post(self, model, endpoint, json_data):
+        self.calls.append(model)
+        return self.responses[model]
+
+
+def test_forward_request_spills_past_a_busy_server_without_marking_it_unhealthy(tmp_path, monkeypatch):
+    router = make_router(tmp_path, failure_threshold=3)
+    upstreams = FakeUpstreams({
+        "large": httpx.Response(503, headers={"Retry-After": "1"}, text="Server busy"),
+        "medium": httpx.Response(200, json={"text": "ok"}),
+    })
+    monkeypatch.setattr(main, "ROUTER", router)
+    monkeypatch.setattr(main, "UPSTREAMS", upstreams)
+
+    for _ in range(4):
+        router.upstreams["large"].busy_until = 0
+        response = asyncio.run(main.forward_request("large", "completion", {"prompt": "hi"}))
+        assert response.headers["X-Routed-Model"] == "medium"
+
+    assert upstreams.calls.count("large") == 4
+    assert router.upstreams["large"].healthy
+    assert router.upstreams["large"].failures == 0
+
+
+def test_forward_request_counts_server_errors_as_failures(tmp_path, monkeypatch):
+    router = make_router(tmp_path, failure_threshold=1, cooldown_seconds=60)
+    upstreams = FakeUpstreams({
+        "large": httpx.Response(500, text="boom"),
+        "medium": httpx.Response(200, json={"text": "ok"}),
+    })
+    monkeypatch.setattr(main, "ROUTER", router)
+    monkeypatch.setattr(main, "UPSTREAMS", upstreams)
+
+    response = asyncio.run(main.forward_request("large", "completion", {"prompt": "hi"}))
+
+    assert response.headers["X-Routed-Model"] == "medium"
+    assert not router.upstreams["large"].healthy
+
+
+def test_forward_request_returns_busy_when_every_server_is_busy(tmp_path, monkeypatch):
+    router = make_router(tmp_path)
+    busy = httpx.Response(429, headers={"Retry-After": "2"}, text="Too many requests")
+    monkeypatch.setattr(main, "ROUTER", router)
+    monkeypatch.setattr(main, "UPSTREAMS", FakeUpstreams({"large": busy, "medium": busy, "small": busy}))
+
+    with pytest.raises(main.HTTPException) as error:
+        asyncio.run(main.forward_request("large", "completion", {"prompt": "hi"}))
+
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "2"
+    assert all(upstream.healthy for upstream in router.upstreams.values())
@@ -0,0 +1,142 @@
+"""Unit tests for relaying streamed completions and releasing their resources."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import main
+from app.routing import ModelRouter
+from app.upstream import RelayedStream
+
+SCOPE = {"type": "http", "method": "POST", "path": "/v1/completions", "headers": []}
+
+
+class UpstreamBody(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+        self.closed = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    async def aclose(self):
+        self.closed += 1
+
+
+def upstream(chunks=(b"data: a\n\n", b"data: b\n\n")):
+    body = UpstreamBody(list(chunks))
+    return httpx.Response(200, stream=body), body
+
+
+async def disconnect_now():
+    return {"type": "http.disconnect"}
+
+
+async def never_disconnect():
+    await asyncio.Event().wait()
+
+
+def test_stream_is_relayed_and_closed_once():
+    response, body = upstream()
+    closes = []
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    stream = RelayedStream(response, on_close=lambda: closes.append(1), media_type="text/event-stream")
+    asyncio.run(stream(SCOPE, never_disconnect, send))
+
+    assert b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body") == b"data: a\n\ndata: b\n\n"
+    assert body.closed == 1
+    assert closes == [1]
+
+
+def test_disconnect_before_the_body_is_read_still_cleans_up():
+    response, body = upstream()
+    closes = []
+
+    async def slow_send(message):
+        # The disconnect is noticed while the headers are still being sent
+        await asyncio.sleep(0.05)
+
+    stream = RelayedStream(response, on_close=lambda: closes.append(1))
+    asyncio.run(stream(SCOPE, disconnect_now, slow_send))
+
+    assert body.read == 0
+    assert body.closed == 1
+    assert closes == [1]
+
+
+def test_cleanup_runs_once_even_if_closed_again():
+    response, body = upstream()
+    closes = []
+    stream = RelayedStream(response, on_close=lambda: closes.append(1))
+
+    async def run():
+        await stream.aclose()
+        await stream.aclose()
+
+    asyncio.run(run())
+
+    assert body.closed == 1
+    assert closes == [1]
+
+
+def test_cleanup_runs_when_sending_fails():
+    response, body = upstream()
+    closes = []
+
+    async def broken_send(message):
+        raise OSError("connection reset")
+
+    stream = RelayedStream(response, on_close=lambda: closes.append(1))
+    # anyio may wrap the error in an exception group
+    with pytest.raises(Exception):
+        asyncio.run(stream(SCOPE, never_disconnect, broken_send))
+
+    assert body.closed == 1
+    assert closes == [1]
+
+
+class StreamingUpstreams:
+    def __init__(self):
+        self.bodies = []
+
+    async def open_stream(self, model, endpoint, json_data):
+        response, body = upstream()
+        self.bodies.append(body)
+        return response
+
+
+def test_early_disconnects_do_not_leak_concurrency_slots(tmp_path, monkeypatch):
+    config = tmp_path / "models.json"
+    config.write_text(json.dumps({"models": {"large": {"priority": 1, "max_in_flight": 4}}}))
+    router = ModelRouter(str(config), {"large": "http://large:8000"})
+    upstreams = StreamingUpstreams()
+    monkeypatch.setattr(main, "ROUTER", router)
+    monkeypatch.setattr(main, "UPSTREAMS", upstreams)
+
+    async def slow_send(message):
+        await asyncio.sleep(0.01)
+
+    async def run():
+        monkeypatch.setattr(main, "REQUEST_SEMAPHORE", asyncio.Semaphore(2))
+        # More disconnects than there are slots: a leaked slot would block here forever
+        for _ in range(5):
+            stream = await asyncio.wait_for(
+                main.forward_request("large", "completion", {"prompt": "hi"}, stream=True), timeout=1
+            )
+            await stream(SCOPE, disconnect_now, slow_send)
+        return main.REQUEST_SEMAPHORE
+
+    semaphore = asyncio.run(run())
+
+    assert semaphore._value == 2
+    assert router.upstreams["large"].in_flight == 0
+    assert [body.closed for body in upstreams.bodies] == [1] * 5
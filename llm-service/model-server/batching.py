@@ -0,0 +1,368 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import structlog
+import torch
+from prometheus_client import Counter, Gauge, Histogram
+from transformers import DynamicCache, StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+
+from prefix_cache import PrefixBlock, PrefixCache
+from streaming_text import IncrementalDecoder, StopSequenceMatcher
+
+logger = structlog.get_logger()
+
+BATCH_SIZE = Histogram(
+    'model_batch_size', 'Requests per generation batch', ['model'],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32)
+)
+BATCH_LATENCY = Histogram('model_batch_latency_seconds', 'Wall time of one batched generate call', ['model'])
+QUEUE_DEPTH = Gauge('model_queue_depth', 'Requests waiting for a batch', ['model'])
+QUEUE_WAIT = Histogram('model_queue_wait_seconds', 'Time a request waited before its batch started', ['model'])
+RUNNING_REQUESTS = Gauge('model_running_requests', 'Requests in the batch currently generating', ['model'])
+CANCELLED_REQUESTS = Counter('model_cancelled_requests', 'Requests cancelled after the client went away', ['model'])
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler's request queue is at capacity."""
+
+
+@dataclass
+class GenerationJob:
+    """One completion request, from the moment it is queued until its last token."""
+    input_ids: List[int]
+    max_new_tokens: int
+    temperature: float
+    top_p: float
+    stop: List[str]
+    loop: asyncio.AbstractEventLoop
+    events: asyncio.Queue = field(default_factory=asyncio.Queue)
+    # Every generated token, including one that completed a stop sequence; usage counts come from here
+    token_ids: List[int] = field(default_factory=list)
+    finish_reason: Optional[str] = None
+    cancelled: bool = False
+    prefix_blocks: List[PrefixBlock] = field(default_factory=list)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return len(self.input_ids)
+
+    @property
+    def finished(self) -> bool:
+        return self.finish_reason is not None
+
+    def sampling_key(self) -> Tuple[float, float]:
+        """Jobs can only share a generate call when their sampling parameters match."""
+        return (self.temperature, self.top_p)
+
+    def _send(self, event: Tuple[str, Any]) -> None:
+        # Called from the inference thread; the queue belongs to the event loop
+        self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+    def emit(self, text: str) -> None:
+        if text:
+            self._send(("token", text))
+
+    def finish(self, reason: str) -> None:
+        self.finish_reason = reason
+        self._send(("done", reason))
+
+    def fail(self, error: Exception) -> None:
+        self.finish_reason = "error"
+        self._send(("error", str(error)))
+
+
+class BatchStreamer(BaseStreamer):
+    """
+    Demultiplexes a batched generate call into per-job token events.
+
+    generate() hands the streamer one new token per row on every decoding
+    step; each row is detokenized, checked against its job's stop sequences
+    and token limit, and finished independently of the rest of the batch.
+    Detokenization and stop matching are incremental, so per-token work does
+    not grow with the length of the completion.
+    """
+
+    def __init__(self, jobs: List[GenerationJob], tokenizer: Any, eos_token_ids: Set[int]):
+        self.jobs = jobs
+        self.eos_token_ids = eos_token_ids
+        self.decoders = [IncrementalDecoder(tokenizer) for _ in jobs]
+        self.stop_matchers = [StopSequenceMatcher(job.stop) for job in jobs]
+        self.prompt_seen = False
+
+    def _finish(self, row: int, reason: str) -> None:
+        """Finish a row, releasing text held back for a stop sequence that never completed."""
+        job = self.jobs[row]
+        if reason != "cancelled":
+            job.emit(self.stop_matchers[row].flush())
+        job.finish(reason)
+
+    def put(self, value: torch.Tensor) -> None:
+        # The first call carries the (padded) prompts
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+
+        for row, (job, token_id) in enumerate(zip(self.jobs, value.view(-1).tolist())):
+            if job.finished:
+                continue
+            if job.cancelled:
+                self._finish(row, "cancelled")
+                continue
+            if token_id in self.eos_token_ids:
+                self._finish(row, "stop")
+                continue
+
+            job.token_ids.append(token_id)
+            text, stopped = self.stop_matchers[row].feed(self.decoders[row].push(token_id))
+            job.emit(text)
+            if stopped:
+                job.finish("stop")
+            elif len(job.token_ids) >= job.max_new_tokens:
+                self._finish(row, "length")
+
+    def end(self) -> None:
+        for row, job in enumerate(self.jobs):
+            if not job.finished:
+                self._finish(row, "cancelled" if job.cancelled else "length")
+
+
+class BatchFinished(StoppingCriteria):
+    """Ends a batched generate call once every job in it is finished."""
+
+    def __init__(self, jobs: List[GenerationJob]):
+        self.jobs = jobs
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return all(job.finished or job.cancelled for job in self.jobs)
+
+
+class BatchScheduler:
+    """
+    Collects concurrent completion requests into batched generate calls.
+
+    The first queued request opens a short wait window; requests arriving in
+    that window with the same sampling parameters join its batch, up to
+    max_batch_size requests and max_batch_tokens padded tokens. Prompts are
+    left-padded so every row decodes in lockstep, and each job finishes on its
+    own stop sequence, EOS or token limit.
+
+    Generation runs on a single dedicated inference thread, so the event loop
+    keeps serving health checks, metrics and new connections while a batch
+    decodes. The queue is bounded; submit() raises QueueFullError beyond it.
+
+    With a prefix cache, a batch is built around the oldest job's longest
+    reusable prompt prefix: only jobs sharing that prefix join, and the prefix's
+    key/values are encoded once and reused instead of re-encoding it per request.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        device: str,
+        model_name: str,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        max_batch_tokens: int = 16384,
+        max_queued: int = 64,
+        prefix_cache: Optional[PrefixCache] = None,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_tokens = max_batch_tokens
+        self.max_queued = max_queued
+        self.prefix_cache = prefix_cache
+
+        eos = model.generation_config.eos_token_id
+        eos = eos if isinstance(eos, list) else [eos]
+        self.eos_token_ids = {token for token in eos + [tokenizer.eos_token_id] if token is not None}
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        self.pending: Deque[GenerationJob] = deque()
+        self.running: List[GenerationJob] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # One thread owns the model: batches run one at a time, off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def start(self) -> None:
+        """Start the scheduling loop on the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for job in list(self.pending) + self.running:
+            job.cancelled = True
+        self._executor.shutdown(wait=True)
+
+    def submit(self, job: GenerationJob) -> None:
+        """Queue a job for the next batch it fits in."""
+        if len(self.pending) >= self.max_queued:
+            raise QueueFullError(f"{len(self.pending)} requests already queued")
+        if self.prefix_cache is not None:
+            job.prefix_blocks = self.prefix_cache.observe(job.input_ids)
+        self.pending.append(job)
+        QUEUE_DEPTH.labels(model=self.model_name).set(len(self.pending))
+        self._wakeup.set()
+
+    def cancel(self, job: GenerationJob) -> None:
+        """
+        Abandon a job whose client went away.
+
+        A queued job is dropped; a running one stops at the next decoding step,
+        and the batch ends early if no other job in it is still generating.
+        """
+        if job.finished or job.cancelled:
+            return
+        job.cancelled = True
+        CANCELLED_REQUESTS.labels(model=self.model_name).inc()
+        if job in self.pending:
+            self.pending.remove(job)
+            QUEUE_DEPTH.labels(model=self.model_name).set(len(self.pending))
+            job.finish("cancelled")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.pending),
+            "running": len(self.running),
+            "max_queued": self.max_queued,
+            "max_batch_size": self.max_batch_size,
+            "prefix_cache": self.prefix_cache.stats() if self.prefix_cache is not None else None,
+        }
+
+    def _take_batch(self) -> Tuple[List[GenerationJob], Optional[PrefixBlock]]:
+        """
+        Remove the oldest job and every compatible job that fits alongside it.
+
+        Returns the batch and the cached prefix its jobs share, if any.
+        """
+        oldest = self.pending[0]
+        key = oldest.sampling_key()
+        prefix = self.prefix_cache.best_prefix(oldest.prefix_blocks) if self.prefix_cache is not None else None
+        batch: List[GenerationJob] = []
+        longest = 0
+        for job in self.pending:
+            if job.sampling_key() != key:
+                continue
+            if prefix is not None and prefix not in job.prefix_blocks:
+                continue
+            length = max(longest, job.prompt_tokens + job.max_new_tokens)
+            if batch and (len(batch) >= self.max_batch_size or length * (len(batch) + 1) > self.max_batch_tokens):
+                break
+            batch.append(job)
+            longest = length
+        now = time.monotonic()
+        for job in batch:
+            self.pending.remove(job)
+            QUEUE_WAIT.labels(model=self.model_name).observe(now - job.enqueued_at)
+        QUEUE_DEPTH.labels(model=self.model_name).set(len(self.pending))
+        return batch, prefix
+
+    async def _run(self) -> None:
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Give concurrent requests a short window to join the oldest one
+            deadline = self.pending[0].enqueued_at + self.max_wait
+            while len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests cancelled during the window have already left the queue
+            if not self.pending:
+                continue
+
+            batch, prefix = self._take_batch()
+            self.running = batch
+            RUNNING_REQUESTS.labels(model=self.model_name).set(len(batch))
+            BATCH_SIZE.labels(model=self.model_name).observe(len(batch))
+            start_time = time.time()
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self.generate_batch, batch, prefix)
+            except Exception as e:
+                logger.error(f"Batched generation failed: {e}")
+                for job in batch:
+                    if not job.finished:
+                        job.fail(e)
+            finally:
+                self.running = []
+                RUNNING_REQUESTS.labels(model=self.model_name).set(0)
+            BATCH_LATENCY.labels(model=self.model_name).observe(time.time() - start_time)
+
+    def _prefix_past(self, prefix: PrefixBlock, prefix_ids: List[int], batch_size: int) -> DynamicCache:
+        """
+        Key/values for a shared prompt prefix, expanded to the batch.
+
+        Encodes and caches the prefix on a miss. The cached tensors are never
+        handed to generate() directly, since it appends to the cache in place.
+        """
+        length, key = prefix
+        past = self.prefix_cache.get(key, requests=batch_size)
+        if past is None:
+            with torch.no_grad():
+                outputs = self.model(input_ids=torch.tensor([prefix_ids], device=self.device), use_cache=True)
+            past = outputs.past_key_values
+            if hasattr(past, "to_legacy_cache"):
+                past = past.to_legacy_cache()
+            self.prefix_cache.put(key, length, past)
+        return DynamicCache.from_legacy_cache(tuple(
+            (k.repeat(batch_size, 1, 1, 1), v.repeat(batch_size, 1, 1, 1)) for k, v in past
+        ))
+
+    def generate_batch(self, batch: List[GenerationJob], prefix: Optional[PrefixBlock] = None) -> None:
+        """Run one generate call for a batch of jobs. Blocks until every job finishes."""
+        # Rows are [shared prefix][padding][rest of prompt]; the attention mask
+        # hides the padding, and positions follow the unpadded tokens
+        prefix_length = prefix[0] if prefix is not None else 0
+        prefix_ids = batch[0].input_ids[:prefix_length]
+        longest_suffix = max(job.prompt_tokens - prefix_length for job in batch)
+        input_ids = []
+        attention_mask = []
+        for job in batch:
+            suffix = job.input_ids[prefix_length:]
+            padding = longest_suffix - len(suffix)
+            input_ids.append(prefix_ids + [self.pad_token_id] * padding + suffix)
+            attention_mask.append([1] * prefix_length + [0] * padding + [1] * len(suffix))
+        temperature, top_p = batch[0].sampling_key()
+
+        cache_kwargs = {}
+        if prefix is not None:
+            cache_kwargs["past_key_values"] = self._prefix_past(prefix, prefix_ids, len(batch))
+
+        with torch.no_grad():
+            self.model.generate(
+                input_ids=torch.tensor(input_ids, device=self.device),
+                attention_mask=torch.tensor(attention_mask, device=self.device),
+                **cache_kwargs,
+                max_new_tokens=max(job.max_new_tokens for job in batch),
+                temperature=temperature,
+                top_p=top_p,
+                pad_token_id=self.pad_token_id,
+                streamer=BatchStreamer(batch, self.tokenizer, self.eos_token_ids),
+                stopping_criteria=StoppingCriteriaList([BatchFinished(batch)]),
+            )
@@ -2,7 +2,7 @@ from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union, Generator
+from typing import List, Optional, Dict, Any, Union, AsyncGenerator
 import os
 import time
 import torch
@@ -10,11 +10,13 @@ import json
 import logging
 import structlog
 import asyncio
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
-from threading import Thread
+from transformers import AutoModelForCausalLM, AutoTokenizer
 import prometheus_client
 from prometheus_client import Counter, Histogram, Gauge
 
+from batching import BatchScheduler, GenerationJob, QueueFullError
+from prefix_cache import PrefixCache
+
 # Initialize logging
 logger = structlog.get_logger()
 
@@ -30,6 +32,15 @@ MODEL_NAME = os.getenv("MODEL_NAME", "llama-7b")
 DEVICE = os.getenv("DEVICE", "cuda" if torch.cuda.is_available() else "cpu")
 PRECISION = os.getenv("PRECISION", "float16")
 MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "1"))
+# Requests decoded together in one generate call; defaults to the concurrency limit
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", str(MAX_CONCURRENT_REQUESTS)))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "20"))
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "16384"))
+# Requests allowed to wait for a batch before new ones are turned away with 503
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "64"))
+# Memory for cached prompt-prefix key/values; 0 disables prefix reuse
+PREFIX_CACHE_MB = int(os.getenv("PREFIX_CACHE_MB", "1024"))
+PREFIX_BLOCK_TOKENS = int(os.getenv("PREFIX_BLOCK_TOKENS", "64"))
 MAX_TOTAL_TOKENS = int(os.getenv("MAX_TOTAL_TOKENS", "4096"))
 USE_FLASH_ATTENTION = os.getenv("USE_FLASH_ATTENTION", "false").lower() == "true"
 HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN", None)
@@ -41,9 +52,6 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Semaphore for request limiting
-REQUEST_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -70,9 +78,10 @@ class CompletionResponse(BaseModel):
     choices: List[Dict[str, Any]]
     usage: Dict[str, int]
 
-# Global model and tokenizer
+# Global model, tokenizer and batch scheduler
 model = None
 tokenizer = None
+scheduler: Optional[BatchScheduler] = None
 
 def load_model():
     """Load the model and tokenizer"""
@@ -120,7 +129,31 @@ def load_model():
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
-    load_model()
+    global scheduler
+    # Load in a worker thread so /health answers (with 503) while weights load
+    await asyncio.to_thread(load_model)
+    scheduler = BatchScheduler(
+        model,
+        tokenizer,
+        DEVICE,
+        MODEL_NAME,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+        max_batch_tokens=MAX_BATCH_TOKENS,
+        max_queued=MAX_QUEUED_REQUESTS,
+        prefix_cache=PrefixCache(
+            MODEL_NAME,
+            block_size=PREFIX_BLOCK_TOKENS,
+            memory_budget_mb=PREFIX_CACHE_MB,
+        ) if PREFIX_CACHE_MB > 0 else None,
+    )
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the batch scheduler"""
+    if scheduler is not None:
+        await scheduler.stop()
 
 def update_gpu_memory_metrics():
     """Update GPU memory metrics"""
@@ -138,7 +171,12 @@ async def health_check():
     # Update GPU memory metrics
     update_gpu_memory_metrics()
     
-    return {"status": "healthy", "model": MODEL_ID, "device": DEVICE}
+    return {
+        "status": "healthy",
+        "model": MODEL_ID,
+        "device": DEVICE,
+        "scheduler": scheduler.stats() if scheduler is not None else None
+    }
 
 @app.get("/metrics")
 async def metrics():
@@ -148,211 +186,143 @@ async def metrics():
         media_type="text/plain"
     )
 
-def generate_text(prompt: str, 
-                 max_tokens: int = 512, 
-                 temperature: float = 0.7, 
-                 top_p: float = 1.0,
-                 stop: Optional[Union[str, List[str]]] = None) -> Dict[str, Any]:
-    """Generate text from a prompt"""
-    # Prepare inputs
-    inputs = tokenizer(prompt, return_tensors="pt").to(DEVICE)
-    input_tokens = inputs.input_ids.shape[1]
-    
-    # Set generation parameters
-    generation_config = {
-        "max_new_tokens": min(max_tokens, MAX_TOTAL_TOKENS - input_tokens),
-        "temperature": temperature,
-        "top_p": top_p,
-        "pad_token_id": tokenizer.eos_token_id,
-    }
-    
-    # Generate text
-    with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            **generation_config
-        )
-    
-    # Decode output
-    generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    
-    # Remove prompt from the beginning of the generated text
-    completion = generated_text[len(tokenizer.decode(inputs.input_ids[0], skip_special_tokens=True)):]
-    
-    # Apply stop sequences if provided
-    if stop:
-        stop_list = [stop] if isinstance(stop, str) else stop
-        for stop_seq in stop_list:
-            if stop_seq in completion:
-                completion = completion[:completion.index(stop_seq)]
-    
-    # Count tokens
-    completion_tokens = len(tokenizer.encode(completion))
-    TOKEN_COUNT.labels(model=MODEL_NAME).inc(completion_tokens)
-    
-    # Prepare response
-    response = {
-        "id": f"cmpl-{time.time_ns()}",
+def completion_payload(response_id: str, created: int, text: str, finish_reason: Optional[str]) -> Dict[str, Any]:
+    """Build a text_completion body or SSE chunk."""
+    return {
+        "id": response_id,
         "object": "text_completion",
-        "created": int(time.time()),
+        "created": created,
         "model": MODEL_NAME,
         "choices": [
             {
-                "text": completion,
+                "text": text,
                 "index": 0,
                 "logprobs": None,
-                "finish_reason": "stop"
+                "finish_reason": finish_reason
             }
-        ],
-        "usage": {
-            "prompt_tokens": input_tokens,
-            "completion_tokens": completion_tokens,
-            "total_tokens": input_tokens + completion_tokens
-        }
+        ]
     }
-    
-    return response
 
-async def generate_stream(prompt: str, 
-                         max_tokens: int = 512, 
-                         temperature: float = 0.7, 
-                         top_p: float = 1.0,
-                         stop: Optional[Union[str, List[str]]] = None) -> Generator:
-    """Generate text as a stream of tokens"""
-    # Prepare inputs
-    inputs = tokenizer(prompt, return_tensors="pt").to(DEVICE)
-    input_tokens = inputs.input_ids.shape[1]
-    
-    # Set up streamer
-    streamer = TextIteratorStreamer(tokenizer, timeout=60.0, skip_prompt=True, skip_special_tokens=True)
-    
-    # Set generation parameters
-    generation_config = {
-        "max_new_tokens": min(max_tokens, MAX_TOTAL_TOKENS - input_tokens),
-        "temperature": temperature,
-        "top_p": top_p,
-        "streamer": streamer,
-        "pad_token_id": tokenizer.eos_token_id,
+def usage_for(job: GenerationJob) -> Dict[str, int]:
+    completion_tokens = len(job.token_ids)
+    return {
+        "prompt_tokens": job.prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": job.prompt_tokens + completion_tokens
     }
-    
-    # Generate in a separate thread
-    thread = Thread(target=lambda: model.generate(
-        **inputs,
-        **generation_config
-    ))
-    thread.start()
-    
-    # Prepare initial SSE response
+
+def create_job(request: CompletionRequest) -> GenerationJob:
+    """Tokenize a request and size its generation budget."""
+    input_ids = tokenizer(request.prompt).input_ids
+    max_new_tokens = min(request.max_tokens, MAX_TOTAL_TOKENS - len(input_ids))
+    if max_new_tokens <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Prompt of {len(input_ids)} tokens leaves no room within {MAX_TOTAL_TOKENS} total tokens"
+        )
+    stop = request.stop or []
+    return GenerationJob(
+        input_ids=input_ids,
+        max_new_tokens=max_new_tokens,
+        temperature=request.temperature,
+        top_p=request.top_p,
+        stop=[stop] if isinstance(stop, str) else list(stop),
+        loop=asyncio.get_running_loop(),
+    )
+
+async def wait_for_disconnect(request: Request, interval: float = 1.0):
+    """Return once the client has closed its connection."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+async def generate_text(job: GenerationJob) -> Dict[str, Any]:
+    """Wait for a scheduled job to finish and build the completion response"""
+    pieces = []
+    try:
+        while True:
+            kind, value = await job.events.get()
+            if kind == "token":
+                pieces.append(value)
+            elif kind == "error":
+                raise RuntimeError(value)
+            else:
+                break
+    finally:
+        scheduler.cancel(job)
+
+    TOKEN_COUNT.labels(model=MODEL_NAME).inc(len(job.token_ids))
+    response = completion_payload(f"cmpl-{time.time_ns()}", int(time.time()), "".join(pieces), job.finish_reason)
+    response["usage"] = usage_for(job)
+    return response
+
+async def generate_stream(job: GenerationJob) -> AsyncGenerator[str, None]:
+    """Relay a scheduled job's tokens as SSE chunks"""
     response_id = f"cmpl-{time.time_ns()}"
     created = int(time.time())
-    
-    # Stream tokens
-    completion_text = ""
-    token_count = 0
-    
-    for token in streamer:
-        token_count += 1
-        completion_text += token
-        
-        # Check if we need to stop based on stop sequences
-        should_stop = False
-        if stop:
-            stop_list = [stop] if isinstance(stop, str) else stop
-            for stop_seq in stop_list:
-                if stop_seq in completion_text:
-                    completion_text = completion_text[:completion_text.index(stop_seq)]
-                    should_stop = True
-                    break
-        
-        # Prepare chunk
-        chunk = {
-            "id": response_id,
-            "object": "text_completion",
-            "created": created,
-            "model": MODEL_NAME,
-            "choices": [
-                {
-                    "text": token,
-                    "index": 0,
-                    "logprobs": None,
-                    "finish_reason": None
-                }
-            ]
-        }
-        
-        # Yield chunk as SSE
-        yield f"data: {json.dumps(chunk)}\n\n"
-        
-        if should_stop:
-            break
-    
+
+    try:
+        while True:
+            kind, value = await job.events.get()
+            if kind == "token":
+                yield f"data: {json.dumps(completion_payload(response_id, created, value, None))}\n\n"
+            elif kind == "error":
+                logger.error(f"Error generating completion: {value}")
+                break
+            else:
+                break
+    finally:
+        # Runs when the client disconnects mid-stream, freeing the job's batch slot
+        scheduler.cancel(job)
+
     # Final chunk with finish_reason
-    final_chunk = {
-        "id": response_id,
-        "object": "text_completion",
-        "created": created,
-        "model": MODEL_NAME,
-        "choices": [
-            {
-                "text": "",
-                "index": 0,
-                "logprobs": None,
-                "finish_reason": "stop"
-            }
-        ],
-        "usage": {
-            "prompt_tokens": input_tokens,
-            "completion_tokens": token_count,
-            "total_tokens": input_tokens + token_count
-        }
-    }
-    
-    TOKEN_COUNT.labels(model=MODEL_NAME).inc(token_count)
+    final_chunk = completion_payload(response_id, created, "", job.finish_reason)
+    final_chunk["usage"] = usage_for(job)
+
+    TOKEN_COUNT.labels(model=MODEL_NAME).inc(len(job.token_ids))
     yield f"data: {json.dumps(final_chunk)}\n\n"
     yield "data: [DONE]\n\n"
 
 @app.post("/completion")
-async def completion(request: CompletionRequest):
+async def completion(request: CompletionRequest, raw_request: Request):
     """Text completion endpoint"""
     REQUEST_COUNT.labels(model=MODEL_NAME).inc()
-    
-    async with REQUEST_SEMAPHORE:
-        start_time = time.time()
-        
-        # Handle streaming
-        if request.stream:
-            return StreamingResponse(
-                generate_stream(
-                    prompt=request.prompt,
-                    max_tokens=request.max_tokens,
-                    temperature=request.temperature,
-                    top_p=request.top_p,
-                    stop=request.stop
-                ),
-                media_type="text/event-stream"
-            )
-        
-        # Handle regular completion
-        try:
-            response = generate_text(
-                prompt=request.prompt,
-                max_tokens=request.max_tokens,
-                temperature=request.temperature,
-                top_p=request.top_p,
-                stop=request.stop
-            )
-            
-            end_time = time.time()
-            LATENCY.labels(model=MODEL_NAME).observe(end_time - start_time)
-            
-            # Update GPU memory metrics
-            update_gpu_memory_metrics()
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error generating completion: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    start_time = time.time()
+    job = create_job(request)
+    try:
+        scheduler.submit(job)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
+
+    # Handle streaming
+    if request.stream:
+        return StreamingResponse(generate_stream(job), media_type="text/event-stream")
+
+    # Handle regular completion
+    try:
+        generation = asyncio.create_task(generate_text(job))
+        disconnect = asyncio.create_task(wait_for_disconnect(raw_request))
+        await asyncio.wait({generation, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if not generation.done():
+            generation.cancel()
+            logger.info("Client disconnected, cancelled completion")
+            return JSONResponse(status_code=499, content={"detail": "Client closed request"})
+        disconnect.cancel()
+        response = generation.result()
+
+        end_time = time.time()
+        LATENCY.labels(model=MODEL_NAME).observe(end_time - start_time)
+
+        # Update GPU memory metrics
+        update_gpu_memory_metrics()
+
+        return response
+
+    except Exception as e:
+        logger.error(f"Error generating completion: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+logger = structlog.get_logger()
+
+PREFIX_CACHE_HITS = Counter('model_prefix_cache_hits', 'Batches that reused cached prefix key/values', ['model'])
+PREFIX_CACHE_MISSES = Counter('model_prefix_cache_misses', 'Prefixes encoded and added to the cache', ['model'])
+PREFIX_TOKENS_REUSED = Counter('model_prefix_tokens_reused', 'Prompt tokens served from the prefix cache', ['model'])
+PREFIX_CACHE_BYTES = Gauge('model_prefix_cache_bytes', 'Memory held by cached prefix key/values', ['model'])
+
+# (prefix length in tokens, hash of the token ids up to that length)
+PrefixBlock = Tuple[int, str]
+
+
+@dataclass
+class PrefixEntry:
+    length: int
+    past_key_values: Any
+    size: int
+
+
+class PrefixCache:
+    """
+    Past-key-values for recently seen prompt prefixes, evicted LRU by memory.
+
+    Prompts are hashed in fixed-size token blocks, each hash chaining the one
+    before it, so two prompts share a cache key exactly when they share every
+    token up to that block boundary. A prefix is only encoded and cached once
+    it has been seen min_hits times, which keeps one-off prompts out.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        block_size: int = 64,
+        memory_budget_mb: int = 1024,
+        min_hits: int = 2,
+        max_tracked: int = 4096,
+    ):
+        self.model_name = model_name
+        self.block_size = block_size
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.min_hits = min_hits
+        self.max_tracked = max_tracked
+        self._entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self._seen: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def blocks(self, input_ids: List[int]) -> List[PrefixBlock]:
+        """Chained hashes of every whole block that leaves at least one prompt token uncached."""
+        blocks: List[PrefixBlock] = []
+        digest = b""
+        for end in range(self.block_size, len(input_ids), self.block_size):
+            block = array("q", input_ids[end - self.block_size:end]).tobytes()
+            digest = hashlib.blake2b(digest + block, digest_size=16).digest()
+            blocks.append((end, digest.hex()))
+        return blocks
+
+    def observe(self, input_ids: List[int]) -> List[PrefixBlock]:
+        """Count a prompt's prefixes as seen and return its blocks."""
+        blocks = self.blocks(input_ids)
+        with self._lock:
+            for _, key in blocks:
+                self._seen[key] = self._seen.get(key, 0) + 1
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+        return blocks
+
+    def best_prefix(self, blocks: List[PrefixBlock]) -> Optional[PrefixBlock]:
+        """The longest prefix that is cached or has been seen often enough to cache."""
+        with self._lock:
+            for block in reversed(blocks):
+                key = block[1]
+                if key in self._entries or self._seen.get(key, 0) >= self.min_hits:
+                    return block
+        return None
+
+    def get(self, key: str, requests: int = 1) -> Optional[Any]:
+        """Cached past-key-values for a prefix, counting the prompt tokens it saves for `requests` prompts."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            PREFIX_CACHE_HITS.labels(model=self.model_name).inc()
+            PREFIX_TOKENS_REUSED.labels(model=self.model_name).inc(entry.length * requests)
+            return entry.past_key_values
+
+    def put(self, key: str, length: int, past_key_values: Any) -> None:
+        """Cache a prefix's legacy-format past-key-values, evicting least-recently-used entries to fit."""
+        size = sum(tensor.numel() * tensor.element_size() for layer in past_key_values for tensor in layer)
+        if size > self.memory_budget_bytes:
+            return
+        with self._lock:
+            PREFIX_CACHE_MISSES.labels(model=self.model_name).inc()
+            self._entries[key] = PrefixEntry(length, past_key_values, size)
+            used = sum(entry.size for entry in self._entries.values())
+            while used > self.memory_budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                used -= evicted.size
+            PREFIX_CACHE_BYTES.labels(model=self.model_name).set(used)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_used_bytes": sum(entry.size for entry in self._entries.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "block_size": self.block_size,
+            }
@@ -0,0 +1,84 @@
+from typing import Any, List, Tuple
+
+
+class IncrementalDecoder:
+    """
+    Turns generated token ids into text one token at a time.
+
+    Each step decodes only a short window of recent tokens instead of the
+    whole completion, so detokenization stays linear in output length. The
+    window keeps one token of left context because tokenizers such as
+    SentencePiece change a token's leading space depending on what precedes it.
+    """
+
+    def __init__(self, tokenizer: Any):
+        self.tokenizer = tokenizer
+        self.token_ids: List[int] = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def push(self, token_id: int) -> str:
+        """Add a token and return the text it completes (possibly empty)."""
+        self.token_ids.append(token_id)
+        prefix_text = self.tokenizer.decode(
+            self.token_ids[self.prefix_offset:self.read_offset], skip_special_tokens=True
+        )
+        new_text = self.tokenizer.decode(self.token_ids[self.prefix_offset:], skip_special_tokens=True)
+
+        # An incomplete multi-byte character decodes to U+FFFD; wait for the next token
+        if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.token_ids)
+            return new_text[len(prefix_text):]
+        return ""
+
+
+class StopSequenceMatcher:
+    """
+    Finds stop sequences in streamed text without rescanning emitted output.
+
+    Only the held-back tail (at most the longest stop sequence minus one
+    character) is carried between calls, so each feed costs time proportional
+    to the new text, not the whole completion. Text that could still turn into
+    a stop sequence is held back until it is known not to, so a stop sequence
+    is never partially streamed to the client.
+    """
+
+    def __init__(self, stop_sequences: List[str]):
+        self.stop_sequences = [stop for stop in stop_sequences if stop]
+        self.max_holdback = max((len(stop) for stop in self.stop_sequences), default=1) - 1
+        self.pending = ""
+
+    def _partial_match_length(self, text: str) -> int:
+        """Length of the longest suffix of text that begins some stop sequence."""
+        for length in range(min(self.max_holdback, len(text)), 0, -1):
+            tail = text[-length:]
+            if any(stop.startswith(tail) for stop in self.stop_sequences):
+                return length
+        return 0
+
+    def feed(self, text: str) -> Tuple[str, bool]:
+        """
+        Add newly generated text.
+
+        Returns:
+            The text that is safe to emit, and whether a stop sequence was hit
+            (in which case the emitted text ends right before it).
+        """
+        if not self.stop_sequences:
+            return text, False
+
+        buffer = self.pending + text
+        hits = [index for index in (buffer.find(stop) for stop in self.stop_sequences) if index >= 0]
+        if hits:
+            self.pending = ""
+            return buffer[:min(hits)], True
+
+        keep = self._partial_match_length(buffer)
+        self.pending = buffer[len(buffer) - keep:]
+        return buffer[:len(buffer) - keep], False
+
+    def flush(self) -> str:
+        """Release held-back text once generation has ended without a stop."""
+        text, self.pending = self.pending, ""
+        return text
@@ -0,0 +1,83 @@
+"""Test doubles for the model server: a byte-level tokenizer and job helpers."""
+
+import asyncio
+from typing import Any, List, Optional, Tuple
+
+from batching import GenerationJob
+
+
+class ByteTokenizer:
+    """One token per UTF-8 byte, so multi-byte characters span several tokens."""
+
+    eos_token_id = 0
+    pad_token_id = None
+
+    def encode(self, text: str) -> List[int]:
+        return list(text.encode("utf-8"))
+
+    def decode(self, token_ids: List[int], skip_special_tokens: bool = True) -> str:
+        return bytes(token for token in token_ids if token).decode("utf-8", errors="replace")
+
+
+def make_job(
+    loop: asyncio.AbstractEventLoop,
+    prompt: str = "hi",
+    max_new_tokens: int = 16,
+    temperature: float = 0.7,
+    top_p: float = 1.0,
+    stop: Optional[List[str]] = None,
+) -> GenerationJob:
+    return GenerationJob(
+        input_ids=ByteTokenizer().encode(prompt),
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        stop=stop or [],
+        loop=loop,
+    )
+
+
+def drain(loop: asyncio.AbstractEventLoop, job: GenerationJob) -> List[Tuple[str, Any]]:
+    """Deliver events sent from the inference side and return them."""
+    loop.run_until_complete(asyncio.sleep(0))
+    events = []
+    while not job.events.empty():
+        events.append(job.events.get_nowait())
+    return events
+
+
+def streamed_text(events: List[Tuple[str, Any]]) -> str:
+    return "".join(value for kind, value in events if kind == "token")
+
+
+class ScriptedModel:
+    """
+    Stands in for a causal LM: each generate call replays scripted completions.
+
+    script maps a prompt to the text generated for it; rows run out into EOS.
+    Drives the streamer and stopping criteria the way transformers' generate does.
+    """
+
+    def __init__(self, script: dict, tokenizer: ByteTokenizer):
+        self.script = {tuple(tokenizer.encode(prompt)): tokenizer.encode(text) for prompt, text in script.items()}
+        self.tokenizer = tokenizer
+        self.generation_config = type("GenerationConfig", (), {"eos_token_id": tokenizer.eos_token_id})()
+        self.calls: List[List[List[int]]] = []
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, streamer, stopping_criteria, **kwargs):
+        import torch
+
+        prompts = [
+            [token for token, mask in zip(row, masks) if mask]
+            for row, masks in zip(input_ids.tolist(), attention_mask.tolist())
+        ]
+        self.calls.append(prompts)
+        outputs = [self.script.get(tuple(prompt), []) for prompt in prompts]
+
+        streamer.put(input_ids)
+        for step in range(max_new_tokens):
+            tokens = [output[step] if step < len(output) else self.tokenizer.eos_token_id for output in outputs]
+            streamer.put(torch.tensor(tokens))
+            if torch.as_tensor(stopping_criteria(input_ids, None)).all():
+                break
+        streamer.end()
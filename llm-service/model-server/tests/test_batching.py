@@ -0,0 +1,213 @@
+"""Unit tests for batch admission, per-row finishing and cancellation."""
+
+import asyncio
+
+import pytest
+import torch
+
+from batching import BatchFinished, BatchScheduler, BatchStreamer, QueueFullError
+from tests.fakes import ByteTokenizer, ScriptedModel, drain, make_job, streamed_text
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def make_scheduler(script=None, **kwargs) -> BatchScheduler:
+    tokenizer = ByteTokenizer()
+    scheduler = BatchScheduler(ScriptedModel(script or {}, tokenizer), tokenizer, "cpu", "test", **kwargs)
+    scheduler._wakeup = asyncio.Event()
+    return scheduler
+
+
+def step(streamer, tokens):
+    streamer.put(torch.tensor(tokens))
+
+
+# Admission
+
+def test_batch_takes_only_jobs_with_the_oldest_jobs_sampling_parameters(loop):
+    scheduler = make_scheduler(max_batch_size=8)
+    greedy = [make_job(loop, temperature=0.0) for _ in range(2)]
+    sampled = make_job(loop, temperature=0.7)
+    for job in (greedy[0], sampled, greedy[1]):
+        scheduler.submit(job)
+
+    batch, prefix = scheduler._take_batch()
+
+    assert batch == greedy
+    assert prefix is None
+    assert list(scheduler.pending) == [sampled]
+
+
+def test_batch_is_capped_at_max_batch_size(loop):
+    scheduler = make_scheduler(max_batch_size=3)
+    jobs = [make_job(loop) for _ in range(5)]
+    for job in jobs:
+        scheduler.submit(job)
+
+    assert scheduler._take_batch()[0] == jobs[:3]
+    assert scheduler._take_batch()[0] == jobs[3:]
+
+
+def test_batch_is_capped_at_max_batch_tokens(loop):
+    # Each job pads to 2 prompt + 48 new = 50 tokens; three rows would need 150
+    scheduler = make_scheduler(max_batch_size=8, max_batch_tokens=120)
+    jobs = [make_job(loop, max_new_tokens=48) for _ in range(3)]
+    for job in jobs:
+        scheduler.submit(job)
+
+    assert scheduler._take_batch()[0] == jobs[:2]
+
+
+def test_longest_job_sets_the_padded_size_of_every_row(loop):
+    scheduler = make_scheduler(max_batch_size=8, max_batch_tokens=100)
+    short = make_job(loop, max_new_tokens=8)
+    long = make_job(loop, max_new_tokens=58)
+    scheduler.submit(short)
+    scheduler.submit(long)
+
+    # 2 rows x (2 + 58) tokens is over budget, so the long job waits
+    assert scheduler._take_batch()[0] == [short]
+
+
+def test_oversized_job_still_runs_alone(loop):
+    scheduler = make_scheduler(max_batch_tokens=10)
+    job = make_job(loop, max_new_tokens=100)
+    scheduler.submit(job)
+
+    assert scheduler._take_batch()[0] == [job]
+
+
+def test_submit_rejects_jobs_beyond_the_queue_limit(loop):
+    scheduler = make_scheduler(max_queued=2)
+    scheduler.submit(make_job(loop))
+    scheduler.submit(make_job(loop))
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit(make_job(loop))
+
+
+# Per-row finishing
+
+def test_rows_finish_independently_on_eos_stop_and_length(loop):
+    tokenizer = ByteTokenizer()
+    eos_job = make_job(loop)
+    stop_job = make_job(loop, stop=["!"])
+    length_job = make_job(loop, max_new_tokens=3)
+    jobs = [eos_job, stop_job, length_job]
+    streamer = BatchStreamer(jobs, tokenizer, {tokenizer.eos_token_id})
+    finished = BatchFinished(jobs)
+
+    streamer.put(torch.zeros((3, 2), dtype=torch.long))
+    step(streamer, [ord("a"), ord("b"), ord("c")])
+    step(streamer, [0, ord("!"), ord("c")])
+    assert (eos_job.finish_reason, stop_job.finish_reason, length_job.finish_reason) == ("stop", "stop", None)
+    assert not finished(None, None)
+
+    step(streamer, [0, ord("x"), ord("c")])
+    assert length_job.finish_reason == "length"
+    assert finished(None, None)
+
+    assert streamed_text(drain(loop, eos_job)) == "a"
+    assert streamed_text(drain(loop, stop_job)) == "b"
+    assert streamed_text(drain(loop, length_job)) == "ccc"
+    # Tokens after a row finished are ignored
+    assert stop_job.token_ids == [ord("b"), ord("!")]
+
+
+def test_end_flushes_text_held_back_for_an_unfinished_stop(loop):
+    tokenizer = ByteTokenizer()
+    job = make_job(loop, stop=["</s>"])
+    streamer = BatchStreamer([job], tokenizer, {tokenizer.eos_token_id})
+
+    streamer.put(torch.zeros((1, 2), dtype=torch.long))
+    for token in tokenizer.encode("ok </"):
+        step(streamer, [token])
+    streamer.end()
+
+    events = drain(loop, job)
+    assert streamed_text(events) == "ok </"
+    assert events[-1] == ("done", "length")
+
+
+# Cancellation
+
+def test_cancelling_a_queued_job_removes_it(loop):
+    scheduler = make_scheduler()
+    kept, cancelled = make_job(loop), make_job(loop)
+    scheduler.submit(kept)
+    scheduler.submit(cancelled)
+
+    scheduler.cancel(cancelled)
+
+    assert list(scheduler.pending) == [kept]
+    assert drain(loop, cancelled) == [("done", "cancelled")]
+
+
+def test_cancelling_a_running_job_stops_only_its_row(loop):
+    tokenizer = ByteTokenizer()
+    scheduler = make_scheduler()
+    kept, cancelled = make_job(loop), make_job(loop)
+    jobs = [kept, cancelled]
+    streamer = BatchStreamer(jobs, tokenizer, {tokenizer.eos_token_id})
+    finished = BatchFinished(jobs)
+
+    streamer.put(torch.zeros((2, 2), dtype=torch.long))
+    step(streamer, [ord("a"), ord("b")])
+    scheduler.cancel(cancelled)
+    step(streamer, [ord("a"), ord("b")])
+
+    assert cancelled.finish_reason == "cancelled"
+    assert streamed_text(drain(loop, cancelled)) == "b"
+    assert not finished(None, None)
+
+    scheduler.cancel(kept)
+    assert finished(None, None)
+
+
+def test_cancel_is_a_no_op_for_finished_jobs(loop):
+    scheduler = make_scheduler()
+    job = make_job(loop)
+    job.finish("stop")
+
+    scheduler.cancel(job)
+
+    assert not job.cancelled
+
+
+# Scheduling loop
+
+def test_concurrent_jobs_share_one_generate_call():
+    script = {"one": "first", "two": "second!", "three": "third"}
+    scheduler = make_scheduler(script, max_batch_size=4, max_wait_ms=50)
+
+    async def run():
+        scheduler.start()
+        loop = asyncio.get_running_loop()
+        jobs = [
+            make_job(loop, prompt="one"),
+            make_job(loop, prompt="two", stop=["!"]),
+            make_job(loop, prompt="three", max_new_tokens=3),
+        ]
+        for job in jobs:
+            scheduler.submit(job)
+
+        texts = []
+        for job in jobs:
+            pieces = []
+            while True:
+                kind, value = await job.events.get()
+                if kind != "token":
+                    break
+                pieces.append(value)
+            texts.append(("".join(pieces), job.finish_reason))
+        await scheduler.stop()
+        return texts
+
+    assert asyncio.run(run()) == [("first", "stop"), ("second", "stop"), ("thi", "length")]
+    assert len(scheduler.model.calls) == 1
+    assert sorted(scheduler.model.calls[0]) == sorted(ByteTokenizer().encode(p) for p in ("one", "two", "three"))
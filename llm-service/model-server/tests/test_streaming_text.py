@@ -0,0 +1,135 @@
+"""Unit tests for incremental detokenization and stop sequence matching."""
+
+import asyncio
+
+import pytest
+import torch
+
+from batching import BatchStreamer
+from main import usage_for
+from streaming_text import IncrementalDecoder, StopSequenceMatcher
+from tests.fakes import ByteTokenizer, drain, make_job, streamed_text
+
+
+def stream(matcher, pieces):
+    """Feed pieces until a stop; return the emitted text and whether it stopped."""
+    emitted = []
+    for piece in pieces:
+        text, stopped = matcher.feed(piece)
+        emitted.append(text)
+        if stopped:
+            return "".join(emitted), True
+    emitted.append(matcher.flush())
+    return "".join(emitted), False
+
+
+def test_decoder_emits_ascii_token_by_token():
+    tokenizer = ByteTokenizer()
+    decoder = IncrementalDecoder(tokenizer)
+
+    assert [decoder.push(token) for token in tokenizer.encode("abc")] == ["a", "b", "c"]
+
+
+def test_decoder_holds_split_multibyte_characters_until_complete():
+    tokenizer = ByteTokenizer()
+    decoder = IncrementalDecoder(tokenizer)
+
+    pieces = [decoder.push(token) for token in tokenizer.encode("añ€😀!")]
+
+    assert "".join(pieces) == "añ€😀!"
+    assert not any("�" in piece for piece in pieces)
+    # ñ, € and 😀 are 2, 3 and 4 bytes; only their last byte completes them
+    assert pieces == ["a", "", "ñ", "", "", "€", "", "", "", "😀", "!"]
+
+
+def test_stop_split_across_tokens_is_never_streamed():
+    matcher = StopSequenceMatcher(["###"])
+
+    assert matcher.feed("Answer #") == ("Answer ", False)
+    assert matcher.feed("#") == ("", False)
+    assert matcher.feed("# trailing") == ("", True)
+
+
+def test_held_back_text_that_completes_a_stop_is_dropped():
+    matcher = StopSequenceMatcher(["END"])
+
+    assert matcher.feed("the EN") == ("the ", False)
+    assert matcher.feed("Ding") == ("", True)
+
+
+def test_false_partial_match_is_emitted_once_ruled_out():
+    matcher = StopSequenceMatcher(["END"])
+
+    assert matcher.feed("the EN") == ("the ", False)
+    assert matcher.feed("ough") == ("ENough", False)
+
+
+def test_flush_releases_held_back_text():
+    matcher = StopSequenceMatcher(["</answer>"])
+
+    assert matcher.feed("done </ans") == ("done ", False)
+    assert matcher.flush() == "</ans"
+    assert matcher.flush() == ""
+
+
+def test_overlapping_stops_cut_at_the_earliest():
+    text, stopped = stream(StopSequenceMatcher(["cde", "bc"]), ["a", "b", "c", "d", "e"])
+
+    assert (text, stopped) == ("a", True)
+
+
+def test_stop_that_overlaps_itself_is_found():
+    text, stopped = stream(StopSequenceMatcher(["aab"]), ["x", "a", "a", "a", "b", "z"])
+
+    assert (text, stopped) == ("xa", True)
+
+
+def test_output_without_stops_is_unchanged():
+    pieces = ["Hello", ", ", "wor", "ld", "!"]
+
+    assert stream(StopSequenceMatcher(["\n\n", "User:"]), pieces) == ("Hello, world!", False)
+    assert stream(StopSequenceMatcher([]), pieces) == ("Hello, world!", False)
+
+
+def test_empty_stop_sequences_are_ignored():
+    matcher = StopSequenceMatcher(["", "STOP"])
+
+    assert matcher.feed("go STOP now") == ("go ", True)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def feed_tokens(streamer, tokens):
+    streamer.put(torch.tensor([[1, 2, 3]]))  # the prompt
+    for token in tokens:
+        streamer.put(torch.tensor([token]))
+    streamer.end()
+
+
+def test_usage_counts_every_generated_token_including_the_stop(loop):
+    tokenizer = ByteTokenizer()
+    job = make_job(loop, prompt="Q?", stop=["###"])
+
+    feed_tokens(BatchStreamer([job], tokenizer, {tokenizer.eos_token_id}), tokenizer.encode("ok###more"))
+
+    assert streamed_text(drain(loop, job)) == "ok"
+    assert job.finish_reason == "stop"
+    # Generation stops on the token that completes the stop; its tokens were still generated
+    assert job.token_ids == tokenizer.encode("ok###")
+    assert usage_for(job) == {"prompt_tokens": 2, "completion_tokens": 5, "total_tokens": 7}
+
+
+def test_usage_does_not_count_eos(loop):
+    tokenizer = ByteTokenizer()
+    job = make_job(loop, prompt="Q?")
+
+    feed_tokens(BatchStreamer([job], tokenizer, {tokenizer.eos_token_id}), tokenizer.encode("done") + [0])
+
+    assert streamed_text(drain(loop, job)) == "done"
+    assert job.finish_reason == "stop"
+    assert usage_for(job)["completion_tokens"] == 4
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import os
@@ -14,16 +15,15 @@ from models import (
     ContentGenerationRequest, ContentGenerationResponse,
     ChapterDataRequest, ChapterDataResponse
 )
-from database import DatabaseManager
-from queue_manager import QueueManager
+from database import DatabaseManager, get_database_manager
+from queue_manager import QueueManager, get_queue_manager as get_shared_queue_manager
 from pdf_processor import PDFProcessor
 from docx_processor import DOCXProcessor
 from pptx_processor import PPTXProcessor
 from video_processor import VideoProcessor
-from openai_client import OpenAIClient
-from openai_functions import (
-    generate_notes, generate_summary, generate_questions, generate_mind_map_structure
-)
+from openai_client import OpenAIClient, get_openai_client as get_shared_openai_client
+from content_orchestrator import ContentGenerationOrchestrator, GenerationResult
+from image_pipeline import IMAGE_THUMBNAIL_SIZE, get_thumbnail
 from knowledge_graph import graph_service
 from knowledge_graph_sync import sync_service
 
@@ -39,17 +39,14 @@ router.dependencies = [Depends(get_current_user)]
 
 # Dependencies
 def get_db_manager():
-    return DatabaseManager()
+    return get_database_manager()
 
-def get_queue_manager(db_manager: DatabaseManager = Depends(get_db_manager)):
-    return QueueManager(db_manager)
+def get_queue_manager():
+    return get_shared_queue_manager()
 
-def get_openai_client():
-    """Get an OpenAI client."""
-    api_key = os.environ.get("OPENAI_API_KEY", "")
-    if not api_key:
-        logger.warning("OPENAI_API_KEY not set, using default key")
-    return OpenAIClient(api_key)
+async def get_openai_client():
+    """Get the process-wide OpenAI client."""
+    return get_shared_openai_client()
 
 # Routes
 # Note: Health check is defined in main.py as a public endpoint
@@ -222,12 +219,8 @@ def retry_processing(
         if retry_count >= queue_manager.max_retries and not retry_request.force:
             raise HTTPException(400, f"Maximum retry count ({queue_manager.max_retries}) reached. Use force=true to retry anyway.")
             
-        # Override max retries if specified
-        if retry_request.max_retries is not None:
-            queue_manager.max_retries = retry_request.max_retries
-            
-        # Add to queue with current retry count
-        queue_manager.add_job(knowledge.id)
+        # Add to queue, overriding max retries for this job if specified
+        queue_manager.add_job(knowledge.id, max_retries=retry_request.max_retries)
         
         # Add retry history entry
         db_manager.add_retry_history(
@@ -398,6 +391,40 @@ def get_image_status(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/images/{digest}/thumbnail")
+def get_image_thumbnail(
+    digest: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    size: int = Query(IMAGE_THUMBNAIL_SIZE, ge=16, le=1024)
+):
+    """
+    Get a thumbnail of an extracted image, creating it on first request.
+
+    Args:
+        digest: The SHA-256 of the image, as in its storage path
+        size: The longest side of the thumbnail in pixels
+
+    Returns:
+        The thumbnail URL and storage path
+    """
+    try:
+        from storage import storage
+
+        thumbnail_path = get_thumbnail(digest, size)
+        if thumbnail_path is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        return {
+            "url": storage.generate_presigned_url(thumbnail_path),
+            "file_path": thumbnail_path
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting image thumbnail: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/generate-content/{knowledge_id}", response_model=ContentGenerationResponse)
 async def generate_content(
     knowledge_id: int = Path(..., ge=1),
@@ -433,19 +460,13 @@ async def generate_content(
         
         logger.info(f"Found {len(chapters)} chapters to process")
         
-        # Define type generators mapping
-        type_generators = {
-            "notes": generate_notes,
-            "summary": generate_summary,
-            "quiz": generate_questions,
-            "mindmap": generate_mind_map_structure,
-        }
-        
+        orchestrator = ContentGenerationOrchestrator(openai_client)
+
         # Validate requested content types
-        invalid_types = [t for t in types if t not in type_generators]
+        invalid_types = [t for t in types if t not in orchestrator.supported_types(types)]
         if invalid_types:
             logger.warning(f"Ignoring unsupported content types: {invalid_types}")
-            types = [t for t in types if t in type_generators]
+            types = orchestrator.supported_types(types)
             
         if not types:
             error_msg = "No valid content types specified"
@@ -458,77 +479,69 @@ async def generate_content(
         all_results = []
         processed_chapters = 0
         failed_chapters = 0
-        # Process each chapter (all chapters, not just the first one)
-        for chapter in chapters:
-            chapter_id = chapter.id
-            logger.info(f"Processing chapter {chapter_id} ({processed_chapters + 1}/{len(chapters)})")
-            
-            # Generate content for each requested type
+
+        def store_chapter(chapter, results: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            """Persist a chapter's results and return the stored content for the response."""
+            db_manager.update_edtech_content(
+                chapter_id=chapter.id,
+                language=language,
+                content_data={
+                    "knowledge_id": knowledge_id,
+                    **results
+                }
+            )
+            # Retrieve the updated content to include in the response
+            updated_content = db_manager.get_edtech_content(chapter.id, language)
+            if not updated_content:
+                return None
+            return {
+                "id": updated_content.id,
+                "knowledge_id": updated_content.knowledge_id,
+                "chapter_id": updated_content.chapter_id,
+                "language": updated_content.language,
+                "notes": updated_content.notes,
+                "summary": updated_content.summary,
+                "quiz": updated_content.quiz,
+                "mindmap": updated_content.mindmap,
+                "meta_data": updated_content.meta_data,
+                "created_at": updated_content.created_at,
+                "updated_at": updated_content.updated_at
+            }
+
+        async def on_chapter(chapter, generation_results: List[GenerationResult]) -> None:
+            nonlocal processed_chapters, failed_chapters
             results = {}
-            chapter_success = True
-            
-            for content_type in types:
-                generator = type_generators[content_type]
-                
-                try:
-                    logger.info(f"Generating {content_type} for chapter {chapter_id}")
-                    # Call the appropriate generator function
-                    if content_type == "mindmap":
-                        generated = await generator(openai_client, chapter.content, language)
-                    elif content_type == "quiz":
-                        generated = await generator(openai_client, chapter.content, language)
-                    else:
-                        generated = await generator(openai_client, chapter.content, language)
-                        # Join the chunked results with a delimiter for storage
-                        generated = "|||||".join(generated) if isinstance(generated, list) else generated
-                    
-                    results[content_type] = generated
-                    logger.info(f"Successfully generated {content_type} content for chapter {chapter_id}")
-                except Exception as e:
-                    logger.error(f"Error generating {content_type} for chapter {chapter_id}: {str(e)}")
-                    error_message = f"Error generating {content_type}: {str(e)}"
-                    results[content_type] = error_message
-                    results[f"{content_type}_error"] = str(e)
-                    chapter_success = False
-            
+            for result in generation_results:
+                if result.ok:
+                    results[result.content_type] = result.content
+                else:
+                    results[result.content_type] = f"Error generating {result.content_type}: {result.error}"
+                    results[f"{result.content_type}_error"] = result.error
+
             # Add generation metadata 
+            chapter_success = all(result.ok for result in generation_results)
             results["generation_status"] = "complete" if chapter_success else "partial"
             results["generated_at"] = datetime.utcnow().isoformat()
             results["generated_types"] = [t for t in types if t in results and not t.endswith("_error")]
-            
-            # Update content in the database using the table with language suffix
-            logger.info(f"Updating content for chapter {chapter_id}, knowledge_id {knowledge_id}")
-            
+
+            # Persist each chapter as soon as its last type completes
+            logger.info(f"Updating content for chapter {chapter.id}, knowledge_id {knowledge_id}")
             try:
-                db_manager.update_edtech_content(
-                    chapter_id=chapter.id,
-                    language=language,
-                    content_data={
-                        "knowledge_id": knowledge_id,
-                        **results
-                    }
-                )
-                logger.info(f"Successfully updated content for chapter {chapter_id}")
-                # Retrieve the updated content to include in the response
-                updated_content = db_manager.get_edtech_content(chapter.id, language)
-                if updated_content:
-                    all_results.append({
-                        "id": updated_content.id,
-                        "knowledge_id": updated_content.knowledge_id,
-                        "chapter_id": updated_content.chapter_id,
-                        "language": updated_content.language,
-                        "notes": updated_content.notes,
-                        "summary": updated_content.summary,
-                        "quiz": updated_content.quiz,
-                        "mindmap": updated_content.mindmap,
-                        "meta_data": updated_content.meta_data,
-                        "created_at": updated_content.created_at,
-                        "updated_at": updated_content.updated_at
-                    })
+                stored = await asyncio.to_thread(store_chapter, chapter, results)
+                if stored:
+                    all_results.append(stored)
                 processed_chapters += 1
+                logger.info(f"Successfully updated content for chapter {chapter.id} ({processed_chapters}/{len(chapters)})")
             except Exception as e:
-                logger.error(f"Database error updating content for chapter {chapter_id}: {str(e)}")
+                logger.error(f"Database error updating content for chapter {chapter.id}: {str(e)}")
                 failed_chapters += 1
+
+        # Generate every (chapter, type) pair concurrently under the shared generation limits
+        await orchestrator.run(chapters, types, language, on_chapter=on_chapter)
+
+        # Chapters complete out of order; report them in chapter order
+        chapter_order = {chapter.id: index for index, chapter in enumerate(chapters)}
+        all_results.sort(key=lambda content: chapter_order.get(content["chapter_id"], len(chapter_order)))
         
         # Return appropriate response based on success/failure counts
         if processed_chapters == 0:
@@ -715,20 +728,22 @@ async def sync_knowledge_graph(
 
 @router.post("/knowledge-graph/sync-all")
 async def sync_all_knowledge_graphs(
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    incremental: bool = Query(True, description="Skip entries unchanged since their last sync")
 ):
     """
     Synchronize all knowledge entries to the Neo4j knowledge graph.
     
     Args:
         background_tasks: Background tasks manager
+        incremental: Skip entries unchanged since their last successful sync
         
     Returns:
         JSON response with sync status
     """
     try:
         # Start synchronization in the background
-        background_tasks.add_task(sync_service.sync_all_knowledge)
+        background_tasks.add_task(sync_service.sync_all_knowledge, incremental)
         
         return {
             "status": "syncing",
@@ -738,6 +753,16 @@ async def sync_all_knowledge_graphs(
         logger.error(f"Error starting all knowledge graphs sync: {str(e)}")
         raise HTTPException(500, f"Error starting all knowledge graphs sync: {str(e)}")
 
+@router.get("/knowledge-graph/sync-all/status")
+async def get_sync_all_status():
+    """
+    Get progress of the current or last full knowledge graph synchronization.
+    
+    Returns:
+        Counts of entries completed, succeeded, failed and skipped
+    """
+    return sync_service.get_progress()
+
 @router.get("/knowledge-graph/{knowledge_id}")
 async def get_knowledge_graph(
     knowledge_id: int = Path(..., ge=1)
@@ -1006,11 +1031,16 @@ async def upload_knowledge_file(
         # Determine content type based on uploaded files
         file_types = set()
         
+        # Files to upload, with their storage details
+        pending = []
+        uploads = []
+        
         for file in files:
             try:
-                # Read file content
-                content = await file.read()
-                file_size = len(content)
+                # Stream the spooled upload instead of reading it into memory
+                file.file.seek(0, os.SEEK_END)
+                file_size = file.file.tell()
+                file.file.seek(0)
                 
                 # Generate unique filename to avoid conflicts
                 file_extension = os.path.splitext(file.filename)[1].lower()
@@ -1030,18 +1060,31 @@ async def upload_knowledge_file(
                     file_path = f"misc/{knowledge_id}/{unique_filename}"
                     file_types.add("other")
                 
-                # Upload to storage
-                upload_result = storage.upload_file(
-                    file_data=content,
-                    object_name=file_path,
-                    content_type=file.content_type or "application/octet-stream",
-                    metadata={
+                pending.append((file, unique_filename, file_path, file_size))
+                uploads.append({
+                    "file_data": file.file,
+                    "object_name": file_path,
+                    "content_type": file.content_type or "application/octet-stream",
+                    "metadata": {
                         "knowledge_id": str(knowledge_id),
                         "original_filename": file.filename,
                         "uploaded_at": datetime.utcnow().isoformat()
-                    }
-                )
+                    },
+                    "length": file_size
+                })
                 
+            except Exception as file_error:
+                logger.error(f"Error processing file {file.filename}: {str(file_error)}")
+                failed_files.append({
+                    "filename": file.filename,
+                    "error": str(file_error)
+                })
+        
+        # Upload all files to storage concurrently
+        upload_results = await asyncio.to_thread(storage.upload_files, uploads)
+        
+        for (file, unique_filename, file_path, file_size), upload_result in zip(pending, upload_results):
+            try:
                 if upload_result["success"]:
                     # Add media record to database
                     media_file = db_manager.add_media_file(
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from openai_client import OpenAIClient
+from openai_functions import (
+    generate_notes, generate_summary, generate_questions, generate_mind_map_structure
+)
+from text_chunker import count_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Generation calls in flight at once, across every request and job in the process
+CONTENT_GENERATION_CONCURRENCY = int(os.getenv("CONTENT_GENERATION_CONCURRENCY", "8"))
+# Prompt plus expected output tokens in flight at once; 0 disables the token budget
+CONTENT_GENERATION_TOKEN_BUDGET = int(os.getenv("CONTENT_GENERATION_TOKEN_BUDGET", "32768"))
+# Output tokens budgeted for each (chapter, type) task on top of the chapter text
+CONTENT_GENERATION_OUTPUT_TOKENS = int(os.getenv("CONTENT_GENERATION_OUTPUT_TOKENS", "1024"))
+
+TYPE_GENERATORS = {
+    "notes": generate_notes,
+    "summary": generate_summary,
+    "quiz": generate_questions,
+    "mindmap": generate_mind_map_structure,
+}
+
+
+@dataclass
+class GenerationResult:
+    """Outcome of generating one content type for one chapter."""
+    chapter: Any
+    content_type: str
+    content: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class GenerationLimiter:
+    """
+    Caps concurrent generation calls and the tokens they carry, across the process.
+
+    A task holds one slot and its estimated token cost while it runs. A task
+    costing more than the whole budget still runs, but only on its own.
+
+    The API server and the queue's job loop run separate event loops, so the
+    counts live under a thread lock rather than in asyncio primitives, and a
+    waiting task is woken on its own loop. Waiters are admitted in arrival order.
+    """
+
+    def __init__(self, max_concurrency: int, token_budget: int):
+        self.max_concurrency = max_concurrency
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        # Each waiter is [tokens, future, granted]
+        self._waiters: Deque[list] = deque()
+        self.in_flight = 0
+        self.tokens_in_flight = 0
+
+    def _fits(self, tokens: int) -> bool:
+        return self.in_flight < self.max_concurrency and (
+            self.token_budget <= 0 or self.tokens_in_flight + tokens <= self.token_budget
+        )
+
+    def _admit(self) -> None:
+        """Grant capacity to waiters at the head of the queue. Caller holds _lock."""
+        while self._waiters and self._fits(self._waiters[0][0]):
+            waiter = self._waiters.popleft()
+            tokens, future = waiter[0], waiter[1]
+            try:
+                future.get_loop().call_soon_threadsafe(
+                    lambda future=future: future.done() or future.set_result(None)
+                )
+            except RuntimeError:
+                # The waiter's loop has closed; nobody will use the capacity
+                continue
+            waiter[2] = True
+            self.in_flight += 1
+            self.tokens_in_flight += tokens
+
+    async def acquire(self, tokens: int) -> int:
+        tokens = min(tokens, self.token_budget) if self.token_budget > 0 else 0
+        with self._lock:
+            if not self._waiters and self._fits(tokens):
+                self.in_flight += 1
+                self.tokens_in_flight += tokens
+                return tokens
+            waiter = [tokens, asyncio.get_running_loop().create_future(), False]
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except BaseException:
+            with self._lock:
+                if waiter[2]:
+                    # Granted just as the wait was cancelled; hand the capacity on
+                    self.in_flight -= 1
+                    self.tokens_in_flight -= tokens
+                else:
+                    self._waiters.remove(waiter)
+                self._admit()
+            raise
+        return tokens
+
+    async def release(self, tokens: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.tokens_in_flight -= tokens
+            self._admit()
+
+
+_generation_limiter: Optional[GenerationLimiter] = None
+_generation_limiter_lock = threading.Lock()
+
+
+def get_generation_limiter() -> GenerationLimiter:
+    """Get the process-wide generation limiter, shared by every event loop."""
+    global _generation_limiter
+    with _generation_limiter_lock:
+        if _generation_limiter is None:
+            _generation_limiter = GenerationLimiter(CONTENT_GENERATION_CONCURRENCY, CONTENT_GENERATION_TOKEN_BUDGET)
+        return _generation_limiter
+
+
+class ContentGenerationOrchestrator:
+    """
+    Generates every requested content type for a set of chapters concurrently.
+
+    All (chapter, type) tasks are scheduled at once and throttled by the shared
+    GenerationLimiter, so wall time is bounded by model throughput rather than
+    by the latency of each call. Upstream rate limits are honoured by the
+    OpenAI client, which pauses every caller sharing it when one is throttled.
+    Results are handed to callbacks as they complete so callers can persist
+    them without waiting for the whole course.
+    """
+
+    def __init__(self, openai_client: OpenAIClient, limiter: Optional[GenerationLimiter] = None):
+        self.openai_client = openai_client
+        self.limiter = limiter
+
+    @staticmethod
+    def supported_types(types: List[str]) -> List[str]:
+        return [t for t in types if t in TYPE_GENERATORS]
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return count_tokens(text) + CONTENT_GENERATION_OUTPUT_TOKENS
+
+    async def generate(self, chapter: Any, content_type: str, language: str, tokens: int) -> GenerationResult:
+        """Generate one content type for one chapter once the limiter admits it."""
+        limiter = self.limiter or get_generation_limiter()
+        held = await limiter.acquire(tokens)
+        started = time.monotonic()
+        try:
+            logger.info(f"Generating {content_type} for chapter {chapter.id}")
+            generated = await TYPE_GENERATORS[content_type](self.openai_client, chapter.content or "", language)
+            if content_type in ("notes", "summary") and isinstance(generated, list):
+                # Join the chunked results with a delimiter for storage
+                generated = "|||||".join(generated)
+            logger.info(f"Generated {content_type} for chapter {chapter.id} in {time.monotonic() - started:.1f}s")
+            return GenerationResult(chapter, content_type, content=generated)
+        except Exception as e:
+            logger.error(f"Error generating {content_type} for chapter {chapter.id}: {str(e)}")
+            return GenerationResult(chapter, content_type, error=str(e))
+        finally:
+            await limiter.release(held)
+
+    async def run(
+        self,
+        chapters: List[Any],
+        types: List[str],
+        language: str,
+        on_result: Optional[Callable[[GenerationResult], Awaitable[None]]] = None,
+        on_chapter: Optional[Callable[[Any, List[GenerationResult]], Awaitable[None]]] = None,
+    ) -> Dict[str, List[GenerationResult]]:
+        """
+        Generate all types for all chapters.
+
+        Args:
+            chapters: Chapters with id and content attributes
+            types: Content types to generate; unsupported types are skipped
+            language: The language for the content
+            on_result: Awaited with each result as soon as it completes
+            on_chapter: Awaited with a chapter and its results once all its types complete
+
+        Returns:
+            Dict[str, List[GenerationResult]]: Results per chapter id, in the requested type order
+        """
+        types = self.supported_types(types)
+        results: Dict[str, List[GenerationResult]] = {chapter.id: [] for chapter in chapters}
+
+        async def handle(task: "asyncio.Task[GenerationResult]") -> None:
+            result = await task
+            if on_result is not None:
+                await on_result(result)
+            chapter_results = results[result.chapter.id]
+            chapter_results.append(result)
+            if len(chapter_results) == len(types):
+                chapter_results.sort(key=lambda r: types.index(r.content_type))
+                if on_chapter is not None:
+                    await on_chapter(result.chapter, chapter_results)
+
+        # Chapter-major order so the first chapters are admitted, and finished, first
+        tasks = []
+        for chapter in chapters:
+            tokens = self.estimate_tokens(chapter.content or "")
+            for content_type in types:
+                tasks.append(asyncio.create_task(self.generate(chapter, content_type, language, tokens)))
+
+        logger.info(f"Scheduled {len(tasks)} generation tasks for {len(chapters)} chapters")
+        try:
+            await asyncio.gather(*(handle(task) for task in tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
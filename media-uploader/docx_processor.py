@@ -1,8 +1,6 @@
 import logging
-import base64
 import io
 import re
-import hashlib
 import statistics
 from typing import Dict, Tuple, List, Any, Optional, Set
 from dataclasses import dataclass
@@ -12,7 +10,8 @@ import docx
 from docx.document import Document as DocxDocument
 from docx.text.paragraph import Paragraph
 from docx.text.run import Run
-from PIL import Image
+
+from image_pipeline import ExtractedImage, ImageCollector
 
 # Reuse TextBlock from pdf_processor.py
 @dataclass
@@ -235,53 +234,20 @@ class DOCXProcessor:
         return document
     
     @staticmethod
-    def extract_images(docx_document: DocxDocument) -> Dict[str, Any]:
-        """Extract images from a DOCX document."""
-        images = {}
-        image_index = 0
+    def extract_images(docx_document: DocxDocument) -> Dict[str, ExtractedImage]:
+        """Extract images from a DOCX document, keyed by filename."""
+        collector = ImageCollector()
         
         # Process document parts for images
         for rel in docx_document.part.rels.values():
             if "image" in rel.target_ref:
                 try:
-                    # Get image data
-                    image_part = rel.target_part
-                    image_bytes = image_part.blob
-                    
-                    # Create a PIL image to get properties
-                    image_stream = io.BytesIO(image_bytes)
-                    pil_image = Image.open(image_stream)
-                    
-                    # Determine image format
-                    image_format = pil_image.format.lower() if pil_image.format else "png"
-                    
-                    # Create unique image ID
-                    image_hash = hashlib.md5(image_bytes).hexdigest()[:10]
-                    image_filename = f"img_{image_index}_{image_hash}.{image_format}"
-                    
-                    # Check if image is too small (likely an icon or bullet)
-                    if pil_image.width < 20 or pil_image.height < 20:
-                        continue
-                        
-                    # Convert to base64
-                    img_b64 = base64.b64encode(image_bytes).decode()
-                    
-                    # Store image with metadata
-                    images[image_filename] = {
-                        "data": img_b64,
-                        "format": image_format,
-                        "width": pil_image.width,
-                        "height": pil_image.height,
-                        "page": 0,  # DOCX doesn't have explicit pages like PDF
-                        "mode": pil_image.mode,
-                        "hash": image_hash
-                    }
-                    
-                    image_index += 1
+                    # DOCX doesn't have explicit pages like PDF
+                    collector.add(rel.target_part.blob, page=0)
                 except Exception as img_error:
-                    logger.error(f"Error extracting image {image_index}: {str(img_error)}")
+                    logger.error(f"Error extracting image {rel.target_ref}: {str(img_error)}")
         
-        return images
+        return collector.by_filename()
     
     @staticmethod
     def document_to_text(document: Dict) -> str:
@@ -399,47 +365,3 @@ class DOCXProcessor:
         """Reuse the PDF text to index processing logic."""
         from pdf_processor import PDFProcessor
         return PDFProcessor.process_pdf_text_to_index(text, knowledge_id, knowledge_name)
-    
-    @staticmethod
-    def prepare_images_for_upload(images: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-        """
-        Prepare extracted images for upload - custom implementation for DOCX.
-        
-        Args:
-            images: Dictionary of images extracted from DOCX
-            
-        Returns:
-            Dictionary ready for upload with standardized metadata and buffer
-        """
-        upload_ready = {}
-        
-        for filename, img_data in images.items():
-            # Extract the base64 encoded data
-            img_base64 = img_data.get("data", "")
-            
-            # Convert base64 to bytes for upload
-            img_bytes = base64.b64decode(img_base64) if img_base64 else b""
-            
-            # Get image format
-            img_format = img_data.get("format", "png")
-            
-            # Create standardized metadata
-            upload_ready[filename] = {
-                "buffer": img_bytes,  # Add the bytes data as buffer
-                "format": img_format,
-                "width": img_data.get("width", 0),
-                "height": img_data.get("height", 0),
-                "page": img_data.get("page", 1),
-                "metadata": {
-                    "filename": filename,
-                    "format": img_format,
-                    "width": img_data.get("width", 0),
-                    "height": img_data.get("height", 0),
-                    "page": img_data.get("page", 1),
-                    "mode": img_data.get("mode", ""),
-                    "hash": img_data.get("hash", ""),
-                    "size_bytes": len(img_bytes) if img_bytes else 0
-                }
-            }
-        
-        return upload_ready 
\ No newline at end of file
@@ -0,0 +1,297 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Images narrower or shorter than this are icons or bullets and are dropped
+IMAGE_MIN_SIDE = int(os.getenv("IMAGE_MIN_SIDE", "20"))
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "256"))
+# Storage keys known to exist, so repeated images skip the existence check
+IMAGE_KNOWN_KEYS = int(os.getenv("IMAGE_KNOWN_KEYS", "100000"))
+
+IMAGE_PREFIX = "images/sha256"
+THUMBNAIL_PREFIX = "thumbnails"
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class MemoryviewReader(io.RawIOBase):
+    """Read-only file object over a memoryview, so readers do not need a full copy of the bytes."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+@dataclass
+class ExtractedImage:
+    """
+    An image extracted from a document, kept as its original encoded bytes.
+
+    Images are identified by the SHA-256 of those bytes, which also names their
+    storage object, so the same image is stored once however many documents
+    or slides contain it.
+    """
+    data: memoryview
+    digest: str
+    format: str
+    width: int
+    height: int
+    page: int = 0
+    mode: str = ""
+    caption: Optional[str] = None
+
+    # memoryviews cannot be pickled; send bytes across the ingestion process boundary
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["data"] = self.data.tobytes()
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        state["data"] = memoryview(state["data"])
+        self.__dict__.update(state)
+
+    @property
+    def size(self) -> int:
+        return self.data.nbytes
+
+    @property
+    def filename(self) -> str:
+        return f"img_{self.page}_{self.digest[:10]}.{self.format}"
+
+    @property
+    def object_name(self) -> str:
+        return f"{IMAGE_PREFIX}/{self.digest[:2]}/{self.digest}.{self.format}"
+
+    @property
+    def content_type(self) -> str:
+        return "image/jpeg" if self.format in ("jpg", "jpeg") else f"image/{self.format}"
+
+    def reader(self) -> MemoryviewReader:
+        return MemoryviewReader(self.data)
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "page": self.page,
+            "format": self.format,
+            "mode": self.mode,
+            "sha256": self.digest,
+            "size_bytes": self.size,
+            "caption": self.caption,
+        }
+
+
+class ImageCollector:
+    """Collects the images of one document, dropping tiny images and exact duplicates."""
+
+    def __init__(self, min_side: int = IMAGE_MIN_SIDE):
+        self.min_side = min_side
+        self.images: "OrderedDict[str, ExtractedImage]" = OrderedDict()
+        self.duplicates = 0
+
+    def add(
+        self,
+        data: BytesLike,
+        page: int = 0,
+        caption: Optional[str] = None,
+        format: Optional[str] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+    ) -> Optional[ExtractedImage]:
+        """
+        Add an image by its encoded bytes.
+
+        Format and size are read from the image header when not given; the
+        pixels are never decoded. Returns the collected image, or None if the
+        image is unreadable or too small.
+        """
+        if not data:
+            return None
+        view = memoryview(data)
+        digest = hashlib.sha256(view).hexdigest()
+        existing = self.images.get(digest)
+        if existing is not None:
+            self.duplicates += 1
+            return existing
+
+        mode = ""
+        if format is None or not width or not height:
+            try:
+                with Image.open(MemoryviewReader(view)) as probe:
+                    format = format or (probe.format or "png").lower()
+                    width, height = probe.size
+                    mode = probe.mode
+            except Exception as e:
+                logger.warning(f"Skipping unreadable image on page {page}: {str(e)}")
+                return None
+
+        if width < self.min_side or height < self.min_side:
+            return None
+
+        image = ExtractedImage(
+            data=view,
+            digest=digest,
+            format=format.lower(),
+            width=width,
+            height=height,
+            page=page,
+            mode=mode,
+            caption=caption,
+        )
+        self.images[digest] = image
+        return image
+
+    def by_filename(self) -> Dict[str, ExtractedImage]:
+        """The collected images keyed by their legacy per-document filenames."""
+        return {image.filename: image for image in self.images.values()}
+
+
+# Storage keys uploaded or seen by this process, least recently used first
+_known_keys: "OrderedDict[str, None]" = OrderedDict()
+_known_keys_lock = threading.Lock()
+
+
+def _is_known(object_name: str) -> bool:
+    with _known_keys_lock:
+        if object_name in _known_keys:
+            _known_keys.move_to_end(object_name)
+            return True
+        return False
+
+
+def _remember(object_name: str) -> None:
+    with _known_keys_lock:
+        _known_keys[object_name] = None
+        _known_keys.move_to_end(object_name)
+        while len(_known_keys) > IMAGE_KNOWN_KEYS:
+            _known_keys.popitem(last=False)
+
+
+def upload_images(
+    images: Dict[str, ExtractedImage],
+    metadata: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Upload images to content-addressed storage keys, concurrently.
+
+    Each distinct image is uploaded at most once; images already in storage,
+    from this or any earlier document, are only linked.
+
+    Args:
+        images: Images keyed by filename
+        metadata: Object metadata stored with newly uploaded images
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per filename, success plus url, file_path and
+        metadata, or an error
+    """
+    from storage import storage
+
+    # Several filenames can share one image; upload each digest once
+    by_digest: Dict[str, ExtractedImage] = {}
+    for image in images.values():
+        by_digest.setdefault(image.digest, image)
+    if not by_digest:
+        return {}
+
+    pending = [image for image in by_digest.values() if not _is_known(image.object_name)]
+    upload_results = storage.upload_files([
+        {
+            "file_data": image.reader(),
+            "object_name": image.object_name,
+            "content_type": image.content_type,
+            "metadata": metadata or {},
+            "length": image.size,
+        }
+        for image in pending
+    ], skip_existing=True)
+    failed = {
+        image.digest: result.get("error")
+        for image, result in zip(pending, upload_results)
+        if not result["success"]
+    }
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for digest, image in by_digest.items():
+        if digest in failed:
+            results[digest] = {"success": False, "error": failed[digest], "file_path": image.object_name}
+            continue
+        _remember(image.object_name)
+        results[digest] = {
+            "success": True,
+            "url": storage.generate_presigned_url(image.object_name),
+            "file_path": image.object_name,
+            "metadata": image.metadata(),
+        }
+    return {filename: results[image.digest] for filename, image in images.items()}
+
+
+def get_thumbnail(digest: str, size: int = IMAGE_THUMBNAIL_SIZE) -> Optional[str]:
+    """
+    Storage key of an image's thumbnail, creating it on first request.
+
+    Returns None if no image with that digest is stored.
+    """
+    from storage import storage
+
+    thumbnail_name = f"{THUMBNAIL_PREFIX}/{size}/{digest[:2]}/{digest}.jpg"
+    if _is_known(thumbnail_name) or storage.object_exists(thumbnail_name):
+        _remember(thumbnail_name)
+        return thumbnail_name
+
+    originals = storage.list_files(prefix=f"{IMAGE_PREFIX}/{digest[:2]}/{digest}.")
+    if not originals:
+        return None
+    data = storage.download_file(originals[0]["object_name"])
+    if not data:
+        return None
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+
+    result = storage.upload_file(
+        file_data=buffer.getbuffer(),
+        object_name=thumbnail_name,
+        content_type="image/jpeg",
+    )
+    if not result["success"]:
+        raise RuntimeError(f"Failed to store thumbnail: {result.get('error')}")
+    _remember(thumbnail_name)
+    return thumbnail_name
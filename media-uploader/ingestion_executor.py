@@ -0,0 +1,359 @@
+import itertools
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, Future, CancelledError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+import multiprocessing
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v']
+
+
+class FileProcessingTimeout(Exception):
+    """Raised when extraction of a single file exceeds its time budget."""
+
+
+def _raise_timeout(signum, frame):
+    raise FileProcessingTimeout("File processing timed out")
+
+
+def extract_media_file(
+    media_id: int,
+    original_filename: str,
+    file_path: str,
+    knowledge_id: int,
+    knowledge_name: str,
+    timeout: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Download and extract a single media file. Runs inside a pool worker process.
+
+    The file is fetched from storage inside the worker so large uploads are never
+    pickled across the process boundary.
+
+    Returns:
+        Dict with file_type, markdown, images, metadata, textbook and chapters.
+        images maps filenames to image_pipeline.ExtractedImage.
+        textbook/chapters are None for plain text files, which the caller indexes.
+    """
+    # Enforce the per-file timeout inside the worker so it can recover its slot
+    use_alarm = timeout and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(int(timeout))
+
+    try:
+        from storage import storage
+
+        file_extension = os.path.splitext(original_filename)[1].lower()
+        lower_name = original_filename.lower()
+
+        if file_extension in VIDEO_EXTENSIONS:
+            from video_processor_v2 import VideoProcessorV2, MediaProbe
+
+            # Stream the video to disk once and probe it; it never sits in memory
+            with MediaProbe.from_storage(file_path, suffix=file_extension) as media:
+                textbook, chapters = VideoProcessorV2.process_video_to_chapters(
+                    media,
+                    knowledge_id=knowledge_id,
+                    knowledge_name=knowledge_name
+                )
+            return {
+                "file_type": "video",
+                "markdown": None,
+                "images": {},
+                "metadata": {},
+                "textbook": textbook,
+                "chapters": chapters
+            }
+
+        file_data = storage.download_file(file_path)
+        if not file_data:
+            raise ValueError(f"Could not download file: {file_path}")
+
+        if lower_name.endswith(('.md', '.txt')):
+            markdown = file_data.decode('utf-8') if isinstance(file_data, bytes) else file_data
+            return {
+                "file_type": "text",
+                "markdown": markdown,
+                "images": {},
+                "metadata": {
+                    "file_type": "text",
+                    "original_filename": original_filename,
+                    "processed_at": datetime.utcnow().isoformat()
+                },
+                "textbook": None,
+                "chapters": None
+            }
+
+        if lower_name.endswith('.docx'):
+            from docx_processor import DOCXProcessor
+            processor = DOCXProcessor
+            markdown, images, metadata = DOCXProcessor.process_docx(file_data)
+            file_type = "docx"
+        elif lower_name.endswith('.pptx'):
+            from pptx_processor import PPTXProcessor
+            processor = PPTXProcessor
+            markdown, images, metadata = PPTXProcessor.process_pptx(file_data)
+            file_type = "pptx"
+        else:
+            # PDF, and fallback to the PDF processor for unknown document types
+            from pdf_processor import PDFProcessor
+            processor = PDFProcessor
+            result = PDFProcessor.process_pdf(file_data)
+            if result is None:
+                raise ValueError(f"Unsupported file type: {original_filename}")
+            markdown, images, metadata = result
+            file_type = "pdf" if lower_name.endswith('.pdf') else "document"
+
+        textbook, chapters = processor.process_text_to_index(
+            markdown,
+            knowledge_id=knowledge_id,
+            knowledge_name=knowledge_name
+        )
+        return {
+            "file_type": file_type,
+            "markdown": markdown,
+            "images": images,
+            "metadata": metadata,
+            "textbook": textbook,
+            "chapters": chapters
+        }
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+# Set in each pool worker: where it announces the files it starts
+_started_queue = None
+
+
+def _init_worker(started_queue) -> None:
+    global _started_queue
+    _started_queue = started_queue
+    # This pool already caps extraction processes; PDF pages are extracted in-process here
+    # rather than each worker starting a page pool of its own
+    os.environ["PDF_PAGE_WORKERS"] = "0"
+
+
+def _run_file(task_id: int, extract, *args) -> Dict[str, Any]:
+    """Announce that a file has started, then extract it. Runs inside a pool worker process."""
+    _started_queue.put(task_id)
+    return extract(*args)
+
+
+class IngestionExecutor:
+    """
+    Process pool that runs per-file extraction in parallel.
+
+    A single pool is shared by every ingestion worker in the process, so its size
+    caps CPU-bound extraction across all knowledge entries being processed.
+
+    A file that overruns its deadline without honouring the in-worker alarm (for
+    example a worker stuck in C code) is abandoned and its pool is killed and
+    replaced, so a stuck worker never holds a slot for good. Files that were
+    running on the killed pool are resubmitted to the new one.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        file_timeout: Optional[int] = None,
+        video_timeout: Optional[int] = None,
+    ):
+        """Initialize the executor; the pool itself is created lazily."""
+        self.max_workers = max_workers or int(os.getenv("INGEST_POOL_SIZE", str(os.cpu_count() or 2)))
+        self.file_timeout = file_timeout or int(os.getenv("INGEST_FILE_TIMEOUT", "1800"))
+        self.video_timeout = video_timeout or int(os.getenv("INGEST_VIDEO_TIMEOUT", "7200"))
+        # Grace period on top of the in-worker alarm before the parent gives up on a file
+        self.timeout_grace = 30
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._started_queue = None
+        self._lock = threading.Lock()
+        # When each submitted file actually started running in a worker, by task ID
+        self._task_ids = itertools.count()
+        self._start_times: Dict[int, float] = {}
+        # Pools killed over a timeout; files lost with them are resubmitted rather than failed
+        self._killed_pools: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Get the process pool, creating it on first use."""
+        with self._lock:
+            if self._pool is None:
+                # spawn: the parent runs queue worker threads, which fork does not handle safely
+                context = multiprocessing.get_context("spawn")
+                self._started_queue = context.Queue()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._started_queue,)
+                )
+                logger.info(f"Started ingestion process pool with {self.max_workers} workers")
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next submission creates a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _kill_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Kill a pool's worker processes, including ones that ignore signals, and drop the pool."""
+        with self._lock:
+            self._killed_pools.add(pool)
+        # ProcessPoolExecutor has no public way to stop a worker that is mid-task
+        for process in list((pool._processes or {}).values()):
+            process.kill()
+        self._reset_pool(pool)
+
+    def _submit(self, media_file: Any, knowledge_id: int, knowledge_name: str, timeout: int) -> Tuple[Future, ProcessPoolExecutor, int]:
+        """Submit one file to the current pool."""
+        pool = self._get_pool()
+        task_id = next(self._task_ids)
+        future = pool.submit(
+            _run_file,
+            task_id,
+            extract_media_file,
+            media_file.id,
+            media_file.original_filename,
+            media_file.file_path,
+            knowledge_id,
+            knowledge_name,
+            timeout
+        )
+        return future, pool, task_id
+
+    def _started_at(self, task_id: int) -> Optional[float]:
+        """When a file started running, or None while it is still queued."""
+        with self._lock:
+            started_queue = self._started_queue
+            if started_queue is not None:
+                now = time.monotonic()
+                try:
+                    while True:
+                        self._start_times[started_queue.get_nowait()] = now
+                except queue.Empty:
+                    pass
+            return self._start_times.get(task_id)
+
+    def timeout_for(self, original_filename: str) -> int:
+        """Per-file timeout in seconds, longer for videos."""
+        extension = os.path.splitext(original_filename)[1].lower()
+        return self.video_timeout if extension in VIDEO_EXTENSIONS else self.file_timeout
+
+    def process_files(
+        self,
+        media_files: List[Any],
+        knowledge_id: int,
+        knowledge_name: str,
+        on_complete=None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract all media files of a knowledge entry in parallel.
+
+        Args:
+            media_files: Media rows with id, original_filename and file_path
+            knowledge_id: ID of the knowledge entry
+            knowledge_name: Name of the knowledge entry
+            on_complete: Optional callback(media_file, result) invoked as each file finishes
+
+        Returns:
+            One result per media file, in the same order as media_files. Failed
+            files have an "error" key instead of extraction output.
+        """
+        futures: Dict[Future, Any] = {}
+        results: Dict[int, Dict[str, Any]] = {}
+
+        def finish(index: int, media_file: Any, result: Dict[str, Any]) -> None:
+            results[index] = result
+            if on_complete:
+                on_complete(media_file, result)
+
+        for index, media_file in enumerate(media_files):
+            timeout = self.timeout_for(media_file.original_filename)
+            future, pool, task_id = self._submit(media_file, knowledge_id, knowledge_name, timeout)
+            futures[future] = (index, media_file, timeout, pool, task_id)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+
+            for future in done:
+                index, media_file, timeout, pool, task_id = futures.pop(future)
+                with self._lock:
+                    self._start_times.pop(task_id, None)
+                try:
+                    result = future.result()
+                except (BrokenProcessPool, CancelledError) as e:
+                    if pool in self._killed_pools:
+                        # Lost with a pool killed over another file's timeout; not this file's fault
+                        logger.info(f"Resubmitting {media_file.original_filename} after its pool was replaced")
+                        future, pool, task_id = self._submit(media_file, knowledge_id, knowledge_name, timeout)
+                        futures[future] = (index, media_file, timeout, pool, task_id)
+                        pending.add(future)
+                        continue
+                    logger.error(f"Error extracting file {media_file.original_filename}: {str(e) or type(e).__name__}")
+                    self._reset_pool(pool)
+                    result = {"error": str(e) or "Extraction worker was lost"}
+                except Exception as e:
+                    logger.error(f"Error extracting file {media_file.original_filename}: {str(e)}")
+                    result = {"error": str(e)}
+                finish(index, media_file, result)
+
+            # Start each file's clock when a worker picks it up, not when it was queued
+            for future in list(pending):
+                index, media_file, timeout, pool, task_id = futures[future]
+                started_at = self._started_at(task_id)
+                if started_at is not None and now > started_at + timeout + self.timeout_grace:
+                    # The worker ignored its alarm; only killing the process recovers its slot
+                    logger.error(f"Abandoning {media_file.original_filename} after {timeout}s timeout, recycling the pool")
+                    pending.discard(future)
+                    del futures[future]
+                    with self._lock:
+                        self._start_times.pop(task_id, None)
+                    self._kill_pool(pool)
+                    finish(index, media_file, {"error": f"Processing timed out after {timeout} seconds"})
+
+        return [results[index] for index in range(len(media_files))]
+
+    def shutdown(self) -> None:
+        """Shut down the process pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Process-wide executor shared by all ingestion workers
+_ingestion_executor: Optional[IngestionExecutor] = None
+_ingestion_executor_lock = threading.Lock()
+
+
+def get_ingestion_executor() -> IngestionExecutor:
+    """Get the process-wide IngestionExecutor."""
+    global _ingestion_executor
+    with _ingestion_executor_lock:
+        if _ingestion_executor is None:
+            _ingestion_executor = IngestionExecutor()
+        return _ingestion_executor
+
+
+def shutdown_ingestion_executor() -> None:
+    """Shut down the process-wide IngestionExecutor's pool, if it was created."""
+    with _ingestion_executor_lock:
+        if _ingestion_executor is not None:
+            _ingestion_executor.shutdown()
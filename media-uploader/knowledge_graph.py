@@ -1,6 +1,7 @@
 import logging
 import os
 import uuid
+from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
 
 from neo4j import GraphDatabase
@@ -321,8 +322,23 @@ class Neo4jGraphService:
         
         return GraphQueryResult(nodes=nodes, relationships=relationships)
     
+    # Concepts are MERGEd by name from concurrent syncs; uniqueness makes that race-free
+    CONCEPT_NAME_CONSTRAINT = "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Concept) REQUIRE n.name IS UNIQUE"
+
     def create_schema_constraints(self) -> None:
-        """Create necessary database constraints and indexes"""
+        """
+        Create necessary database constraints and indexes.
+
+        Duplicate Concept nodes left by earlier unconstrained writes are merged
+        first. Raises if the Concept name constraint still cannot be created,
+        since concurrent syncs would otherwise silently create duplicates again.
+        """
+        if self.connected:
+            self.merge_duplicate_concepts()
+            with self.driver.session() as session:
+                session.run(self.CONCEPT_NAME_CONSTRAINT).consume()
+            logger.info(f"Created constraint/index: {self.CONCEPT_NAME_CONSTRAINT}")
+
         constraints = [
             "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Knowledge) REQUIRE n.id IS UNIQUE",
             "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Concept) REQUIRE n.id IS UNIQUE",
@@ -340,77 +356,85 @@ class Neo4jGraphService:
             except Exception as e:
                 logger.error(f"Error creating constraint/index '{constraint}': {str(e)}")
     
-    def build_knowledge_graph(self, knowledge_id: int, chapters: List[Dict[str, Any]]) -> None:
-        """Build a knowledge graph from chapters"""
-        # Create Knowledge node
-        knowledge_node = GraphNode(
-            labels=["Knowledge"],
-            properties={"knowledge_id": knowledge_id}
-        )
-        created_knowledge = self.create_node(knowledge_node)
-        
-        # Process each chapter
+    def merge_duplicate_concepts(self) -> int:
+        """
+        Merge Concept nodes that share a name into the oldest of them.
+
+        Every relationship of a duplicate is recreated on the kept node (with the
+        other end mapped to its kept node too) before the duplicates are deleted,
+        all in one transaction.
+
+        Returns:
+            int: Number of duplicate Concept nodes removed
+        """
+        def merge(tx) -> int:
+            groups = tx.run(
+                """
+                MATCH (c:Concept) WHERE c.name IS NOT NULL
+                WITH c ORDER BY c.created_at, elementId(c)
+                WITH c.name AS name, collect(elementId(c)) AS ids
+                WHERE size(ids) > 1
+                RETURN ids
+                """
+            ).value()
+            keeper = {dup: ids[0] for ids in groups for dup in ids[1:]}
+            if not keeper:
+                return 0
+
+            relationships = tx.run(
+                """
+                MATCH (dup)-[r]-(other)
+                WHERE elementId(dup) IN $dups
+                RETURN DISTINCT elementId(startNode(r)) AS start, elementId(endNode(r)) AS end,
+                       type(r) AS type, properties(r) AS properties
+                """,
+                {"dups": list(keeper)}
+            ).data()
+            rows_by_type: Dict[str, List[Dict[str, Any]]] = {}
+            for rel in relationships:
+                start, end = keeper.get(rel["start"], rel["start"]), keeper.get(rel["end"], rel["end"])
+                if start != end:
+                    rows_by_type.setdefault(rel["type"], []).append(
+                        {"start": start, "end": end, "properties": rel["properties"]}
+                    )
+            for rel_type, rows in rows_by_type.items():
+                # Relationship types cannot be parameters; these come from the database itself
+                tx.run(
+                    f"""
+                    UNWIND $rows AS row
+                    MATCH (a) WHERE elementId(a) = row.start
+                    MATCH (b) WHERE elementId(b) = row.end
+                    MERGE (a)-[r:`{rel_type.replace('`', '``')}`]-(b)
+                    ON CREATE SET r = row.properties
+                    """,
+                    {"rows": rows}
+                ).consume()
+
+            tx.run("MATCH (c) WHERE elementId(c) IN $dups DETACH DELETE c", {"dups": list(keeper)}).consume()
+            return len(keeper)
+
+        with self.driver.session() as session:
+            removed = session.execute_write(merge)
+        if removed:
+            logger.warning(f"Merged {removed} duplicate Concept nodes before enforcing unique names")
+        return removed
+
+    def build_knowledge_graph(self, knowledge_id: int, chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build a knowledge graph from chapters; chapters without an id are skipped and counted"""
+        chapter_rows = []
         for chapter in chapters:
-            # Create Chapter node
-            chapter_id = chapter.get("id") or chapter.get("chapter_id")
-            chapter_node = GraphNode(
-                labels=["Chapter"],
-                properties={
-                    "chapter_id": chapter_id,
-                    "knowledge_id": knowledge_id,
+            content = chapter.get("chapter", "")
+            chapter_rows.append({
+                "chapter_id": chapter.get("id") or chapter.get("chapter_id"),
+                "properties": {
                     "title": chapter.get("chaptertitle", ""),
-                    "content": chapter.get("chapter", "")[:1000]  # Limit content length
-                }
-            )
-            created_chapter = self.create_node(chapter_node)
-            
-            # Create relationship from Knowledge to Chapter
-            self.create_relationship(GraphRelationship(
-                start_node_id=created_knowledge.id,
-                end_node_id=created_chapter.id,
-                type="HAS_CHAPTER"
-            ))
-            
-            # Extract concepts from chapter
-            chapter_concepts = self._extract_concepts(chapter.get("chapter", ""))
-            
-            # Create concept nodes and relationships
-            for concept in chapter_concepts:
-                # Check if concept already exists
-                existing_concepts = self.execute_query(
-                    "MATCH (c:Concept {name: $name}) RETURN c",
-                    {"name": concept}
-                )
-                
-                concept_node = None
-                if existing_concepts and len(existing_concepts) > 0:
-                    # Use existing concept
-                    existing_concept = existing_concepts[0]["c"]
-                    concept_node = GraphNode(
-                        id=existing_concept["id"],
-                        labels=["Concept"],
-                        properties=dict(existing_concept)
-                    )
-                else:
-                    # Create new concept
-                    concept_node = self.create_node(GraphNode(
-                        labels=["Concept"],
-                        properties={"name": concept}
-                    ))
-                
-                # Create relationships
-                self.create_relationship(GraphRelationship(
-                    start_node_id=created_chapter.id,
-                    end_node_id=concept_node.id,
-                    type="CONTAINS_CONCEPT"
-                ))
-                
-                self.create_relationship(GraphRelationship(
-                    start_node_id=created_knowledge.id,
-                    end_node_id=concept_node.id,
-                    type="TEACHES_CONCEPT"
-                ))
-    
+                    "content": content[:1000]  # Limit content length
+                },
+                "concepts": self._extract_concepts(content)
+            })
+
+        return KnowledgeGraphWriter(self).write(knowledge_id, {}, chapter_rows)
+
     def _extract_concepts(self, text: str) -> List[str]:
         """
         Extract concepts from text
@@ -435,5 +459,193 @@ class Neo4jGraphService:
         
         return common_phrases + common_words
 
+class KnowledgeGraphWriter:
+    """
+    Writes a knowledge entry's chapters, concepts and edges in bulk.
+
+    Each step is a single ``UNWIND $rows ... MERGE`` statement run in batches of
+    batch_size rows, so a whole course takes a handful of transactions instead
+    of one round trip per node and relationship. MERGE makes rewrites idempotent.
+    Chapters are MERGEd on their chapter_id, so chapters without one are skipped
+    and reported rather than failing their whole batch.
+    """
+
+    MERGE_KNOWLEDGE = """
+    MERGE (k:Knowledge {knowledge_id: $knowledge_id})
+    ON CREATE SET k.id = randomUUID(), k.created_at = $now
+    SET k += $properties
+    RETURN k.id AS id
+    """
+
+    MERGE_CHAPTERS = """
+    UNWIND $rows AS row
+    MATCH (k:Knowledge {knowledge_id: $knowledge_id})
+    MERGE (c:Chapter {chapter_id: row.chapter_id, knowledge_id: $knowledge_id})
+    ON CREATE SET c.id = randomUUID(), c.created_at = $now
+    SET c += row.properties
+    MERGE (k)-[r:HAS_CHAPTER]->(c)
+    ON CREATE SET r.id = randomUUID()
+    """
+
+    MERGE_CONCEPTS = """
+    UNWIND $rows AS name
+    MATCH (k:Knowledge {knowledge_id: $knowledge_id})
+    MERGE (c:Concept {name: name})
+    ON CREATE SET c.id = randomUUID(), c.created_at = $now
+    MERGE (k)-[r:TEACHES_CONCEPT]->(c)
+    ON CREATE SET r.id = randomUUID()
+    """
+
+    MERGE_CHAPTER_CONCEPTS = """
+    UNWIND $rows AS row
+    MATCH (ch:Chapter {chapter_id: row.chapter_id, knowledge_id: $knowledge_id})
+    MATCH (c:Concept {name: row.concept})
+    MERGE (ch)-[r:CONTAINS_CONCEPT]->(c)
+    ON CREATE SET r.id = randomUUID()
+    """
+
+    # Co-occurrence counts chapters across all courses that contain both concepts,
+    # for every pair of concepts taught by this knowledge entry, in one aggregate pass
+    MERGE_RELATED_CONCEPTS = """
+    MATCH (k:Knowledge {knowledge_id: $knowledge_id})-[:TEACHES_CONCEPT]->(c1:Concept)
+    MATCH (ch:Chapter)-[:CONTAINS_CONCEPT]->(c1)
+    MATCH (ch)-[:CONTAINS_CONCEPT]->(c2:Concept)
+    WHERE c1.name < c2.name AND (k)-[:TEACHES_CONCEPT]->(c2)
+    WITH c1, c2, count(DISTINCT ch) AS co_count
+    MERGE (c1)-[r:RELATED_TO]-(c2)
+    ON CREATE SET r.id = randomUUID()
+    SET r.weight = co_count, r.co_occurrences = co_count
+    RETURN count(r) AS edges
+    """
+
+    def __init__(self, service: Neo4jGraphService, batch_size: Optional[int] = None):
+        self.service = service
+        self.batch_size = batch_size or int(os.getenv("NEO4J_WRITE_BATCH_SIZE", "500"))
+
+    def _write_batches(self, session, cypher: str, rows: List[Any], params: Dict[str, Any]) -> int:
+        """Run an UNWIND statement over rows in batches, one write transaction per batch."""
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            session.execute_write(lambda tx: tx.run(cypher, {**params, "rows": batch}).consume())
+        return (len(rows) + self.batch_size - 1) // self.batch_size
+
+    def write(
+        self,
+        knowledge_id: int,
+        knowledge_properties: Dict[str, Any],
+        chapters: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Write a knowledge node with its chapters and their concepts.
+
+        Args:
+            knowledge_id: ID of the knowledge entry
+            knowledge_properties: Properties set on the Knowledge node
+            chapters: Rows with chapter_id, properties and a list of concept names
+
+        Returns:
+            Dict with the Knowledge node id, counts of what was written and the
+            number of chapters skipped for lacking a chapter_id
+        """
+        skipped_chapters = sum(1 for chapter in chapters if chapter.get("chapter_id") is None)
+        if skipped_chapters:
+            logger.warning(f"Skipping {skipped_chapters} chapters without a chapter_id in knowledge graph {knowledge_id}")
+            chapters = [chapter for chapter in chapters if chapter.get("chapter_id") is not None]
+
+        if not self.service.connected:
+            logger.warning("Neo4j not connected - skipping knowledge graph write")
+            return {
+                "knowledge_node_id": None,
+                "chapters": 0,
+                "concepts": 0,
+                "transactions": 0,
+                "skipped_chapters": skipped_chapters
+            }
+
+        now = datetime.utcnow().isoformat()
+        params = {"knowledge_id": knowledge_id, "now": now}
+
+        chapter_rows = [
+            {"chapter_id": chapter["chapter_id"], "properties": chapter.get("properties", {})}
+            for chapter in chapters
+        ]
+        concept_names = list(dict.fromkeys(
+            concept for chapter in chapters for concept in chapter.get("concepts", [])
+        ))
+        chapter_concept_rows = [
+            {"chapter_id": chapter["chapter_id"], "concept": concept}
+            for chapter in chapters
+            for concept in dict.fromkeys(chapter.get("concepts", []))
+        ]
+
+        try:
+            with self.service.driver.session() as session:
+                knowledge_node_id = session.execute_write(
+                    lambda tx: tx.run(self.MERGE_KNOWLEDGE, {**params, "properties": knowledge_properties}).single()["id"]
+                )
+                transactions = 1
+                transactions += self._write_batches(session, self.MERGE_CHAPTERS, chapter_rows, params)
+                transactions += self._write_batches(session, self.MERGE_CONCEPTS, concept_names, params)
+                transactions += self._write_batches(session, self.MERGE_CHAPTER_CONCEPTS, chapter_concept_rows, params)
+        except Exception as e:
+            logger.error(f"Error writing knowledge graph for {knowledge_id}: {str(e)}")
+            raise
+
+        logger.info(
+            f"Wrote knowledge graph {knowledge_id}: {len(chapter_rows)} chapters, "
+            f"{len(concept_names)} concepts in {transactions} transactions"
+        )
+        return {
+            "knowledge_node_id": knowledge_node_id,
+            "chapters": len(chapter_rows),
+            "concepts": len(concept_names),
+            "transactions": transactions,
+            "skipped_chapters": skipped_chapters
+        }
+
+    def write_related_concepts(self, knowledge_id: int) -> int:
+        """
+        Create or update weighted RELATED_TO edges between co-occurring concepts.
+
+        Returns:
+            int: Number of RELATED_TO edges written
+        """
+        if not self.service.connected:
+            logger.warning("Neo4j not connected - skipping concept relationships")
+            return 0
+
+        try:
+            with self.service.driver.session() as session:
+                edges = session.execute_write(
+                    lambda tx: tx.run(self.MERGE_RELATED_CONCEPTS, {"knowledge_id": knowledge_id}).single()["edges"]
+                )
+        except Exception as e:
+            logger.error(f"Error writing concept relationships for {knowledge_id}: {str(e)}")
+            raise
+
+        logger.info(f"Wrote {edges} RELATED_TO edges for knowledge {knowledge_id}")
+        return edges
+
+    def set_sync_checkpoint(self, knowledge_id: int, source_updated_at: Optional[str]) -> None:
+        """Record the source updated_at a knowledge entry was last synced from."""
+        self.service.execute_query(
+            """
+            MATCH (k:Knowledge {knowledge_id: $knowledge_id})
+            SET k.source_updated_at = $source_updated_at, k.synced_at = $now
+            """,
+            {
+                "knowledge_id": knowledge_id,
+                "source_updated_at": source_updated_at,
+                "now": datetime.utcnow().isoformat()
+            }
+        )
+
+    def get_sync_checkpoints(self) -> Dict[int, Optional[str]]:
+        """Get the last-synced source updated_at of every Knowledge node."""
+        result = self.service.execute_query(
+            "MATCH (k:Knowledge) RETURN k.knowledge_id AS knowledge_id, k.source_updated_at AS source_updated_at"
+        )
+        return {record["knowledge_id"]: record["source_updated_at"] for record in result}
+
 # Create singleton instance - will not fail if Neo4j is unavailable
 graph_service = Neo4jGraphService() 
\ No newline at end of file
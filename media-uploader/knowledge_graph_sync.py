@@ -7,7 +7,8 @@ from datetime import datetime
 import json
 
 import httpx
-from knowledge_graph import graph_service, GraphNode, GraphRelationship
+from database import DatabaseManager, get_database_manager
+from knowledge_graph import graph_service, KnowledgeGraphWriter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,10 +17,24 @@ logger = logging.getLogger(__name__)
 class KnowledgeGraphSynchronizer:
     """Handles synchronization between Supabase and Neo4j knowledge graph"""
     
-    def __init__(self):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None):
+        self._db_manager = db_manager
         self.api_base_url = os.environ.get("API_BASE_URL", "http://localhost:8000")
         self.client = httpx.AsyncClient(base_url=self.api_base_url)
+        self.concurrency = int(os.environ.get("GRAPH_SYNC_CONCURRENCY", "4"))
+        self.progress: Dict[str, Any] = {"running": False}
         logger.info(f"KnowledgeGraphSynchronizer initialized with API_BASE_URL: {self.api_base_url}")
+    
+    @property
+    def db_manager(self) -> DatabaseManager:
+        if self._db_manager is None:
+            self._db_manager = get_database_manager()
+        return self._db_manager
+    
+    @staticmethod
+    def _version(updated_at: Optional[datetime]) -> Optional[str]:
+        """The checkpoint value for a knowledge entry's updated_at."""
+        return updated_at.isoformat() if updated_at is not None else None
         
     async def sync_knowledge(self, knowledge_id: int) -> Dict[str, Any]:
         """
@@ -32,6 +47,12 @@ class KnowledgeGraphSynchronizer:
             A dictionary with status and details of the sync operation
         """
         try:
+            # Read the version before the content, so an update made mid-sync is picked up next time
+            knowledge_record = await asyncio.to_thread(self.db_manager.get_knowledge, knowledge_id)
+            version = self._version(knowledge_record.updated_at)
+            if version is None:
+                raise ValueError(f"Knowledge ID {knowledge_id} has no updated_at to checkpoint")
+
             # Fetch knowledge details from FastAPI backend
             response = await self.client.get(f"/knowledge/{knowledge_id}")
             response.raise_for_status()
@@ -49,25 +70,26 @@ class KnowledgeGraphSynchronizer:
             # Build the knowledge graph
             logger.info(f"Building knowledge graph for knowledge ID {knowledge_id}")
 
-            # Create Knowledge node if it doesn't exist
-            knowledge_node = self._find_or_create_knowledge_node(knowledge)
-
-            # Process chapters to build the graph
-            await self._process_chapters(knowledge_id, chapters, knowledge_node.id)
+            # Write the Knowledge node, chapters and concepts in bulk
+            written = await self._process_chapters(knowledge, chapters)
 
             # Process relationships between concepts
-            await self._process_concept_relationships(knowledge_id)
+            related_edges = await self._process_concept_relationships(knowledge_id)
 
-            # No longer updating Supabase, so remove this part
-            # self.supabase.table("knowledge").update({
-            #     "graph_synced_at": datetime.utcnow().isoformat()
-            # }).eq("id", knowledge_id).execute()
+            # Checkpoint the source version so incremental syncs can skip this entry
+            await asyncio.to_thread(
+                KnowledgeGraphWriter(graph_service).set_sync_checkpoint,
+                knowledge_id,
+                version
+            )
 
             return {
                 "success": True,
                 "knowledge_id": knowledge_id,
                 "message": f"Successfully synchronized knowledge graph for {knowledge['name']}",
-                "nodes_created": len(chapters) + 1,  # +1 for knowledge node
+                "nodes_created": written["chapters"] + 1,  # +1 for knowledge node
+                "chapters_skipped": written["skipped_chapters"],
+                "related_edges": related_edges,
             }
 
         except httpx.HTTPStatusError as e:
@@ -77,231 +99,115 @@ class KnowledgeGraphSynchronizer:
             logger.error(f"Error synchronizing knowledge graph for ID {knowledge_id}: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def _find_or_create_knowledge_node(self, knowledge: Dict[str, Any]) -> GraphNode:
-        """Find or create a Knowledge node in Neo4j"""
-        # Check if Knowledge node already exists
-        knowledge_id = knowledge["id"]
-        existing = graph_service.execute_query(
-            "MATCH (k:Knowledge {knowledge_id: $knowledge_id}) RETURN k",
-            {"knowledge_id": knowledge_id}
-        )
-
-        if existing and len(existing) > 0:
-            logger.info(f"Knowledge node already exists for ID {knowledge_id}")
-            node = existing[0]["k"]
-            return GraphNode(
-                id=node["id"],
-                labels=["Knowledge"],
-                properties=dict(node)
-            )
-
-        # Create Knowledge node
-        knowledge_node = GraphNode(
-            labels=["Knowledge"],
-            properties={
-                "knowledge_id": knowledge_id,
-                "name": knowledge.get("name", ""),
-                "difficulty_level": knowledge.get("difficulty_level", "Intermediate"),
-                "target_audience": knowledge.get("target_audience", ""),
-                "prerequisites": knowledge.get("prerequisites", ""),
-                "summary": knowledge.get("summary", ""),
-                "created_at": datetime.utcnow().isoformat()
-            }
-        )
-
-        return graph_service.create_node(knowledge_node)
-
-    async def _process_chapters(self, knowledge_id: int, chapters: List[Dict[str, Any]], knowledge_node_id: str) -> None:
-        """Process chapters and add them to the knowledge graph"""
+    async def _process_chapters(self, knowledge: Dict[str, Any], chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write the Knowledge node, its chapters and their concepts to the graph in bulk"""
+        knowledge_properties = {
+            "name": knowledge.get("name", ""),
+            "difficulty_level": knowledge.get("difficulty_level", "Intermediate"),
+            "target_audience": knowledge.get("target_audience", ""),
+            "prerequisites": knowledge.get("prerequisites", ""),
+            "summary": knowledge.get("summary", "")
+        }
+
+        chapter_rows = []
         for chapter in chapters:
-            # Create Chapter node
-            chapter_id = chapter.get("id") or chapter.get("chapter_id")
-
-            # Check if Chapter node already exists
-            existing = graph_service.execute_query(
-                "MATCH (c:Chapter {chapter_id: $chapter_id, knowledge_id: $knowledge_id}) RETURN c",
-                {"chapter_id": chapter_id, "knowledge_id": knowledge_id}
-            )
-
-            chapter_node = None
-            if existing and len(existing) > 0:
-                # Update existing chapter node
-                node = existing[0]["c"]
-                chapter_node = GraphNode(
-                    id=node["id"],
-                    labels=["Chapter"],
-                    properties=dict(node)
-                )
-            else:
-                # Create new chapter node
-                chapter_node = graph_service.create_node(GraphNode(
-                    labels=["Chapter"],
-                    properties={
-                        "chapter_id": chapter_id,
-                        "knowledge_id": knowledge_id,
-                        "title": chapter.get("chaptertitle", ""),
-                        "subtitle": chapter.get("subtopic", ""),
-                        "content": chapter.get("chapter", "")[:1000],  # Limit content length
-                        "seq_num": chapter.get("id", 0),
-                        "created_at": datetime.utcnow().isoformat()
-                    }
-                ))
-
-                # Create relationship from Knowledge to Chapter
-                graph_service.create_relationship(GraphRelationship(
-                    start_node_id=knowledge_node_id,
-                    end_node_id=chapter_node.id,
-                    type="HAS_CHAPTER"
-                ))
-
-            # Process concepts within chapter content
-            await self._process_chapter_concepts(chapter_node.id, knowledge_node_id, chapter["chapter"])
-
-    async def _process_chapter_concepts(self, chapter_node_id: str, knowledge_node_id: str, content: str) -> None:
-        """Extract and process concepts from chapter content"""
-        concepts = graph_service._extract_concepts(content)
-
-        for concept in concepts:
-            # Check if concept already exists
-            existing = graph_service.execute_query(
-                "MATCH (c:Concept {name: $name}) RETURN c",
-                {"name": concept}
-            )
+            content = chapter.get("chapter", "")
+            chapter_rows.append({
+                "chapter_id": chapter.get("id") or chapter.get("chapter_id"),
+                "properties": {
+                    "title": chapter.get("chaptertitle", ""),
+                    "subtitle": chapter.get("subtopic", ""),
+                    "content": content[:1000],  # Limit content length
+                    "seq_num": chapter.get("id", 0)
+                },
+                "concepts": graph_service._extract_concepts(content)
+            })
+
+        # The neo4j driver is synchronous; keep the event loop free while it writes
+        writer = KnowledgeGraphWriter(graph_service)
+        return await asyncio.to_thread(writer.write, knowledge["id"], knowledge_properties, chapter_rows)
+
+    async def _process_concept_relationships(self, knowledge_id: int) -> int:
+        """Process relationships between concepts based on co-occurrence in chapters"""
+        writer = KnowledgeGraphWriter(graph_service)
+        return await asyncio.to_thread(writer.write_related_concepts, knowledge_id)
 
-            concept_node = None
-            if existing and len(existing) > 0:
-                # Use existing concept
-                node = existing[0]["c"]
-                concept_node = GraphNode(
-                    id=node["id"],
-                    labels=["Concept"],
-                    properties=dict(node)
-                )
-            else:
-                # Create new concept
-                concept_node = graph_service.create_node(GraphNode(
-                    labels=["Concept"],
-                    properties={
-                        "name": concept,
-                        "created_at": datetime.utcnow().isoformat()
-                    }
-                ))
-
-            # Create relationships (if they don't exist)
-
-            # Chapter CONTAINS_CONCEPT relationship
-            contains_exists = graph_service.execute_query(
-                """
-                MATCH (c:Chapter)-[r:CONTAINS_CONCEPT]->(concept:Concept)
-                WHERE c.id = $chapter_id AND concept.id = $concept_id
-                RETURN r
-                """,
-                {"chapter_id": chapter_node_id, "concept_id": concept_node.id}
-            )
+    async def sync_all_knowledge(self, incremental: bool = True, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Synchronize all knowledge entities to Neo4j
 
-            if not contains_exists or len(contains_exists) == 0:
-                graph_service.create_relationship(GraphRelationship(
-                    start_node_id=chapter_node_id,
-                    end_node_id=concept_node.id,
-                    type="CONTAINS_CONCEPT"
-                ))
-
-            # Knowledge TEACHES_CONCEPT relationship
-            teaches_exists = graph_service.execute_query(
-                """
-                MATCH (k:Knowledge)-[r:TEACHES_CONCEPT]->(concept:Concept)
-                WHERE k.id = $knowledge_id AND concept.id = $concept_id
-                RETURN r
-                """,
-                {"knowledge_id": knowledge_node_id, "concept_id": concept_node.id}
-            )
+        Entries are synced concurrently, bounded by concurrency. Each successful
+        sync checkpoints the entry's updated_at on its Knowledge node; in
+        incremental mode entries whose checkpoint matches are skipped, so a run
+        that failed part-way resumes with only the entries it did not finish.
+        Entries without an updated_at cannot be checkpointed and are reported
+        as failed rather than resynced on every run.
 
-            if not teaches_exists or len(teaches_exists) == 0:
-                graph_service.create_relationship(GraphRelationship(
-                    start_node_id=knowledge_node_id,
-                    end_node_id=concept_node.id,
-                    type="TEACHES_CONCEPT"
-                ))
+        Args:
+            incremental: Skip entries unchanged since their last successful sync
+            concurrency: Maximum entries synced at once (GRAPH_SYNC_CONCURRENCY by default)
 
-    async def _process_concept_relationships(self, knowledge_id: int) -> None:
-        """Process relationships between concepts based on co-occurrence in chapters"""
-        # Find all concepts for this knowledge
-        concepts_query = """
-        MATCH (k:Knowledge {knowledge_id: $knowledge_id})-[:TEACHES_CONCEPT]->(c:Concept)
-        RETURN c
+        Returns:
+            A dictionary with status, counts and per-entry results
         """
+        if self.progress.get("running"):
+            return {"success": False, "error": "A full synchronization is already running"}
 
-        concepts_result = graph_service.execute_query(concepts_query, {"knowledge_id": knowledge_id})
-        concepts = [record["c"] for record in concepts_result]
-
-        # Find concepts that co-occur in the same chapters
-        for i in range(len(concepts)):
-            for j in range(i + 1, len(concepts)):
-                concept1 = concepts[i]
-                concept2 = concepts[j]
-
-                # Check if they co-occur in any chapter
-                cooccurrence_query = """
-                MATCH (chap:Chapter)-[:CONTAINS_CONCEPT]->(c1:Concept)
-                WHERE c1.id = $concept1_id
-                MATCH (chap)-[:CONTAINS_CONCEPT]->(c2:Concept)
-                WHERE c2.id = $concept2_id
-                RETURN count(chap) as co_count
-                """
-
-                co_result = graph_service.execute_query(
-                    cooccurrence_query,
-                    {"concept1_id": concept1["id"], "concept2_id": concept2["id"]}
-                )
-
-                co_count = co_result.single()["co_count"]
-
-                if co_count > 0:
-                    # Create RELATED_TO relationship if it doesn't exist
-                    related_exists = graph_service.execute_query(
-                        """
-                        MATCH (c1:Concept)-[r:RELATED_TO]-(c2:Concept)
-                        WHERE c1.id = $concept1_id AND c2.id = $concept2_id
-                        RETURN r
-                        """,
-                        {"concept1_id": concept1["id"], "concept2_id": concept2["id"]}
-                    )
-
-                    if not related_exists or len(related_exists) == 0:
-                        graph_service.create_relationship(GraphRelationship(
-                            start_node_id=concept1["id"],
-                            end_node_id=concept2["id"],
-                            type="RELATED_TO",
-                            properties={"weight": co_count, "co_occurrences": co_count}
-                        ))
-
-    async def sync_all_knowledge(self) -> Dict[str, Any]:
-        """Synchronize all knowledge entities to Neo4j"""
         try:
+            self.progress = {"running": True}
+
             # Ensure schema constraints are in place
-            graph_service.create_schema_constraints()
+            await asyncio.to_thread(graph_service.create_schema_constraints)
 
-            # Get all knowledge entities
-            response = await self.client.get("/knowledge/")
-            response.raise_for_status()
-            knowledge_entities = response.json()
+            # Get all knowledge entities with their versions
+            updated_at = await asyncio.to_thread(self.db_manager.get_knowledge_versions)
+            versions = {knowledge_id: self._version(value) for knowledge_id, value in updated_at.items()}
 
-            if not knowledge_entities:
+            if not versions:
                 return {"success": True, "message": "No knowledge entities found to sync"}
 
-            knowledge_ids = [k["id"] for k in knowledge_entities]
-            logger.info(f"Syncing {len(knowledge_ids)} knowledge entities")
-
-            results = []
-            for knowledge_id in knowledge_ids:
-                result = await self.sync_knowledge(knowledge_id)
-                results.append(result)
+            to_sync = sorted(versions)
+            if incremental:
+                checkpoints = await asyncio.to_thread(KnowledgeGraphWriter(graph_service).get_sync_checkpoints)
+                # Entries without a version are kept; sync_knowledge reports them as failed
+                to_sync = [
+                    knowledge_id for knowledge_id in to_sync
+                    if versions[knowledge_id] is None or checkpoints.get(knowledge_id) != versions[knowledge_id]
+                ]
+            skipped = len(versions) - len(to_sync)
+
+            self.progress.update({
+                "total": len(to_sync),
+                "completed": 0,
+                "succeeded": 0,
+                "failed": 0,
+                "skipped": skipped,
+                "started_at": datetime.utcnow().isoformat()
+            })
+            logger.info(f"Syncing {len(to_sync)} knowledge entities ({skipped} unchanged, skipped)")
+
+            semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+            async def sync_one(knowledge_id: int) -> Dict[str, Any]:
+                async with semaphore:
+                    result = await self.sync_knowledge(knowledge_id)
+                self.progress["completed"] += 1
+                self.progress["succeeded" if result.get("success") else "failed"] += 1
+                logger.info(
+                    f"Graph sync progress: {self.progress['completed']}/{self.progress['total']} "
+                    f"({self.progress['failed']} failed)"
+                )
+                return result
 
+            results = await asyncio.gather(*(sync_one(knowledge_id) for knowledge_id in to_sync))
             success_count = sum(1 for r in results if r.get("success", False))
 
             return {
                 "success": True,
-                "message": f"Synchronized {success_count} of {len(knowledge_ids)} knowledge entities",
+                "message": f"Synchronized {success_count} of {len(to_sync)} knowledge entities, {skipped} unchanged",
+                "synced": success_count,
+                "failed": len(to_sync) - success_count,
+                "skipped": skipped,
                 "details": results
             }
 
@@ -311,6 +217,13 @@ class KnowledgeGraphSynchronizer:
         except Exception as e:
             logger.error(f"Error synchronizing all knowledge entities: {str(e)}")
             return {"success": False, "error": str(e)}
+        finally:
+            self.progress["running"] = False
+            self.progress["finished_at"] = datetime.utcnow().isoformat()
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Get progress of the current or last full synchronization."""
+        return dict(self.progress)
 
 # Create singleton instance
 sync_service = KnowledgeGraphSynchronizer() 
\ No newline at end of file
@@ -7,8 +7,11 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from src.middleware.security import SecurityMiddleware
 from src.middleware.kratos_auth import KratosAuthMiddleware
 
-from database import DatabaseManager
-from queue_manager import QueueManager
+from database import DatabaseManager, get_pool_stats, dispose_engines, dispose_async_engine
+from queue_manager import QueueManager, get_queue_manager, shutdown_queue_manager
+from ingestion_executor import shutdown_ingestion_executor
+from pdf_layout import shutdown_page_pool
+from openai_client import close_openai_client, get_completion_stats
 from pdf_processor import PDFProcessor
 from video_processor_v2 import VideoProcessorV2
 from api_routes import router
@@ -143,6 +146,24 @@ app.include_router(direct_knowledge_router, prefix="/v2/knowledge", tags=["Direc
 app.include_router(direct_student_router, prefix="/v2/student", tags=["Direct Student"])
 app.include_router(direct_teacher_router, prefix="/v2/teacher", tags=["Direct Teacher"])
 
+@app.on_event("startup")
+async def start_queue_workers():
+    """Start the shared queue workers; expired leases from a previous run are picked up again."""
+    get_queue_manager()
+
+@app.on_event("shutdown")
+async def stop_queue_workers():
+    """Stop the shared queue workers and the ingestion process pool."""
+    shutdown_queue_manager()
+    shutdown_ingestion_executor()
+    shutdown_page_pool()
+    # Imported here: creating the storage client connects to MinIO
+    from storage import storage
+    storage.shutdown()
+    dispose_engines()
+    await dispose_async_engine()
+    await close_openai_client()
+
 @app.get("/test-public")
 async def test_public():
     """Simple test endpoint to verify public access"""
@@ -164,6 +185,42 @@ async def health_check():
     """
     return {"status": "healthy", "message": "API is running"}
 
+@app.get(
+    "/health/db",
+    tags=["Health & Monitoring"],
+    summary="Database Pool Stats",
+    description="Get connection pool occupancy and connection churn counters",
+    response_description="Database connection pool statistics"
+)
+async def database_pool_stats():
+    """
+    Connection pool metrics for the shared database engine.
+
+    Requires authentication; the public /health check reports status only.
+
+    Returns:
+        dict: Pool occupancy plus counts of connections created, checkouts,
+        checkins and invalidations since startup
+    """
+    return get_pool_stats()
+
+@app.get(
+    "/health/llm",
+    tags=["Health & Monitoring"],
+    summary="LLM Call Stats",
+    description="Get chat completion call counts, latency percentiles and token usage per model",
+    response_description="Chat completion statistics"
+)
+async def llm_call_stats():
+    """
+    Metrics for chat completions made by this process.
+
+    Returns:
+        dict: Per model, counts of calls, retries, rate limits and failures,
+        latency percentiles over recent calls, and prompt/completion tokens
+    """
+    return get_completion_stats()
+
 @app.get(
     "/",
     tags=["Health & Monitoring"],
@@ -0,0 +1,48 @@
+"""Add processing_jobs table for the durable job queue
+
+Revision ID: 20261017_processing_jobs
+Revises: 20250628_complete
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '20261017_processing_jobs'
+down_revision = '20250628_complete'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'processing_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('job_type', sa.String(50), nullable=False),
+        sa.Column('knowledge_id', sa.Integer(), nullable=False),
+        sa.Column('payload', postgresql.JSON(), nullable=True),
+        sa.Column('status', sa.String(20), server_default='queued', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_retries', sa.Integer(), server_default='3', nullable=False),
+        sa.Column('run_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('leased_until', sa.DateTime(), nullable=True),
+        sa.Column('worker_id', sa.String(255), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['knowledge_id'], ['knowledge.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_processing_jobs_job_type', 'processing_jobs', ['job_type'], unique=False)
+    op.create_index('ix_processing_jobs_knowledge_id', 'processing_jobs', ['knowledge_id'], unique=False)
+    # Lease lookups filter on type + status and order by run_at
+    op.create_index('ix_processing_jobs_lease', 'processing_jobs', ['job_type', 'status', 'run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processing_jobs_lease', table_name='processing_jobs')
+    op.drop_index('ix_processing_jobs_knowledge_id', table_name='processing_jobs')
+    op.drop_index('ix_processing_jobs_job_type', table_name='processing_jobs')
+    op.drop_table('processing_jobs')
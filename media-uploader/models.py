@@ -208,6 +208,24 @@ class RetryHistoryDB(Base):
     error = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ProcessingJob(Base):
+    """Durable job queue entry leased by queue workers."""
+    __tablename__ = "processing_jobs"
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String(50), nullable=False, index=True)  # ingest, content_generation
+    knowledge_id = Column(Integer, ForeignKey("knowledge.id", ondelete="CASCADE"), nullable=False, index=True)
+    payload = Column(JSON, default=dict)
+    status = Column(String(20), nullable=False, default="queued")  # queued, leased, completed, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_retries = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not leasable before this time
+    leased_until = Column(DateTime)  # Visibility timeout; expired leases are picked up again
+    worker_id = Column(String(255))
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class EdTechContent(Base):
     """Model for storing generated educational content in different languages."""
     __tablename__ = "edtech_content"
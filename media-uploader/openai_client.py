@@ -1,14 +1,92 @@
 import logging
+import os
+import threading
 import time
 import asyncio
+import weakref
+from collections import deque
 from typing import Dict, List, Any, Optional
+import httpx
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+# Connections each event loop's shared client keeps open to the upstream
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "32"))
+
+
+class CompletionStats:
+    """Per-model call, latency and token counters for chat completions."""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._window = window
+
+    def _model(self, model: str) -> Dict[str, Any]:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = {
+                "calls": 0,
+                "failures": 0,
+                "retries": 0,
+                "rate_limited": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_seconds_total": 0.0,
+                "latencies": deque(maxlen=self._window),
+            }
+            self._models[model] = stats
+        return stats
+
+    def record_success(self, model: str, latency: float, usage: Any) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats["calls"] += 1
+            stats["latency_seconds_total"] += latency
+            stats["latencies"].append(latency)
+            if usage is not None:
+                stats["prompt_tokens"] += usage.prompt_tokens or 0
+                stats["completion_tokens"] += usage.completion_tokens or 0
+
+    def record_retry(self, model: str, rate_limited: bool = False) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats["retries"] += 1
+            if rate_limited:
+                stats["rate_limited"] += 1
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            self._model(model)["failures"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {}
+            for model, stats in self._models.items():
+                latencies = sorted(stats["latencies"])
+                summary = {key: value for key, value in stats.items() if key != "latencies"}
+                if latencies:
+                    summary["latency_seconds_p50"] = latencies[len(latencies) // 2]
+                    summary["latency_seconds_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    summary["latency_seconds_avg"] = stats["latency_seconds_total"] / stats["calls"]
+                snapshot[model] = summary
+            return snapshot
+
+
+_completion_stats = CompletionStats()
+
+
+def get_completion_stats() -> Dict[str, Any]:
+    """Get chat completion counters, latency percentiles and token usage per model."""
+    return _completion_stats.snapshot()
+
+
 class OpenAIMessage:
     """OpenAI message structure."""
     def __init__(self, role: str, content: str):
@@ -22,33 +100,61 @@ class OpenAIMessage:
         }
 
 class OpenAIClient:
-    """Client for interacting with OpenAI API."""
+    """
+    Async client for interacting with OpenAI API.
+
+    Requests go through one pooled HTTP client, so keep-alive connections are
+    reused across calls. The pool belongs to the event loop the client is first
+    used on; use get_openai_client() to share one client per loop.
+    """
     
     def __init__(self, api_key: str, base_url: str = None):
         """Initialize the OpenAI client with the API key."""
         self.max_retries = 3
         self.retry_delay = 1.0
-        self.timeout = 30.0
+        self.timeout = OPENAI_TIMEOUT
+        # Callers sharing this client wait until this time after a rate limit response
+        self.rate_limited_until = 0.0
         
         try:
-            if base_url:
-                self.client = OpenAI(
-                    api_key=api_key, 
-                    base_url=base_url,
-                    timeout=self.timeout,
-                    max_retries=0  # We'll handle retries ourselves
-                )
-            else:
-                self.client = OpenAI(
-                    api_key=api_key,
-                    timeout=self.timeout,
-                    max_retries=0
+            self.http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
                 )
+            )
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url or None,
+                timeout=self.timeout,
+                max_retries=0,  # We'll handle retries ourselves
+                http_client=self.http_client
+            )
             logger.info(f"OpenAI client initialized with base_url: {base_url or 'default'}")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        await self.http_client.aclose()
     
+    def _pause_for_rate_limit(self, error: "openai.RateLimitError", default_delay: float) -> None:
+        """Hold back every caller of this client for the upstream's Retry-After, if given."""
+        delay = default_delay
+        try:
+            delay = float(error.response.headers.get("retry-after", delay))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        self.rate_limited_until = max(self.rate_limited_until, time.monotonic() + delay)
+
+    async def _wait_for_rate_limit(self) -> None:
+        delay = self.rate_limited_until - time.monotonic()
+        if delay > 0:
+            logger.info(f"Waiting {delay:.1f}s for the upstream rate limit to clear")
+            await asyncio.sleep(delay)
+
     async def chat_completion(
         self, 
         messages: List[Dict[str, str]], 
@@ -84,11 +190,14 @@ class OpenAIClient:
         last_error = None
         
         for attempt in range(self.max_retries):
+            rate_limited = False
             try:
                 logger.debug(f"Attempt {attempt + 1} for chat completion with model {model}")
+                await self._wait_for_rate_limit()
                 
                 # Make the request
-                response = self.client.chat.completions.create(**params)
+                started = time.monotonic()
+                response = await self.client.chat.completions.create(**params)
                 
                 # Validate response
                 if not response or not response.choices:
@@ -98,7 +207,9 @@ class OpenAIClient:
                 if not content or not content.strip():
                     raise ValueError("Empty content in response")
                 
-                logger.debug(f"Successfully generated {len(content)} characters")
+                latency = time.monotonic() - started
+                _completion_stats.record_success(model, latency, getattr(response, "usage", None))
+                logger.debug(f"Successfully generated {len(content)} characters in {latency:.2f}s")
                 return content.strip()
                 
             except openai.APITimeoutError as e:
@@ -112,6 +223,8 @@ class OpenAIClient:
             except openai.RateLimitError as e:
                 last_error = f"Rate limit error: {str(e)}"
                 logger.warning(f"Attempt {attempt + 1} rate limited: {e}")
+                self._pause_for_rate_limit(e, self.retry_delay * (2 ** attempt))
+                rate_limited = True
                 
             except openai.APIError as e:
                 last_error = f"API error: {str(e)}"
@@ -123,6 +236,7 @@ class OpenAIClient:
             
             # Wait before retry (exponential backoff)
             if attempt < self.max_retries - 1:
+                _completion_stats.record_retry(model, rate_limited)
                 wait_time = self.retry_delay * (2 ** attempt)
                 logger.info(f"Waiting {wait_time}s before retry {attempt + 2}")
                 await asyncio.sleep(wait_time)
@@ -130,9 +244,34 @@ class OpenAIClient:
         # All retries failed
         error_msg = f"Failed after {self.max_retries} attempts. Last error: {last_error}"
         logger.error(error_msg)
+        _completion_stats.record_failure(model)
         
         # Return a structured error response instead of generic text
         if json_schema:
             return '{"error": "Failed to generate content", "details": "' + str(last_error) + '"}'
         else:
-            return f"Error: Failed to generate content after {self.max_retries} attempts. Please try again later." 
\ No newline at end of file
+            return f"Error: Failed to generate content after {self.max_retries} attempts. Please try again later." 
+
+
+# One client per event loop: the API server's loop and the queue's background loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, OpenAIClient]" = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> OpenAIClient:
+    """Get the OpenAI client shared by everything running on the current event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = OpenAIClient(
+            api_key=os.environ.get("OPENAI_API_KEY", "local-api-key"),
+            base_url=os.environ.get("OPENAI_BASE_URL")
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_openai_client() -> None:
+    """Close the current event loop's shared client, e.g. on shutdown."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -9,6 +9,7 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 
 from openai_client import OpenAIClient
 from prompts_config import prompts_config
+from text_chunker import chunk_budget, chunk_text
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -134,44 +135,23 @@ async def generate_chunked_content(
     if not text or len(text) < 10:
         return ""
 
-    # Split text into paragraphs for more natural chunking
-    paragraphs = re.split(r'\n\s*\n', text)
-    
-    # More intelligent chunking based on semantic paragraphs
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    # Estimate: ~1.5 tokens per word
-    estimated_token_limit = 4000  # Safe limit for most models
-    words_per_chunk = int(estimated_token_limit / 1.5)
-    
-    for paragraph in paragraphs:
-        paragraph_words = len(paragraph.split())
-        
-        # If adding this paragraph would exceed our chunk size,
-        # start a new chunk (unless current chunk is empty)
-        if current_length + paragraph_words > words_per_chunk and current_chunk:
-            chunks.append("\n\n".join(current_chunk))
-            current_chunk = [paragraph]
-            current_length = paragraph_words
-        else:
-            current_chunk.append(paragraph)
-            current_length += paragraph_words
-    
-    # Add the last chunk if it contains anything
-    if current_chunk:
-        chunks.append("\n\n".join(current_chunk))
+    model = "llama-3.2-3b-instruct"
+
+    # Fill the model's context: the prompt, the previous part's notes (up to
+    # 500 characters) and the response all share it with the chunk. Parts
+    # carry continuity through those notes, so chunks do not overlap.
+    max_chunk_tokens = chunk_budget(prompt, max_tokens, model=model, reserve_tokens=300)
+    chunks = chunk_text(text, max_tokens=max_chunk_tokens, overlap_tokens=0, model=model)
 
-    # If we have only one small chunk, just process it directly
-    if len(chunks) == 1 and len(chunks[0].split()) < words_per_chunk:
+    # If we have only one chunk, just process it directly
+    if len(chunks) == 1:
         try:
             result = await openai_client.chat_completion(
                 [
                     {"role": "system", "content": prompt},
                     {"role": "user", "content": chunks[0]},
                 ],
-                model="llama-3.2-3b-instruct",
+                model=model,
                 max_tokens=max_tokens,
             )
             return result
@@ -202,7 +182,7 @@ async def generate_chunked_content(
                     {"role": "system", "content": context_prompt},
                     {"role": "user", "content": chunk_context + chunk},
                 ],
-                model="llama-3.2-3b-instruct",
+                model=model,
                 max_tokens=max_tokens,
             )
             
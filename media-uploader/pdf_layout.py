@@ -0,0 +1,262 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Worker processes used to extract the pages of large PDFs; 0 extracts in-process.
+# Ingestion pool workers set 0, since that pool already bounds extraction processes
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Documents shorter than this are extracted in-process; the pool is not worth the startup cost
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# A page is treated as scanned when its text layer has fewer characters than this...
+PDF_MIN_PAGE_CHARS = int(os.getenv("PDF_MIN_PAGE_CHARS", "20"))
+# ...and images cover at least this fraction of it
+PDF_SCANNED_IMAGE_COVERAGE = float(os.getenv("PDF_SCANNED_IMAGE_COVERAGE", "0.5"))
+
+# Span flag bits reported by page.get_text("dict")
+FLAG_ITALIC = 2
+FLAG_BOLD = 16
+
+
+@dataclass
+class ImageBlock:
+    """Represents an image block with its properties."""
+    image_id: str
+    page_num: int
+    bbox: tuple
+    caption: Optional[str] = None
+    confidence: float = 1.0
+    related_text: Optional[str] = None
+    image_data: Optional[bytes] = None
+    format: str = "png"
+    width: int = 0
+    height: int = 0
+
+
+@dataclass
+class TextBlock:
+    """Represents a block of text with its properties."""
+    text: str
+    font_size: float
+    font_name: str
+    is_bold: bool
+    is_italic: bool
+    color: tuple
+    bbox: tuple
+    page_num: int
+    block_type: str
+    level: int
+    confidence: float = 1.0
+    related_images: List[str] = None  # List of related image IDs
+    column: int = 0  # For multi-column layout
+    is_table: bool = False
+    table_data: Optional[Dict] = None
+
+
+@dataclass
+class PageContent:
+    """Text and image blocks extracted from one page."""
+    page_num: int
+    text_blocks: List[TextBlock]
+    image_blocks: List[ImageBlock]
+    area: float = 0.0
+
+    @property
+    def text_chars(self) -> int:
+        return sum(len(block.text) for block in self.text_blocks)
+
+    @property
+    def image_coverage(self) -> float:
+        """Fraction of the page covered by images (overlaps counted twice, capped at 1)."""
+        if self.area <= 0:
+            return 0.0
+        covered = sum(
+            max(0.0, block.bbox[2] - block.bbox[0]) * max(0.0, block.bbox[3] - block.bbox[1])
+            for block in self.image_blocks
+        )
+        return min(1.0, covered / self.area)
+
+    @property
+    def is_scanned(self) -> bool:
+        """Whether the page is an image without a usable text layer, and so needs OCR."""
+        return self.text_chars < PDF_MIN_PAGE_CHARS and self.image_coverage >= PDF_SCANNED_IMAGE_COVERAGE
+
+
+class NativeTextExtractor:
+    """
+    Extracts text and image blocks from the PDF text layer with PyMuPDF.
+
+    Each block keeps the font size, font name, bold/italic flags and colour of
+    its dominant span (by character count) plus its bounding box, which is what
+    PDFProcessor.analyze_document_structure classifies on. Pages of large
+    documents are extracted in parallel worker processes.
+    """
+
+    @staticmethod
+    def _color(value: int) -> tuple:
+        return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+
+    @staticmethod
+    def extract_page(page: fitz.Page, page_num: int) -> PageContent:
+        """Extract the text and image blocks of one page."""
+        text_blocks: List[TextBlock] = []
+        image_blocks: List[ImageBlock] = []
+        page_width = page.rect.width
+        page_area = page.rect.width * page.rect.height
+        layout = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_PRESERVE_IMAGES)
+
+        for index, block in enumerate(layout["blocks"]):
+            bbox = tuple(block["bbox"])
+
+            if block.get("type") == 1:
+                image_blocks.append(ImageBlock(
+                    image_id=f"page{page_num + 1}_img{index}",
+                    page_num=page_num,
+                    bbox=bbox,
+                    image_data=block.get("image"),
+                    format=block.get("ext", "png"),
+                    width=block.get("width", 0),
+                    height=block.get("height", 0),
+                ))
+                continue
+
+            lines = []
+            # Characters per (size, font, flags, color), to pick the block's dominant style
+            styles: Counter = Counter()
+            for line in block.get("lines", []):
+                line_text = "".join(span["text"] for span in line["spans"]).strip()
+                if line_text:
+                    lines.append(line_text)
+                for span in line["spans"]:
+                    length = len(span["text"].strip())
+                    if length:
+                        styles[(round(span["size"], 1), span["font"], span["flags"], span["color"])] += length
+            if not lines or not styles:
+                continue
+
+            (size, font, flags, color), _ = styles.most_common(1)[0]
+            font_lower = font.lower()
+            # A block that starts right of the middle and fits in half the page sits in the second column
+            in_second_column = bbox[0] >= page_width / 2 and (bbox[2] - bbox[0]) < page_width / 2
+            text_blocks.append(TextBlock(
+                text=" ".join(lines),
+                font_size=size,
+                font_name=font,
+                is_bold=bool(flags & FLAG_BOLD) or "bold" in font_lower,
+                is_italic=bool(flags & FLAG_ITALIC) or "italic" in font_lower or "oblique" in font_lower,
+                color=NativeTextExtractor._color(color),
+                bbox=bbox,
+                page_num=page_num,
+                block_type="paragraph",
+                level=0,
+                column=1 if in_second_column else 0,
+            ))
+        return PageContent(page_num, text_blocks, image_blocks, page_area)
+
+    @staticmethod
+    def extract_pages(pdf_document: fitz.Document, start: int, end: int) -> List[PageContent]:
+        """Extract pages [start, end) of an open document."""
+        results = []
+        for page_num in range(start, end):
+            try:
+                results.append(NativeTextExtractor.extract_page(pdf_document[page_num], page_num))
+            except Exception as e:
+                logger.error(f"Error extracting page {page_num}: {str(e)}")
+                results.append(PageContent(page_num, [], []))
+        return results
+
+    @staticmethod
+    def extract(file_data: bytes, pdf_document: Optional[fitz.Document] = None) -> List[PageContent]:
+        """
+        Extract every page of a PDF.
+
+        Args:
+            file_data: The PDF bytes, shared with worker processes through a temp file for large documents
+            pdf_document: The already opened document, used for in-process extraction
+
+        Returns:
+            List[PageContent]: Text and image blocks per page, in page order
+        """
+        if pdf_document is None:
+            pdf_document = fitz.open(stream=file_data, filetype="pdf")
+        page_count = len(pdf_document)
+
+        pool = get_page_pool() if page_count >= PDF_PARALLEL_MIN_PAGES else None
+        if pool is None:
+            return NativeTextExtractor.extract_pages(pdf_document, 0, page_count)
+
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                  for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+        # Workers open the document from a temp file, so the PDF is written once rather than pickled per task
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+            try:
+                pdf_file.write(file_data)
+                pdf_file.flush()
+                futures = [pool.submit(_extract_page_range, pdf_file.name, start, end) for start, end in ranges]
+                pages: List[PageContent] = []
+                for future in futures:
+                    pages.extend(future.result())
+                return pages
+            except Exception as e:
+                logger.warning(f"Parallel page extraction failed, extracting in-process: {str(e)}")
+                reset_page_pool(pool)
+                return NativeTextExtractor.extract_pages(pdf_document, 0, page_count)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[PageContent]:
+    """Extract a range of pages. Runs inside a page pool worker process."""
+    with fitz.open(pdf_path) as pdf_document:
+        return NativeTextExtractor.extract_pages(pdf_document, start, end)
+
+
+# Process-wide pool for page extraction
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def get_page_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the page extraction pool, creating it on first use; None when disabled."""
+    global _page_pool
+    # Read when called: ingestion pool workers turn the pool off after this module may have been imported
+    workers = int(os.getenv("PDF_PAGE_WORKERS", str(PDF_PAGE_WORKERS)))
+    if workers <= 0:
+        return None
+    with _page_pool_lock:
+        if _page_pool is None:
+            # spawn: callers may run threads, which fork does not handle safely
+            _page_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started PDF page extraction pool with {workers} workers")
+        return _page_pool
+
+
+def reset_page_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next document creates a fresh one."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_page_pool() -> None:
+    """Stop the page extraction pool, if it was started."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=True, cancel_futures=True)
+            _page_pool = None
@@ -1,12 +1,11 @@
 import logging
-import base64
-import io
 import re
-import hashlib
 import statistics
 import os
 import json
 import time
+import tempfile
+import threading
 from typing import Dict, Tuple, List, Any, Optional, Set
 from dataclasses import dataclass
 from collections import defaultdict
@@ -16,10 +15,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import fitz  # PyMuPDF
 from PIL import Image
 from openai import OpenAI
-# Temporarily disabled ML dependencies
-# from vllm import LLM, SamplingParams
-# from docling_core.types.doc import DoclingDocument
-# from docling_core.types.doc.document import DocTagsDocument
+
+from image_pipeline import ImageCollector
+from pdf_layout import ImageBlock, TextBlock, PageContent, NativeTextExtractor
 
 # Import methods from VideoProcessorV2
 from video_processor_v2 import VideoProcessorV2
@@ -28,38 +26,111 @@ from video_processor_v2 import VideoProcessorV2
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class ImageBlock:
-    """Represents an image block with its properties."""
-    image_id: str
-    page_num: int
-    bbox: tuple
-    caption: Optional[str] = None
-    confidence: float = 1.0
-    related_text: Optional[str] = None
+# Opt-in: run the SmolDocling model on scanned pages when no OCR engine is available
+PDF_MODEL_EXTRACTION = os.getenv("PDF_MODEL_EXTRACTION", "false").lower() == "true"
+PDF_MODEL_PATH = os.getenv("PDF_MODEL_PATH", "ds4sd/SmolDocling-256M-preview")
+# Scanned pages OCRed at once; OCR engines are memory hungry, so keep this small on CPU
+PDF_OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", "2"))
+
+NUMBER_PREFIX_PATTERN = re.compile(r'^\d+(\.\d+)*')
+# Heading prefixes checked in order, each with a function of the text giving the heading level
+HEADING_PATTERNS = [
+    # Chapter 1, Section 2, ...
+    (re.compile(r'^(?:chapter|section|part|appendix|figure|table)\s+\d+', re.IGNORECASE),
+     lambda text: 1 if text.lower().startswith(("chapter", "part")) else 2),
+    # Numbered headings (1., 1.1, etc.), one level per number
+    (re.compile(r'^\d+(\.\d+)*\.?\s+\S+'),
+     lambda text: NUMBER_PREFIX_PATTERN.match(text).group(0).count('.') + 1),
+    # Letter headings (A., B., etc.)
+    (re.compile(r'^[A-Z]\.(\d+)?\s+\S+'), lambda text: 2),
+    # Roman numeral headings
+    (re.compile(r'^[IVXLCDM]+\.\s+\S+'), lambda text: 1),
+]
+LIST_ITEM_PATTERN = re.compile(r'^\s*(?:[-•*]|\d+\.)\s+\S+')
+
+def markdown_to_blocks(markdown: str, page_num: int) -> List[TextBlock]:
+    """Turn the markdown of one page, as produced by Docling, into text blocks."""
+    blocks = []
+    lines = markdown.splitlines()
+    current_block = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Check for headings
+        if line.startswith('#'):
+            # Count heading level
+            level = 0
+            while line.startswith('#'):
+                level += 1
+                line = line[1:]
+            text = line.strip()
+
+            block = TextBlock(
+                text=text,
+                font_size=14.0 + (6.0 - level),  # Larger font for higher level headings
+                font_name="default",
+                is_bold=True,
+                is_italic=False,
+                color=(0, 0, 0),
+                bbox=(0, 0, 0, 0),
+                page_num=page_num,
+                block_type="heading",
+                level=level,
+                confidence=1.0
+            )
+            blocks.append(block)
+            current_block = None
+
+        # Check for list items
+        elif line.startswith(('- ', '* ', '+ ')):
+            text = line[2:].strip()
+            block = TextBlock(
+                text=text,
+                font_size=12.0,
+                font_name="default",
+                is_bold=False,
+                is_italic=False,
+                color=(0, 0, 0),
+                bbox=(0, 0, 0, 0),
+                page_num=page_num,
+                block_type="list_item",
+                level=1,
+                confidence=1.0
+            )
+            blocks.append(block)
+            current_block = None
+
+        # Regular paragraph text
+        else:
+            if current_block is None:
+                current_block = TextBlock(
+                    text=line,
+                    font_size=12.0,
+                    font_name="default",
+                    is_bold=False,
+                    is_italic=False,
+                    color=(0, 0, 0),
+                    bbox=(0, 0, 0, 0),
+                    page_num=page_num,
+                    block_type="paragraph",
+                    level=0,
+                    confidence=1.0
+                )
+                blocks.append(current_block)
+            else:
+                current_block.text += " " + line
+
+    return blocks
 
-@dataclass
-class TextBlock:
-    """Represents a block of text with its properties."""
-    text: str
-    font_size: float
-    font_name: str
-    is_bold: bool
-    is_italic: bool
-    color: tuple
-    bbox: tuple
-    page_num: int
-    block_type: str
-    level: int
-    confidence: float = 1.0
-    related_images: List[str] = None  # List of related image IDs
-    column: int = 0  # For multi-column layout
-    is_table: bool = False
-    table_data: Optional[Dict] = None
 
 class ModelBasedTextExtractor:
     def __init__(self, model_path="ds4sd/SmolDocling-256M-preview"):
         try:
+            from vllm import LLM, SamplingParams
+
             # Initialize LLM with more robust configuration
             self.llm = LLM(
                 model=model_path,
@@ -83,12 +154,18 @@ class ModelBasedTextExtractor:
             logger.error(f"Failed to initialize ModelBasedTextExtractor: {str(e)}")
             raise RuntimeError(f"Model initialization failed: {str(e)}")
 
-    def extract_text_blocks(self, pdf_document: fitz.Document) -> List[TextBlock]:
-        """Extract text blocks using DocTags/Docling model."""
+    def extract_text_blocks(self, pdf_document: fitz.Document, pages: Optional[List[int]] = None) -> List[TextBlock]:
+        """Extract text blocks using DocTags/Docling model, from the given pages or the whole document."""
+        from docling_core.types.doc import DoclingDocument
+        from docling_core.types.doc.document import DocTagsDocument
+
         all_blocks = []
+        temp_dir = os.path.join(os.getcwd(), "temp")
+        page_nums = range(len(pdf_document)) if pages is None else pages
         
         try:
-            for page_num, page in enumerate(pdf_document):
+            for page_num in page_nums:
+                page = pdf_document[page_num]
                 try:
                     # Convert PDF page to PIL Image with error handling
                     pix = page.get_pixmap()
@@ -112,7 +189,6 @@ class ModelBasedTextExtractor:
                             doc.load_from_doctags(doctags_doc)
                             
                             # Create a temporary file for markdown output
-                            temp_dir = os.path.join(os.getcwd(), "temp")
                             os.makedirs(temp_dir, exist_ok=True)
                             temp_path = os.path.join(temp_dir, f"page_{page_num}.md")
                             
@@ -130,77 +206,7 @@ class ModelBasedTextExtractor:
                                 pass  # Ignore cleanup errors
                             
                             # Process markdown content into blocks
-                            lines = markdown_content.splitlines()
-                            current_block = None
-                            
-                            for line in lines:
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                
-                                # Check for headings
-                                if line.startswith('#'):
-                                    # Count heading level
-                                    level = 0
-                                    while line.startswith('#'):
-                                        level += 1
-                                        line = line[1:]
-                                    text = line.strip()
-                                    
-                                    block = TextBlock(
-                                        text=text,
-                                        font_size=14.0 + (6.0 - level),  # Larger font for higher level headings
-                                        font_name="default",
-                                        is_bold=True,
-                                        is_italic=False,
-                                        color=(0, 0, 0),
-                                        bbox=(0, 0, 0, 0),
-                                        page_num=page_num,
-                                        block_type="heading",
-                                        level=level,
-                                        confidence=1.0
-                                    )
-                                    all_blocks.append(block)
-                                    current_block = None
-                                    
-                                # Check for list items
-                                elif line.startswith(('- ', '* ', '+ ')):
-                                    text = line[2:].strip()
-                                    block = TextBlock(
-                                        text=text,
-                                        font_size=12.0,
-                                        font_name="default",
-                                        is_bold=False,
-                                        is_italic=False,
-                                        color=(0, 0, 0),
-                                        bbox=(0, 0, 0, 0),
-                                        page_num=page_num,
-                                        block_type="list_item",
-                                        level=1,
-                                        confidence=1.0
-                                    )
-                                    all_blocks.append(block)
-                                    current_block = None
-                                    
-                                # Regular paragraph text
-                                else:
-                                    if current_block is None:
-                                        current_block = TextBlock(
-                                            text=line,
-                                            font_size=12.0,
-                                            font_name="default",
-                                            is_bold=False,
-                                            is_italic=False,
-                                            color=(0, 0, 0),
-                                            bbox=(0, 0, 0, 0),
-                                            page_num=page_num,
-                                            block_type="paragraph",
-                                            level=0,
-                                            confidence=1.0
-                                        )
-                                        all_blocks.append(current_block)
-                                    else:
-                                        current_block.text += " " + line
+                            all_blocks.extend(markdown_to_blocks(markdown_content, page_num))
                             
                             break  # Success, exit retry loop
                             
@@ -229,12 +235,118 @@ class ModelBasedTextExtractor:
             logger.error(f"Fatal error in extract_text_blocks: {str(e)}")
             raise
 
+# Resident model extractor, loaded on first use when PDF_MODEL_EXTRACTION is on
+_model_extractor: Optional[ModelBasedTextExtractor] = None
+_model_extractor_failed = False
+_model_extractor_lock = threading.Lock()
+
+
+def get_model_extractor() -> Optional[ModelBasedTextExtractor]:
+    """Get the process-wide model extractor; None when disabled or when it failed to load."""
+    global _model_extractor, _model_extractor_failed
+    if not PDF_MODEL_EXTRACTION:
+        return None
+    with _model_extractor_lock:
+        if _model_extractor is None and not _model_extractor_failed:
+            try:
+                _model_extractor = ModelBasedTextExtractor(PDF_MODEL_PATH)
+            except Exception as e:
+                # Do not retry the load for every document
+                logger.error(f"Model-based extraction unavailable: {str(e)}")
+                _model_extractor_failed = True
+        return _model_extractor
+
+
+def _ocr_page(page_path: str, page_num: int) -> List[TextBlock]:
+    """OCR a single-page PDF through the OCR service."""
+    import asyncio
+    from src.services.ocr_service import ocr_service
+
+    result = asyncio.run(ocr_service.process(page_path))
+    if isinstance(result, dict):
+        markdown = result.get("markdown") or result.get("text") or ""
+    else:
+        markdown = str(result)
+    return markdown_to_blocks(markdown, page_num)
+
+
+def ocr_scanned_pages(pdf_document: fitz.Document, pages: List[PageContent]) -> None:
+    """
+    Replace the text blocks of scanned pages with OCR output, in place.
+
+    Pages are OCRed concurrently, at most PDF_OCR_WORKERS at a time, through the
+    OCR service if one is available or the model extractor if it is enabled.
+    Results are written back by page number, so page order is preserved.
+    """
+    scanned = [page.page_num for page in pages if page.is_scanned]
+    if not scanned:
+        return
+
+    try:
+        from src.services.ocr_service import ocr_service
+        ocr_available = ocr_service.available
+    except Exception as e:
+        logger.warning(f"OCR service unavailable: {str(e)}")
+        ocr_available = False
+
+    if ocr_available:
+        logger.info(f"OCRing {len(scanned)} of {len(pages)} pages with {PDF_OCR_WORKERS} workers")
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                ThreadPoolExecutor(max_workers=PDF_OCR_WORKERS, thread_name_prefix="pdf-ocr") as executor:
+            futures = {}
+            for page_num in scanned:
+                # The OCR service reads files; give it just the one page
+                page_path = os.path.join(temp_dir, f"page_{page_num}.pdf")
+                with fitz.open() as page_document:
+                    page_document.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
+                    page_document.save(page_path)
+                futures[executor.submit(_ocr_page, page_path, page_num)] = page_num
+
+            for future in as_completed(futures):
+                page_num = futures[future]
+                try:
+                    pages[page_num].text_blocks = future.result()
+                except Exception as e:
+                    logger.error(f"OCR failed for page {page_num}: {str(e)}")
+        return
+
+    extractor = get_model_extractor()
+    if extractor is None:
+        logger.warning(f"{len(scanned)} scanned pages have no text layer and no OCR engine is available")
+        return
+
+    logger.info(f"Running model extraction on {len(scanned)} scanned pages")
+    model_blocks = defaultdict(list)
+    for block in extractor.extract_text_blocks(pdf_document, scanned):
+        model_blocks[block.page_num].append(block)
+    for page_num in scanned:
+        pages[page_num].text_blocks = model_blocks[page_num]
+
+
+def extract_document_blocks(
+    file_data: bytes, pdf_document: Optional[fitz.Document] = None
+) -> Tuple[List[TextBlock], List[ImageBlock]]:
+    """
+    Extract text and image blocks from a PDF.
+
+    The text layer is read natively, in parallel for large documents. Only
+    scanned pages, with images but no text layer, are sent to OCR.
+    """
+    if pdf_document is None:
+        pdf_document = fitz.open(stream=file_data, filetype="pdf")
+    pages = NativeTextExtractor.extract(file_data, pdf_document)
+    ocr_scanned_pages(pdf_document, pages)
+
+    text_blocks = [block for page in pages for block in page.text_blocks]
+    image_blocks = [block for page in pages for block in page.image_blocks]
+    return text_blocks, image_blocks
+
+
 # Legacy function maintained for backward compatibility
 def extract_text_blocks(pdf_document: fitz.Document) -> List[TextBlock]:
     """Legacy wrapper for backward compatibility"""
     try:
-        extractor = ModelBasedTextExtractor()
-        return extractor.extract_text_blocks(pdf_document)
+        return extract_document_blocks(pdf_document.tobytes(), pdf_document)[0]
     except Exception as e:
         logger.error(f"Error in legacy extract_text_blocks: {str(e)}")
         # Return empty list as fallback
@@ -258,12 +370,24 @@ class PDFProcessor:
         """
         Multi-layered analysis to classify text blocks in the document.
         Uses font metrics, positioning, and content patterns.
+
+        Document-wide features are computed in one pass up front, so the
+        classification pass costs O(1) per block.
         """
         if not blocks:
             return blocks
             
-        # Step 1: Analyze font size distribution to identify body text and potential headings
-        font_sizes = [block.font_size for block in blocks if block.font_size > 0]
+        # Step 1: Collect document-wide features in a single pass
+        font_sizes = []
+        bold_count = 0
+        first_page_title = None
+        for block in blocks:
+            if block.font_size > 0:
+                font_sizes.append(block.font_size)
+            if block.is_bold:
+                bold_count += 1
+            if block.page_num == 0 and (first_page_title is None or block.font_size > first_page_title.font_size):
+                first_page_title = block
         if not font_sizes:
             return blocks
             
@@ -281,101 +405,63 @@ class PDFProcessor:
         heading_sizes = sorted(set(size for size in font_sizes if size > size_threshold), reverse=True)
         heading_levels = {size: idx + 1 for idx, size in enumerate(heading_sizes)}
         
-        # Step 3: Collect unique formatting combinations 
-        format_combinations = set()
-        for block in blocks:
-            format_key = (block.font_size, block.is_bold, block.is_italic, block.font_name)
-            format_combinations.add(format_key)
-        
-        # Step 4: Identify patterns in the document
-        # Check if the document uses different fonts for headings
-        fonts_used = set(block.font_name for block in blocks)
-        font_analysis = {}
+        # Bold text that's not common in the document is likely a heading
+        bold_is_rare = bold_count / len(blocks) < 0.3  # If less than 30% of text is bold
+        bold_heading_level = len(heading_levels) + 1 if heading_levels else 1
         
-        for font in fonts_used:
-            font_blocks = [block for block in blocks if block.font_name == font]
-            font_analysis[font] = {
-                "count": len(font_blocks),
-                "avg_length": sum(len(block.text) for block in font_blocks) / len(font_blocks) if font_blocks else 0,
-                "sizes": set(block.font_size for block in font_blocks)
-            }
-        
-        # Step 5: Apply classification using multiple evidence sources
+        # Step 3: Apply classification using multiple evidence sources
         for block in blocks:
             # Rule 1: Size-based classification
-            if block.font_size in heading_levels:
+            level = heading_levels.get(block.font_size)
+            if level is not None:
                 block.block_type = "heading"
-                block.level = heading_levels[block.font_size]
+                block.level = level
                 continue
                 
-            # Rule 2: Bold text that's not common in document is likely a heading
-            bold_blocks = [b for b in blocks if b.is_bold]
-            bold_percentage = len(bold_blocks) / len(blocks) if blocks else 0
-            
-            if block.is_bold and bold_percentage < 0.3:  # If less than 30% of text is bold
-                if block.font_size >= body_font_size:
-                    block.block_type = "heading"
-                    block.level = len(heading_levels) + 1 if heading_levels else 1
-                    continue
+            # Rule 2: Rare bold text at least body size
+            if block.is_bold and bold_is_rare and block.font_size >= body_font_size:
+                block.block_type = "heading"
+                block.level = bold_heading_level
+                continue
             
             # Rule 3: Content-based pattern matching for headings
             if len(block.text) < 100:  # Potential heading by length
                 text = block.text.strip()
-                
-                # Check for common heading patterns
-                if re.match(r'^(?:chapter|section|part|appendix|figure|table)\s+\d+', text, re.IGNORECASE):
-                    block.block_type = "heading"
-                    block.level = 1 if text.lower().startswith(("chapter", "part")) else 2
-                    continue
-                    
-                # Numbered headings (1., 1.1, etc.)
-                if re.match(r'^\d+(\.\d+)*\.?\s+\S+', text):
-                    parts = re.match(r'^\d+(\.\d+)*', text).group(0).count('.') + 1
-                    block.block_type = "heading"
-                    block.level = parts
-                    continue
-                    
-                # Letter headings (A., B., etc.)
-                if re.match(r'^[A-Z]\.(\d+)?\s+\S+', text):
-                    block.block_type = "heading"
-                    block.level = 2
-                    continue
-                    
-                # Roman numeral headings
-                if re.match(r'^[IVXLCDM]+\.\s+\S+', text):
+                level = PDFProcessor._pattern_heading_level(text)
+                if level is not None:
                     block.block_type = "heading"
-                    block.level = 1
+                    block.level = level
                     continue
             
             # Rule 4: Detect list items
-            if re.match(r'^\s*[-•*]\s+\S+', block.text) or re.match(r'^\s*\d+\.\s+\S+', block.text):
+            if LIST_ITEM_PATTERN.match(block.text):
                 block.block_type = "list_item"
                 continue
                 
             # Default is paragraph
             block.block_type = "paragraph"
         
-        # Step 6: Fix potential classification errors using contextual information
-        # Group by page
-        pages = defaultdict(list)
-        for block in blocks:
-            pages[block.page_num].append(block)
-            
-        # Check for title on first page
-        if 0 in pages and pages[0]:
-            first_page_blocks = sorted(pages[0], key=lambda b: b.font_size, reverse=True)
-            if first_page_blocks and first_page_blocks[0].font_size > body_font_size * 1.3:
-                first_page_blocks[0].block_type = "title"
+        # Step 4: The largest text on the first page is the title, if it stands out
+        if first_page_title is not None and first_page_title.font_size > body_font_size * 1.3:
+            first_page_title.block_type = "title"
                 
         return blocks
+
+    @staticmethod
+    def _pattern_heading_level(text: str) -> Optional[int]:
+        """Heading level implied by a heading-like prefix (chapter, numbering, letters, roman numerals)."""
+        for pattern, level in HEADING_PATTERNS:
+            if pattern.match(text):
+                return level(text)
+        return None
     
     @staticmethod
     def organize_blocks_into_document(blocks: List[TextBlock]) -> Dict:
         """
         Organize the classified blocks into a hierarchical document structure.
         """
-        # Sort blocks by page number and vertical position
-        sorted_blocks = sorted(blocks, key=lambda b: (b.page_num, b.bbox[1]))
+        # Sort blocks by page number, column and vertical position
+        sorted_blocks = sorted(blocks, key=lambda b: (b.page_num, b.column, b.bbox[1]))
         
         # Root structure
         document = {
@@ -458,8 +544,8 @@ class PDFProcessor:
                 "file_size": len(file_data),
             }
             
-            # Extract rich text blocks with formatting
-            text_blocks = extract_text_blocks(pdf_document)
+            # Extract rich text blocks with formatting, and the page images
+            text_blocks, image_blocks = extract_document_blocks(file_data, pdf_document)
             
             # Analyze document structure
             classified_blocks = PDFProcessor.analyze_document_structure(text_blocks)
@@ -467,56 +553,18 @@ class PDFProcessor:
             # Organize into hierarchical document
             document_structure = PDFProcessor.organize_blocks_into_document(classified_blocks)
             
-            # Extract and convert images
-            images = {}
-            for block in text_blocks:
-                if block.block_type == "image":
-                    image_id = block.image_id
-                    image_data = block.image_data
-                    image_format = block.format
-                    image_width = block.width
-                    image_height = block.height
-                    image_caption = block.caption
-                    
-                    # Create unique image ID using hash of image data for deduplication
-                    image_hash = hashlib.md5(image_data).hexdigest()[:10]
-                    image_filename = f"img_{block.page_num+1}_{image_hash}.{image_format}"
-                    
-                    # Process image with PIL for consistency
-                    try:
-                        pil_image = Image.open(io.BytesIO(image_data))
-                        
-                        # Check if image is too small (likely an icon or bullet)
-                        if pil_image.width < 20 or pil_image.height < 20:
-                            continue
-                        
-                        # Convert to base64
-                        buffered = io.BytesIO()
-                        pil_image.save(buffered, format=image_format.upper())
-                        img_b64 = base64.b64encode(buffered.getvalue()).decode()
-                        
-                        # Store image with metadata
-                        images[image_filename] = {
-                            "data": img_b64,
-                            "format": image_format,
-                            "width": pil_image.width,
-                            "height": pil_image.height,
-                            "page": block.page_num + 1,
-                            "mode": pil_image.mode,
-                            "hash": image_hash,
-                            "caption": image_caption
-                        }
-                    except Exception as pil_error:
-                        logger.warning(f"Error processing image with PIL: {str(pil_error)}")
-                        # Fallback: store raw image without PIL processing
-                        img_b64 = base64.b64encode(image_data).decode()
-                        images[image_filename] = {
-                            "data": img_b64,
-                            "format": image_format,
-                            "page": block.page_num + 1,
-                            "hash": image_hash,
-                            "caption": image_caption
-                        }
+            # Collect images as their original encoded bytes, one per distinct image
+            collector = ImageCollector()
+            for block in image_blocks:
+                collector.add(
+                    block.image_data,
+                    page=block.page_num + 1,
+                    caption=block.caption,
+                    format=block.format,
+                    width=block.width,
+                    height=block.height
+                )
+            images = collector.by_filename()
             
             # Generate flat text representation
             text_content = PDFProcessor.document_to_text(document_structure)
@@ -857,22 +905,6 @@ class PDFProcessor:
         return result
 
     @staticmethod
-    def prepare_images_for_upload(images: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-        """
-        Prepare extracted images for upload using DocTags information.
-        """
-        upload_ready = {}
-        
-        for image_id, img_data in images.items():
-            upload_ready[image_id] = {
-                "bbox": img_data.get("bbox", (0, 0, 0, 0)),
-                "caption": img_data.get("caption", ""),
-                "page": img_data.get("page_num", 0),
-                "confidence": img_data.get("confidence", 1.0)
-            }
-        
-        return upload_ready
-    @staticmethod
     def process_text_to_index(text: str, knowledge_id: int, knowledge_name: str) -> Tuple[Dict, List[Dict]]:
         """Reuse the PDF text to index processing logic."""
         from pdf_processor import PDFProcessor
@@ -900,7 +932,7 @@ class PDFProcessor:
         client = OpenAI(api_key=openai_api_key, base_url="http://192.168.1.12:1234/v1")
         
         # Step 1: Split text into chunks using VideoProcessorV2
-        chunks = VideoProcessorV2.chunk_text(pdf_text)
+        chunks = VideoProcessorV2.chunk_text(pdf_text, model=openai_model)
         logger.info(f"Split PDF text into {len(chunks)} chunks")
         
         # Step 2: Process chunks in batches using VideoProcessorV2
@@ -1,8 +1,6 @@
 import logging
-import base64
 import io
 import re
-import hashlib
 import os
 import json
 import time
@@ -16,9 +14,10 @@ import pptx
 from pptx import Presentation
 from pptx.shapes.autoshape import Shape
 from pptx.shapes.picture import Picture
-from PIL import Image
 from openai import OpenAI
 
+from image_pipeline import ExtractedImage, ImageCollector
+
 # Reuse TextBlock from pdf_processor.py
 @dataclass
 class TextBlock:
@@ -263,10 +262,14 @@ class PPTXProcessor:
         return document
     
     @staticmethod
-    def extract_images(pptx_document: Presentation) -> Dict[str, Any]:
-        """Extract images from a PPTX presentation."""
-        images = {}
-        image_index = 0
+    def extract_images(pptx_document: Presentation) -> Dict[str, ExtractedImage]:
+        """
+        Extract images from a PPTX presentation, keyed by filename.
+        
+        An image repeated across slides, such as a logo, is kept once, under
+        the first slide it appears on.
+        """
+        collector = ImageCollector()
         
         try:
             # First try a more direct approach using presentation-level relationships
@@ -274,43 +277,8 @@ class PPTXProcessor:
                 # Check if relation is an image
                 if "image" in rel.reltype:
                     try:
-                        # Access image data
-                        image_part = rel.target_part
-                        image_bytes = image_part.blob
-                        
-                        if not image_bytes:
-                            continue
-                            
-                        # Process image with PIL
-                        image_stream = io.BytesIO(image_bytes)
-                        pil_image = Image.open(image_stream)
-                        
-                        # Get image format
-                        image_format = pil_image.format.lower() if pil_image.format else "png"
-                        
-                        # Create unique ID
-                        image_hash = hashlib.md5(image_bytes).hexdigest()[:10]
-                        image_filename = f"img_pres_{image_index}_{image_hash}.{image_format}"
-                        
-                        # Skip small images
-                        if pil_image.width < 20 or pil_image.height < 20:
-                            continue
-                            
-                        # Convert to base64
-                        img_b64 = base64.b64encode(image_bytes).decode()
-                        
-                        # Store image
-                        images[image_filename] = {
-                            "data": img_b64,
-                            "format": image_format,
-                            "width": pil_image.width,
-                            "height": pil_image.height,
-                            "page": 0,  # Presentation-level image
-                            "mode": pil_image.mode,
-                            "hash": image_hash
-                        }
-                        
-                        image_index += 1
+                        # Presentation-level image
+                        collector.add(rel.target_part.blob, page=0)
                     except Exception as e:
                         logger.warning(f"Error extracting presentation-level image: {str(e)}")
         except Exception as e:
@@ -323,43 +291,7 @@ class PPTXProcessor:
                 for rel in slide.part.rels.values():
                     if "image" in rel.reltype:
                         try:
-                            # Access image part data
-                            image_part = rel.target_part
-                            image_bytes = image_part.blob
-                            
-                            if not image_bytes:
-                                continue
-                                
-                            # Process image with PIL
-                            image_stream = io.BytesIO(image_bytes)
-                            pil_image = Image.open(image_stream)
-                            
-                            # Get image format
-                            image_format = pil_image.format.lower() if pil_image.format else "png"
-                            
-                            # Create unique ID
-                            image_hash = hashlib.md5(image_bytes).hexdigest()[:10]
-                            image_filename = f"img_slide{slide_num+1}_{image_index}_{image_hash}.{image_format}"
-                            
-                            # Skip small images
-                            if pil_image.width < 20 or pil_image.height < 20:
-                                continue
-                                
-                            # Convert to base64
-                            img_b64 = base64.b64encode(image_bytes).decode()
-                            
-                            # Store image
-                            images[image_filename] = {
-                                "data": img_b64,
-                                "format": image_format,
-                                "width": pil_image.width,
-                                "height": pil_image.height,
-                                "page": slide_num + 1,
-                                "mode": pil_image.mode,
-                                "hash": image_hash
-                            }
-                            
-                            image_index += 1
+                            collector.add(rel.target_part.blob, page=slide_num + 1)
                         except Exception as e:
                             logger.warning(f"Error extracting image from slide {slide_num + 1}: {str(e)}")
             except Exception as e:
@@ -381,59 +313,16 @@ class PPTXProcessor:
                             image_part = slide.part.rels[image_rid].target_part
                         else:
                             continue
-                            
-                        image_bytes = image_part.blob
-                        
-                        # Skip if no image data
-                        if not image_bytes:
-                            continue
-                        
-                        # Create a unique hash to avoid duplicates with those already extracted
-                        image_hash = hashlib.md5(image_bytes).hexdigest()[:10]
-                        
-                        # Check if we already extracted this image
-                        duplicate = False
-                        for existing in images.values():
-                            if existing.get("hash") == image_hash:
-                                duplicate = True
-                                break
-                                
-                        if duplicate:
-                            continue
-                        
-                        # Process the image
-                        image_stream = io.BytesIO(image_bytes)
-                        pil_image = Image.open(image_stream)
-                        
-                        # Determine image format
-                        image_format = pil_image.format.lower() if pil_image.format else "png"
-                        
-                        image_filename = f"img_shape{slide_num+1}_{image_index}_{image_hash}.{image_format}"
-                        
-                        # Skip small images
-                        if pil_image.width < 20 or pil_image.height < 20:
-                            continue
-                            
-                        # Convert to base64
-                        img_b64 = base64.b64encode(image_bytes).decode()
-                        
-                        # Store image
-                        images[image_filename] = {
-                            "data": img_b64,
-                            "format": image_format,
-                            "width": pil_image.width,
-                            "height": pil_image.height,
-                            "page": slide_num + 1,
-                            "mode": pil_image.mode,
-                            "hash": image_hash
-                        }
                         
-                        image_index += 1
+                        # Images already collected are recognised by content and skipped
+                        collector.add(image_part.blob, page=slide_num + 1)
                     except Exception as e:
                         # Just log as debug since we're using multiple fallback approaches
                         logger.debug(f"Error with shape-based image extraction on slide {slide_num + 1}: {str(e)}")
         
-        return images
+        if collector.duplicates:
+            logger.info(f"Skipped {collector.duplicates} repeated images")
+        return collector.by_filename()
     
     @staticmethod
     def document_to_text(document: Dict) -> str:
@@ -575,7 +464,7 @@ class PPTXProcessor:
         client = OpenAI(api_key=openai_api_key)
         
         # Step 1: Split text into chunks using VideoProcessorV2
-        chunks = VideoProcessorV2.chunk_text(text)
+        chunks = VideoProcessorV2.chunk_text(text, model=openai_model)
         logger.info(f"Split PPTX text into {len(chunks)} chunks")
         
         # Step 2: Process chunks in batches
@@ -720,47 +609,3 @@ class PPTXProcessor:
         )
         
         return course_structure, chapters
-    
-    @staticmethod
-    def prepare_images_for_upload(images: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-        """
-        Prepare extracted images for upload - custom implementation for PPTX.
-        
-        Args:
-            images: Dictionary of images extracted from PPTX
-            
-        Returns:
-            Dictionary ready for upload with standardized metadata and buffer
-        """
-        upload_ready = {}
-        
-        for filename, img_data in images.items():
-            # Extract the base64 encoded data
-            img_base64 = img_data.get("data", "")
-            
-            # Convert base64 to bytes for upload
-            img_bytes = base64.b64decode(img_base64) if img_base64 else b""
-            
-            # Get image format
-            img_format = img_data.get("format", "png")
-            
-            # Create standardized metadata
-            upload_ready[filename] = {
-                "buffer": img_bytes,  # Add the bytes data as buffer
-                "format": img_format,
-                "width": img_data.get("width", 0),
-                "height": img_data.get("height", 0),
-                "page": img_data.get("page", 1),
-                "metadata": {
-                    "filename": filename,
-                    "format": img_format,
-                    "width": img_data.get("width", 0),
-                    "height": img_data.get("height", 0),
-                    "page": img_data.get("page", 1),
-                    "mode": img_data.get("mode", ""),
-                    "hash": img_data.get("hash", ""),
-                    "size_bytes": len(img_bytes) if img_bytes else 0
-                }
-            }
-        
-        return upload_ready 
\ No newline at end of file
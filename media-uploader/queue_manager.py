@@ -3,46 +3,138 @@ import threading
 import time
 import json
 import os
+import socket
+import uuid
 from datetime import datetime
-from queue import Queue, Empty
 from typing import Dict, Optional, List, Any, Callable
 
-from database import DatabaseManager
-from pdf_processor import PDFProcessor
-from docx_processor import DOCXProcessor
-from pptx_processor import PPTXProcessor
-from video_processor_v2 import VideoProcessorV2
+from database import DatabaseManager, get_database_manager
+from ingestion_executor import get_ingestion_executor
+from image_pipeline import upload_images
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Job types handled by the queue workers
+JOB_TYPE_INGEST = "ingest"
+JOB_TYPE_CONTENT_GENERATION = "content_generation"
+
 
 class QueueManager:
-    """Manager for job queue and processing thread."""
+    """
+    Manager for the durable job queue and its worker threads.
+
+    Jobs are persisted in the processing_jobs table and leased by workers with a
+    visibility timeout. A worker renews its lease while a job runs; if the process
+    dies the lease expires and another worker picks the job up again. Retries are
+    rescheduled in the database with a backoff instead of in-process timers.
+    """
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, worker_counts: Optional[Dict[str, int]] = None):
         """Initialize the queue manager."""
-        self.job_queue = Queue(2)
-        self.content_generation_queue = Queue(10)  # New queue for content generation
-        self.processing_thread = None
-        self.content_generation_thread = None  # New thread for content generation
-        self.is_processing = False
-        self.is_generating_content = False  # Flag for content generation
         self.db_manager = db_manager
         self.max_retries = 3
         self.retry_delays = [5, 30, 120]  # Exponential backoff: 5s, 30s, 2min
+
+        # Worker configuration
+        self.worker_counts = worker_counts or {
+            JOB_TYPE_INGEST: int(os.getenv("QUEUE_INGEST_WORKERS", "2")),
+            JOB_TYPE_CONTENT_GENERATION: int(os.getenv("QUEUE_CONTENT_WORKERS", "2")),
+        }
+        self.visibility_timeout = int(os.getenv("QUEUE_VISIBILITY_TIMEOUT", "600"))
+        self.poll_interval = float(os.getenv("QUEUE_POLL_INTERVAL", "2.0"))
+        self.worker_id_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.job_handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {
+            JOB_TYPE_INGEST: self._run_ingest_job,
+            JOB_TYPE_CONTENT_GENERATION: self._run_content_generation_job,
+        }
+        self.workers: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._wakeup_events = {job_type: threading.Event() for job_type in self.job_handlers}
+        self._start_lock = threading.Lock()
+        # Event loop shared by async job handlers, so they share one OpenAI client and its pool
+        self._async_loop = None
+        self._async_thread: Optional[threading.Thread] = None
         
         # Add health monitoring
         self.last_successful_generation = None
         self.consecutive_failures = 0
+
+    def start(self) -> None:
+        """Start the configured number of worker threads per job type (idempotent)."""
+        with self._start_lock:
+            if self.workers:
+                return
+            self._stop_event.clear()
+            for job_type, count in self.worker_counts.items():
+                for index in range(count):
+                    worker_id = f"{self.worker_id_prefix}:{job_type}:{index}:{uuid.uuid4().hex[:6]}"
+                    worker = threading.Thread(
+                        target=self._worker_loop,
+                        args=(job_type, worker_id),
+                        name=f"queue-{job_type}-{index}",
+                        daemon=True
+                    )
+                    worker.start()
+                    self.workers.append(worker)
+            logger.info(f"Started queue workers: {self.worker_counts}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal workers to stop after their current job and wait for them."""
+        self._stop_event.set()
+        for event in self._wakeup_events.values():
+            event.set()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+        self._stop_async_loop(timeout)
+
+    def _run_async(self, coro) -> Any:
+        """Run a coroutine on the shared job event loop and wait for its result."""
+        import asyncio
+
+        with self._start_lock:
+            if self._async_loop is None:
+                self._async_loop = asyncio.new_event_loop()
+                self._async_thread = threading.Thread(
+                    target=self._async_loop.run_forever,
+                    name="queue-async",
+                    daemon=True
+                )
+                self._async_thread.start()
+            loop = self._async_loop
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def _stop_async_loop(self, timeout: float) -> None:
+        """Close the shared OpenAI client and stop the job event loop."""
+        import asyncio
+        from openai_client import close_openai_client
+
+        with self._start_lock:
+            loop, thread = self._async_loop, self._async_thread
+            self._async_loop = self._async_thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(close_openai_client(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Failed to close OpenAI client: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
         
-    def add_job(self, knowledge_id: int) -> None:
-        """Add a job to the queue."""
-        self.job_queue.put({"knowledge_id": knowledge_id, "retry_count": 0})
-        self.ensure_processing_thread()
+    def add_job(self, knowledge_id: int, max_retries: Optional[int] = None) -> int:
+        """Add an ingestion job to the queue."""
+        job_id = self.db_manager.enqueue_job(
+            JOB_TYPE_INGEST,
+            knowledge_id,
+            max_retries=self.max_retries if max_retries is None else max_retries
+        )
+        self._wakeup_events[JOB_TYPE_INGEST].set()
+        return job_id
         
-    def add_content_generation_job(self, knowledge_id: int, types: List[str], language: str = "English") -> None:
+    def add_content_generation_job(self, knowledge_id: int, types: List[str], language: str = "English") -> int:
         """
         Add a content generation job to the queue.
         
@@ -51,12 +143,168 @@ class QueueManager:
             types: List of content types to generate (notes, summary, quiz, mindmap)
             language: Language for content generation
         """
-        self.content_generation_queue.put({
-            "knowledge_id": knowledge_id,
-            "types": types,
-            "language": language
-        })
-        self.ensure_content_generation_thread()
+        job_id = self.db_manager.enqueue_job(
+            JOB_TYPE_CONTENT_GENERATION,
+            knowledge_id,
+            payload={"types": types, "language": language},
+            max_retries=self.max_retries
+        )
+        self._wakeup_events[JOB_TYPE_CONTENT_GENERATION].set()
+        return job_id
+
+    async def get_status(self, knowledge_id: int) -> Optional[Dict[str, Any]]:
+        """Get the state of the most recent queued job for a knowledge entry."""
+        import asyncio
+
+        # Keep the blocking query off the caller's event loop
+        job = await asyncio.to_thread(self.db_manager.get_latest_job, knowledge_id)
+        if not job:
+            return None
+        return {
+            "job_id": job["id"],
+            "job_type": job["job_type"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "run_at": job["run_at"].isoformat() if job["run_at"] else None,
+            "message": job["last_error"] or f"{job['job_type']} job {job['status']}"
+        }
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get per-type job counts and worker configuration."""
+        return {
+            job_type: {
+                "workers": self.worker_counts.get(job_type, 0),
+                "jobs": self.db_manager.count_jobs(job_type)
+            }
+            for job_type in self.job_handlers
+        }
+
+    def _worker_loop(self, job_type: str, worker_id: str) -> None:
+        """Lease and run jobs of one type until the queue manager is stopped."""
+        wakeup = self._wakeup_events[job_type]
+        while not self._stop_event.is_set():
+            try:
+                job = self.db_manager.lease_job(job_type, worker_id, self.visibility_timeout)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to lease a job: {str(e)}")
+                job = None
+
+            if job is None:
+                # Sleep until the poll interval elapses or a local enqueue wakes us
+                wakeup.wait(self.poll_interval)
+                wakeup.clear()
+                continue
+
+            self._run_leased_job(job, worker_id)
+
+    def _run_leased_job(self, job: Dict[str, Any], worker_id: str) -> None:
+        """Run a leased job while renewing its lease, then record the outcome."""
+        retry_count = job["attempts"] - 1
+        if retry_count > job["max_retries"]:
+            # Lease expired repeatedly (e.g. the job keeps crashing the worker)
+            self._handle_job_failure(job, worker_id, "Job lease expired too many times")
+            return
+
+        lease_done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._renew_lease,
+            args=(job["id"], worker_id, lease_done),
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            logger.info(f"Worker {worker_id} running {job['job_type']} job {job['id']} for knowledge {job['knowledge_id']} (retry #{retry_count})")
+            self.job_handlers[job["job_type"]](job)
+        except Exception as e:
+            lease_done.set()
+            logger.error(f"Error running {job['job_type']} job {job['id']} for knowledge {job['knowledge_id']}: {str(e)}")
+            self._handle_job_failure(job, worker_id, str(e))
+        else:
+            lease_done.set()
+            try:
+                self.db_manager.complete_job(job["id"], worker_id)
+            except Exception as e:
+                logger.error(f"Error completing job {job['id']}: {str(e)}")
+
+    def _renew_lease(self, job_id: int, worker_id: str, done: threading.Event) -> None:
+        """Extend a job's lease periodically until done is set."""
+        interval = max(self.visibility_timeout / 3, 1)
+        while not done.wait(interval):
+            if not self.db_manager.extend_job_lease(job_id, worker_id, self.visibility_timeout):
+                logger.warning(f"Worker {worker_id} lost the lease on job {job_id}")
+                return
+
+    def _retry_delay(self, retry_count: int) -> int:
+        """Backoff delay before the given retry."""
+        return self.retry_delays[min(retry_count, len(self.retry_delays) - 1)]
+
+    def _handle_job_failure(self, job: Dict[str, Any], worker_id: str, error: str) -> None:
+        """Reschedule a failed job with backoff, or fail it permanently once retries run out."""
+        knowledge_id = job["knowledge_id"]
+        retry_count = job["attempts"] - 1
+        max_retries = job["max_retries"]
+
+        try:
+            if job["job_type"] == JOB_TYPE_INGEST:
+                self._record_ingest_retry(knowledge_id, retry_count, max_retries)
+
+            if retry_count >= max_retries:
+                logger.error(f"Maximum retry count reached for {job['job_type']} job on knowledge {knowledge_id}")
+                self.db_manager.fail_job(job["id"], worker_id, error)
+                return
+
+            delay = self._retry_delay(retry_count)
+            logger.info(f"Scheduling retry #{retry_count + 1} of {job['job_type']} job for knowledge {knowledge_id} in {delay} seconds")
+            self.db_manager.retry_job(job["id"], worker_id, delay, error)
+        except Exception as e:
+            # Leave the lease to expire; another worker will recover the job
+            logger.error(f"Error recording failure of job {job['id']}: {str(e)}")
+
+    def _record_ingest_retry(self, knowledge_id: int, retry_count: int, max_retries: int) -> None:
+        """Update knowledge retry bookkeeping after a failed ingestion attempt."""
+        if retry_count >= max_retries:
+            logger.warning(f"Maximum retry count reached for knowledge {knowledge_id}")
+            self.db_manager.update_knowledge_status(
+                knowledge_id, 
+                "failed", 
+                {"error": f"Maximum retry count ({max_retries}) reached"}
+            )
+            try:
+                self.db_manager.add_retry_history(
+                    knowledge_id, 
+                    "failed", 
+                    f"Maximum retry count ({max_retries}) reached"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to add retry history (table may not exist): {str(e)}")
+            return
+
+        # Update retry info in database
+        self.db_manager.update_retry_info(knowledge_id, retry_count + 1)
+        
+        # Add retry history
+        try:
+            self.db_manager.add_retry_history(
+                knowledge_id, 
+                "retry_scheduled", 
+                f"Retry #{retry_count + 1} scheduled"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to add retry history (table may not exist): {str(e)}")
+
+    def _run_ingest_job(self, job: Dict[str, Any]) -> None:
+        """Handler for ingestion jobs."""
+        self._process_knowledge(job["knowledge_id"], job["attempts"] - 1)
+
+    def _run_content_generation_job(self, job: Dict[str, Any]) -> None:
+        """Handler for content generation jobs."""
+        payload = job["payload"]
+        types = payload.get("types", ["notes", "summary", "quiz", "mindmap"])
+        language = payload.get("language", "English")
+        logger.info(f"Generating content for knowledge {job['knowledge_id']}, types: {types}, language: {language}")
+        # Jobs share one event loop so concurrent jobs share the OpenAI client and its connection pool
+        self._run_async(self._generate_content(job["knowledge_id"], types, language))
+        self.last_successful_generation = datetime.utcnow()
         
     def _extract_chapters_from_markdown(self, markdown: str, knowledge_id: int) -> List[Dict]:
         """Extract chapters from markdown text based on headers."""
@@ -123,165 +371,23 @@ class QueueManager:
         
         return chapters
 
-    def add_retry_job(self, knowledge_id: int, retry_count: int) -> None:
-        """Add a retry job to the queue."""
-        if retry_count >= self.max_retries:
-            logger.warning(f"Maximum retry count reached for knowledge {knowledge_id}")
-            self.db_manager.update_knowledge_status(
-                knowledge_id, 
-                "failed", 
-                {"error": f"Maximum retry count ({self.max_retries}) reached"}
-            )
-            try:
-                self.db_manager.add_retry_history(
-                    knowledge_id, 
-                    "failed", 
-                    f"Maximum retry count ({self.max_retries}) reached"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to add retry history (table may not exist): {str(e)}")
-            return
-            
-        # Calculate delay based on retry count
-        delay = self.retry_delays[min(retry_count, len(self.retry_delays) - 1)]
-        
-        logger.info(f"Scheduling retry #{retry_count + 1} for knowledge {knowledge_id} in {delay} seconds")
-        
-        # Update retry info in database
-        self.db_manager.update_retry_info(knowledge_id, retry_count + 1)
-        
-        # Add retry history
-        try:
-            self.db_manager.add_retry_history(
-                knowledge_id, 
-                "retry_scheduled", 
-                f"Retry #{retry_count + 1} scheduled"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to add retry history (table may not exist): {str(e)}")
-        
-        # Schedule the retry after delay
-        threading.Timer(delay, self._add_delayed_job, args=[knowledge_id, retry_count]).start()
-        
-    def _add_delayed_job(self, knowledge_id: int, retry_count: int) -> None:
-        """Add a job to the queue after a delay (for retries)."""
-        logger.info(f"Adding delayed retry job for knowledge {knowledge_id}, retry #{retry_count + 1}")
-        self.job_queue.put({"knowledge_id": knowledge_id, "retry_count": retry_count + 1})
-        self.ensure_processing_thread()
-        
-    def process_queue(self) -> None:
-        """Process items in the queue."""
-        self.is_processing = True
-        
-        while True:
-            try:
-                job = self.job_queue.get(timeout=1)  # 1-second timeout
-                knowledge_id = job["knowledge_id"]
-                retry_count = job.get("retry_count", 0)
-                
-                logger.info(f"Processing knowledge {knowledge_id} (retry #{retry_count})")
-                
-                try:
-                    self._process_knowledge(knowledge_id, retry_count)
-                    # Mark job as done
-                    self.job_queue.task_done()
-                except Exception as e:
-                    logger.error(f"Error processing knowledge {knowledge_id}: {str(e)}")
-                    # Handle retry
-                    self.add_retry_job(knowledge_id, retry_count)
-                    # Mark job as done
-                    self.job_queue.task_done()
-                    
-            except Empty:
-                self.is_processing = False
-                break
-            except Exception as e:
-                logger.error(f"Error in processing thread: {str(e)}")
-                self.is_processing = False
-                break
-                
-    def ensure_processing_thread(self) -> None:
-        """Ensure the processing thread is running."""
-        if self.processing_thread is None or not self.processing_thread.is_alive():
-            if not self.is_processing:
-                self.processing_thread = threading.Thread(target=self.process_queue)
-                self.processing_thread.daemon = True
-                self.processing_thread.start()
-                
-    def ensure_content_generation_thread(self) -> None:
-        """Ensure the content generation thread is running."""
-        if self.content_generation_thread is None or not self.content_generation_thread.is_alive():
-            if not self.is_generating_content:
-                self.content_generation_thread = threading.Thread(target=self.process_content_generation_queue)
-                self.content_generation_thread.daemon = True
-                self.content_generation_thread.start()
-                
-    def process_content_generation_queue(self) -> None:
-        """Process items in the content generation queue."""
-        self.is_generating_content = True
-        
-        import asyncio
-        
-        while True:
-            try:
-                job = self.content_generation_queue.get(timeout=1)  # 1-second timeout
-                knowledge_id = job["knowledge_id"]
-                types = job["types"]
-                language = job.get("language", "English")
-                retry_count = job.get("retry_count", 0)
-                
-                logger.info(f"Generating content for knowledge {knowledge_id}, types: {types}, language: {language}")
-                
-                try:
-                    # Use asyncio.run to run the async function in sync context
-                    asyncio.run(self._generate_content(knowledge_id, types, language))
-                    # Mark job as done
-                    self.content_generation_queue.task_done()
-                except Exception as e:
-                    logger.error(f"Error generating content for knowledge {knowledge_id}: {str(e)}")
-                    
-                    # Handle retry logic
-                    if retry_count < self.max_retries:
-                        logger.info(f"Scheduling retry #{retry_count + 1} for content generation for knowledge {knowledge_id}")
-                        # Re-add the job to the queue with incremented retry count
-                        self.content_generation_queue.put({
-                            "knowledge_id": knowledge_id,
-                            "types": types,
-                            "language": language,
-                            "retry_count": retry_count + 1
-                        })
-                    else:
-                        logger.error(f"Maximum retry count reached for content generation for knowledge {knowledge_id}")
-                        # Mark job as done if max retries reached
-                        self.content_generation_queue.task_done()
-                    
-            except Empty:
-                self.is_generating_content = False
-                break
-            except Exception as e:
-                logger.error(f"Error in content generation thread: {str(e)}")
-                self.is_generating_content = False
-                break
-                
     async def _generate_content(self, knowledge_id: int, types: List[str], language: str) -> None:
         """
         Generate content for a knowledge entry.
         
-        This method makes an internal request to the generate-content endpoint.
+        All chapters and types are generated concurrently; each chapter is
+        stored as soon as its last type completes.
         """
         try:
-            import requests
-            from openai_client import OpenAIClient
-            from openai_functions import generate_notes, generate_summary, generate_questions, generate_mind_map_structure
+            import asyncio
+            from openai_client import get_openai_client
+            from content_orchestrator import ContentGenerationOrchestrator, GenerationResult
             
-            # Get OpenAI client
-            openai_client = OpenAIClient(
-                api_key=os.environ.get("OPENAI_API_KEY", "local-api-key"), 
-                base_url=os.environ.get("OPENAI_BASE_URL")
-            )
+            # Get the shared OpenAI client
+            openai_client = get_openai_client()
             
-            # Get chapter data from the database
-            chapters = self.db_manager.get_chapter_data(knowledge_id)
+            # Get chapter data from the database without blocking the shared job loop
+            chapters = await asyncio.to_thread(self.db_manager.get_chapter_data, knowledge_id)
             
             if not chapters or len(chapters) == 0:
                 logger.error(f"No chapters found for knowledge_id={knowledge_id}")
@@ -289,66 +395,43 @@ class QueueManager:
             
             logger.info(f"Found {len(chapters)} chapters to process for content generation")
             
-            # Define type generators mapping
-            type_generators = {
-                "notes": generate_notes,
-                "summary": generate_summary,
-                "quiz": generate_questions,
-                "mindmap": generate_mind_map_structure,
-            }
-            
-            # Process each chapter
-            for chapter in chapters:
-                chapter_id = chapter.id
-                
-                # Generate content for each requested type
-                results = {}
-                for content_type in types:
-                    if content_type not in type_generators:
-                        logger.warning(f"{content_type} not supported")
-                        continue
-                    
-                    generator = type_generators[content_type]
-                    
-                    try:
-                        # Call the appropriate generator function
-                        if content_type == "mindmap":
-                            generated = await generator(openai_client, chapter.content or "", language)
-                        elif content_type == "quiz":
-                            generated = await generator(openai_client, chapter.content or "", language)
-                        else:
-                            generated = await generator(openai_client, chapter.content or "", language)
-                            # Join the chunked results with a delimiter for storage
-                            generated = "|||||".join(generated) if isinstance(generated, list) else generated
-                        
-                        results[content_type] = generated
-                        logger.info(f"Successfully generated {content_type} content for chapter {chapter_id}")
-                        self.consecutive_failures = 0  # Reset failure counter on success
-                    except Exception as e:
-                        error_msg = f"Error generating {content_type} for chapter {chapter_id}: {str(e)}"
-                        logger.error(error_msg)
-                        results[content_type] = f"Error: Unable to generate {content_type} content at this time."
-                        self.consecutive_failures += 1
-                
-                # Update content in the database using the EdTechContent model
-                logger.info(f"Updating content for chapter {chapter_id}, language {language}")
+            orchestrator = ContentGenerationOrchestrator(openai_client)
+            supported_types = orchestrator.supported_types(types)
+            for content_type in types:
+                if content_type not in supported_types:
+                    logger.warning(f"{content_type} not supported")
+
+            async def on_result(result: GenerationResult) -> None:
+                if result.ok:
+                    self.consecutive_failures = 0  # Reset failure counter on success
+                else:
+                    self.consecutive_failures += 1
+
+            async def on_chapter(chapter, generation_results: List[GenerationResult]) -> None:
+                results = {
+                    result.content_type: result.content if result.ok
+                    else f"Error: Unable to generate {result.content_type} content at this time."
+                    for result in generation_results
+                }
                 
+                # Persist each chapter as soon as its last type completes
+                logger.info(f"Updating content for chapter {chapter.id}, language {language}")
                 try:
-                    # Add knowledge_id to the content data
-                    content_data = {
-                        "knowledge_id": knowledge_id,
-                        **results
-                    }
-                    
-                    # Update or create content using the new method
-                    self.db_manager.update_edtech_content(
-                        chapter_id=chapter_id,
+                    await asyncio.to_thread(
+                        self.db_manager.update_edtech_content,
+                        chapter_id=chapter.id,
                         language=language,
-                        content_data=content_data
+                        content_data={
+                            "knowledge_id": knowledge_id,
+                            **results
+                        }
                     )
                 except Exception as e:
-                    logger.error(f"Error updating content for chapter {chapter_id}: {str(e)}")
+                    logger.error(f"Error updating content for chapter {chapter.id}: {str(e)}")
                     raise
+
+            # Generate every (chapter, type) pair concurrently under the shared generation limits
+            await orchestrator.run(chapters, types, language, on_result=on_result, on_chapter=on_chapter)
             
             logger.info(f"Content generation completed for knowledge {knowledge_id}, language {language}")
             
@@ -388,53 +471,57 @@ class QueueManager:
                 "file_types": [],
                 "total_files": len(media_files)
             }
-            
-            for media_file in media_files:
+
+            self.db_manager.update_knowledge_status(
+                knowledge_id, 
+                "processing", 
+                {
+                    "message": f"Processing {len(media_files)} files",
+                    "files": [media_file.original_filename for media_file in media_files],
+                    "progress": f"0/{len(media_files)}",
+                    "start_time": datetime.utcnow().isoformat()
+                }
+            )
+
+            completed_count = 0
+
+            def report_progress(media_file, extraction):
+                nonlocal completed_count
+                completed_count += 1
                 try:
-                    logger.info(f"Processing file: {media_file.original_filename}")
-                    
-                    # Download file from storage
-                    from storage import storage
-                    file_data = storage.download_file(media_file.file_path)
-                    
-                    if not file_data:
-                        raise ValueError(f"Could not download file: {media_file.file_path}")
-                    
-                    # Determine file type
-                    file_extension = os.path.splitext(media_file.original_filename)[1].lower()
-                    is_video = file_extension in ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v']
-                    
-                    # Update status to indicate current file being processed
                     self.db_manager.update_knowledge_status(
                         knowledge_id, 
                         "processing", 
                         {
-                            "message": f"Processing {'video' if is_video else 'document'}: {media_file.original_filename}",
+                            "message": f"Finished {media_file.original_filename}",
                             "current_file": media_file.original_filename,
-                            "file_type": "video" if is_video else "document",
-                            "progress": f"{len(processed_files) + 1}/{len(media_files)}",
+                            "progress": f"{completed_count}/{len(media_files)}",
                             "start_time": datetime.utcnow().isoformat()
                         }
                     )
+                except Exception as e:
+                    logger.warning(f"Failed to update progress for knowledge {knowledge_id}: {str(e)}")
+
+            # Extract all files in parallel worker processes
+            extractions = get_ingestion_executor().process_files(
+                media_files,
+                knowledge_id=knowledge.id,
+                knowledge_name=knowledge.name,
+                on_complete=report_progress
+            )
+
+            # Merge results in upload order so chapter order is deterministic
+            for media_file, extraction in zip(media_files, extractions):
+                try:
+                    if "error" in extraction:
+                        raise RuntimeError(extraction["error"])
+
+                    file_type = extraction["file_type"]
+
+                    if file_type == "video":
+                        textbook = extraction["textbook"]
+                        chapters = extraction["chapters"]
 
-                    if is_video:
-                        # Process video file
-                        logger.info(f"Processing video file: {media_file.original_filename}")
-                        
-                        # Process the video to get structured content using VideoProcessorV2
-                        textbook, chapters = VideoProcessorV2.process_video_to_chapters(
-                            file_data,
-                            knowledge_id=knowledge["id"],
-                            knowledge_name=knowledge["name"]
-                        )
-                        
-                        # Add chapters with file reference
-                        for chapter in chapters:
-                            chapter["meta_data"]["source_file"] = media_file.original_filename
-                            chapter["meta_data"]["media_id"] = media_file.id
-                        
-                        all_chapters.extend(chapters)
-                        
                         # Collect file metadata
                         file_result = {
                             "media_id": media_file.id,
@@ -448,114 +535,33 @@ class QueueManager:
                             "prerequisites": textbook.get("recommended_prerequisites", []),
                             "summary": textbook.get("summary")
                         }
-                        
-                        combined_metadata["file_types"].append("video")
-                        
                     else:
-                        # Process document file
-                        logger.info(f"Processing document file: {media_file.original_filename}")
-                        
-                        # Determine file type and process accordingly
-                        file_type = "document"
-                        if media_file.original_filename.lower().endswith('.pdf'):
-                            # Process PDF file
-                            markdown, images, metadata = PDFProcessor.process_pdf(file_data)
-                            processor = PDFProcessor
-                            file_type = "pdf"
-                        elif media_file.original_filename.lower().endswith('.docx'):
-                            # Process DOCX file
-                            markdown, images, metadata = DOCXProcessor.process_docx(file_data)
-                            processor = DOCXProcessor
-                            file_type = "docx"
-                        elif media_file.original_filename.lower().endswith('.pptx'):
-                            # Process PPTX file
-                            markdown, images, metadata = PPTXProcessor.process_pptx(file_data)
-                            processor = PPTXProcessor
-                            file_type = "pptx"
-                        elif media_file.original_filename.lower().endswith(('.md', '.txt')):
-                            # Process markdown/text files directly
-                            markdown = file_data.decode('utf-8') if isinstance(file_data, bytes) else file_data
-                            images = {}
-                            metadata = {
-                                "file_type": "text",
-                                "original_filename": media_file.original_filename,
-                                "processed_at": datetime.utcnow().isoformat()
-                            }
-                            processor = None
-                            file_type = "text"
-                        else:
-                            # Fallback to PDF processor for unknown document types
-                            result = PDFProcessor.process_pdf(file_data)
-                            if result is None:
-                                raise ValueError(f"Unsupported file type: {media_file.original_filename}")
-                            markdown, images, metadata = result
-                            processor = PDFProcessor
-        
-                        # Upload each extracted image to storage
+                        markdown = extraction["markdown"]
+
+                        # Upload the extracted images; images already stored are only linked
                         image_urls = {}
                         failed_images = []
-                        
-                        # Prepare images for upload
-                        prepared_images = processor.prepare_images_for_upload(images) if processor else {}
-                        
-                        # Upload images
-                        if prepared_images and len(prepared_images) > 0:
-                            for img_filename, img_data in prepared_images.items():
-                                try:
-                                    # Upload image to storage
-                                    from storage import storage
-                                    img_file_path = f"images/{knowledge_id}/{media_file.id}/{img_filename}"
-                                    
-                                    upload_result = storage.upload_file(
-                                        file_data=img_data["buffer"],
-                                        object_name=img_file_path,
-                                        content_type=f"image/{img_data['format']}",
-                                        metadata={
-                                            "knowledge_id": str(knowledge_id),
-                                            "media_id": str(media_file.id),
-                                            "source_file": media_file.original_filename
-                                        }
-                                    )
-                                    
-                                    if upload_result["success"]:
-                                        # Generate presigned URL for access
-                                        presigned_url = storage.generate_presigned_url(img_file_path)
-                                        
-                                        image_urls[img_filename] = {
-                                            "url": presigned_url,
-                                            "file_path": img_file_path,
-                                            "metadata": {
-                                                "width": img_data["width"],
-                                                "height": img_data["height"],
-                                                "page": img_data["page"],
-                                            },
-                                        }
-                                    else:
-                                        failed_images.append(img_filename)
-                                        
-                                except Exception as img_error:
-                                    logger.error(f"Failed to upload image {img_filename}: {str(img_error)}")
-                                    failed_images.append(img_filename)
-                                continue
-        
-                        # Analyze content and get chapters
-                        if processor:
-                            textbook, chapters = processor.process_text_to_index(
-                                markdown, 
-                                knowledge_id=knowledge["id"],
-                                knowledge_name=knowledge["name"]
-                            )
+                        upload_results = upload_images(extraction["images"], metadata={
+                            "knowledge_id": str(knowledge_id),
+                            "media_id": str(media_file.id),
+                            "source_file": media_file.original_filename
+                        })
+                        for img_filename, upload_result in upload_results.items():
+                            if upload_result["success"]:
+                                image_urls[img_filename] = {
+                                    "url": upload_result["url"],
+                                    "file_path": upload_result["file_path"],
+                                    "metadata": upload_result["metadata"],
+                                }
+                            else:
+                                failed_images.append(img_filename)
+
+                        if extraction["chapters"] is not None:
+                            textbook, chapters = extraction["textbook"], extraction["chapters"]
                         else:
                             # For text/markdown files, create simple chapters based on headers
                             textbook = markdown
                             chapters = self._extract_chapters_from_markdown(markdown, knowledge_id)
-                        
-                        # Add chapters with file reference
-                        for chapter in chapters:
-                            chapter["meta_data"]["source_file"] = media_file.original_filename
-                            chapter["meta_data"]["media_id"] = media_file.id
-                        
-                        all_chapters.extend(chapters)
         
                         # Collect file metadata
                         file_result = {
@@ -565,13 +571,20 @@ class QueueManager:
                             "processed_at": datetime.utcnow().isoformat(),
                             "chapters_count": len(chapters),
                             "markdown": markdown,
-                            "metadata": metadata,
+                            "metadata": extraction["metadata"],
                             "analysis": textbook,
                             "image_urls": image_urls,
                             "failed_images": failed_images
                         }
-                        
-                        combined_metadata["file_types"].append(file_type)
+
+                    # Add chapters with file reference
+                    for chapter in chapters:
+                        chapter.setdefault("meta_data", {})
+                        chapter["meta_data"]["source_file"] = media_file.original_filename
+                        chapter["meta_data"]["media_id"] = media_file.id
+                    
+                    all_chapters.extend(chapters)
+                    combined_metadata["file_types"].append(file_type)
                     
                     processed_files.append(file_result)
                     combined_metadata["processed_files"].append(file_result)
@@ -664,3 +677,27 @@ class QueueManager:
             
             # Re-raise the exception to trigger retry logic
             raise
+
+
+# Process-wide queue manager shared by all requests and services
+_queue_manager: Optional[QueueManager] = None
+_queue_manager_lock = threading.Lock()
+
+
+def get_queue_manager() -> QueueManager:
+    """Get the process-wide QueueManager, creating and starting it on first use."""
+    global _queue_manager
+    with _queue_manager_lock:
+        if _queue_manager is None:
+            _queue_manager = QueueManager(get_database_manager())
+            _queue_manager.start()
+        return _queue_manager
+
+
+def shutdown_queue_manager() -> None:
+    """Stop the process-wide QueueManager's workers, if it was started."""
+    global _queue_manager
+    with _queue_manager_lock:
+        if _queue_manager is not None:
+            _queue_manager.stop()
+            _queue_manager = None
@@ -93,7 +93,12 @@ async def build_knowledge_graph(
         if not chapters:
             raise HTTPException(status_code=400, detail="chapters are required")
             
-        neo4j_service.build_knowledge_graph(knowledge_id, chapters)
-        return {"message": "Knowledge graph built successfully"}
+        result = neo4j_service.build_knowledge_graph(knowledge_id, chapters)
+        return {
+            "message": "Knowledge graph built successfully",
+            "chapters": result["chapters"],
+            # Chapters without an id or chapter_id cannot be merged and are not written
+            "skipped_chapters": result["skipped_chapters"]
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to build knowledge graph: {str(e)}")
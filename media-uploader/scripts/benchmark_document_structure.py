@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for PDFProcessor.analyze_document_structure
+
+Builds synthetic documents of TextBlocks shaped like an extracted textbook:
+- body paragraphs in one font size
+- chapter and section headings in larger sizes
+- bold run-in headings, numbered headings and list items
+
+Usage:
+    python scripts/benchmark_document_structure.py --blocks 100000 --repeat 5
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import os
+import time
+from typing import List
+
+# Add parent directory to path to import local modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_layout import TextBlock
+from pdf_processor import PDFProcessor
+
+BLOCKS_PER_PAGE = 40
+
+SAMPLES = [
+    # (weight, text, font_size, is_bold)
+    (70, "The quick brown fox jumps over the lazy dog while the student reads the chapter.", 11.0, False),
+    (6, "- A bulleted point about the topic", 11.0, False),
+    (4, "3. A numbered step in a procedure", 11.0, False),
+    (5, "Key term", 11.0, True),
+    (5, "2.4 Numbered Section Heading", 11.0, False),
+    (4, "Section Heading", 14.0, True),
+    (2, "Chapter 7 Heading", 18.0, True),
+    (4, "Figure 3 A captioned figure", 9.0, False),
+]
+
+
+def synthetic_blocks(count: int, seed: int = 0) -> List[TextBlock]:
+    """Generate count synthetic blocks with a realistic mix of block kinds."""
+    rng = random.Random(seed)
+    weights = [sample[0] for sample in SAMPLES]
+    blocks = []
+    for index, (_, text, font_size, is_bold) in enumerate(rng.choices(SAMPLES, weights=weights, k=count)):
+        page_num, position = divmod(index, BLOCKS_PER_PAGE)
+        top = 40.0 + position * 18.0
+        blocks.append(TextBlock(
+            text=text,
+            font_size=font_size,
+            font_name="Times-Bold" if is_bold else "Times-Roman",
+            is_bold=is_bold,
+            is_italic=False,
+            color=(0, 0, 0),
+            bbox=(72.0, top, 540.0, top + 14.0),
+            page_num=page_num,
+            block_type="paragraph",
+            level=0,
+        ))
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDFProcessor.analyze_document_structure")
+    parser.add_argument("--blocks", type=int, default=100000, help="Blocks per synthetic document")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs")
+    args = parser.parse_args()
+
+    timings = []
+    for run in range(args.repeat):
+        blocks = synthetic_blocks(args.blocks, seed=run)
+        started = time.perf_counter()
+        PDFProcessor.analyze_document_structure(blocks)
+        timings.append(time.perf_counter() - started)
+
+    headings = sum(1 for block in blocks if block.block_type == "heading")
+    print(f"blocks: {args.blocks}, pages: {args.blocks // BLOCKS_PER_PAGE}, headings in last run: {headings}")
+    print(f"min {min(timings) * 1000:.1f} ms, median {statistics.median(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms over {args.repeat} runs")
+    print(f"{args.blocks / min(timings):,.0f} blocks/s")
+
+
+if __name__ == "__main__":
+    main()
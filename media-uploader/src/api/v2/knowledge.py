@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import json
 
-from database import get_db
+from database import get_db, get_async_db
 from src.models.v2_models import KnowledgeUploadRequest, KnowledgeResponse, KnowledgeListResponse
 from src.services.knowledge_service import KnowledgeService
+from src.services.async_read_service import AsyncReadService
 from src.services.auth_service import get_current_user
 from src.services.websocket_manager import websocket_manager
 from models import User
@@ -61,10 +63,9 @@ async def list_knowledge(
     limit: int = 100,
     status: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    knowledge_service = KnowledgeService(db)
-    items, total = await knowledge_service.list_knowledge(
+    items, total = await AsyncReadService(db).list_knowledge(
         user_id=current_user.id,
         skip=skip,
         limit=limit,
@@ -62,7 +62,8 @@ class LLMCache:
             "model": request.model,
             "temperature": request.temperature,
             "max_tokens": request.max_tokens,
-            "user_id": user_id
+            # Deterministic completions depend only on the request, so every user shares them
+            "user_id": None if request.temperature == 0 else user_id
         }, sort_keys=True)
         return f"llm_cache:{hashlib.sha256(content.encode()).hexdigest()}"
     
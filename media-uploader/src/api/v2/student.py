@@ -1,10 +1,12 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_, func, desc
 
-from database import get_db
+from database import get_db, get_async_db
 from src.services.auth_service import get_current_user
+from src.services.async_read_service import AsyncReadService
 from models import User
 import datetime
 
@@ -13,37 +15,11 @@ router = APIRouter()
 @router.get("/progress")
 async def get_student_progress(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get student's learning progress."""
     try:
-        # Get student progress from database
-        progress_query = db.execute("""
-            SELECT 
-                sp.knowledge_id,
-                k.name as knowledge_name,
-                sp.progress_percentage,
-                sp.study_time_minutes,
-                sp.completed_at,
-                sp.updated_at
-            FROM student_progress sp
-            JOIN knowledge k ON sp.knowledge_id = k.id
-            WHERE sp.user_id = :user_id
-            ORDER BY sp.updated_at DESC
-        """, {"user_id": current_user.id}).fetchall()
-        
-        progress_data = [
-            {
-                "knowledge_id": row.knowledge_id,
-                "knowledge_name": row.knowledge_name,
-                "progress_percentage": row.progress_percentage,
-                "study_time_minutes": row.study_time_minutes,
-                "completed_at": row.completed_at,
-                "updated_at": row.updated_at
-            }
-            for row in progress_query
-        ]
-        
+        progress_data = await AsyncReadService(db).get_student_progress(current_user.id)
         return {"success": True, "data": progress_data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get progress: {str(e)}")
@@ -129,48 +105,11 @@ async def get_student_achievements(
 @router.get("/dashboard-stats")
 async def get_student_dashboard_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get student dashboard statistics."""
     try:
-        # Calculate various stats
-        stats = {}
-        
-        # Total study time
-        total_study_time = db.execute("""
-            SELECT COALESCE(SUM(study_time_minutes), 0) as total_time
-            FROM student_progress 
-            WHERE user_id = :user_id
-        """, {"user_id": current_user.id}).scalar()
-        
-        # Completed courses
-        completed_courses = db.execute("""
-            SELECT COUNT(*) as completed
-            FROM student_progress 
-            WHERE user_id = :user_id AND progress_percentage >= 100
-        """, {"user_id": current_user.id}).scalar()
-        
-        # Active assignments
-        active_assignments = db.execute("""
-            SELECT COUNT(*) as active
-            FROM content_assignments 
-            WHERE student_id = :user_id AND status = 'assigned'
-        """, {"user_id": current_user.id}).scalar()
-        
-        # Total achievements
-        total_achievements = db.execute("""
-            SELECT COUNT(*) as total
-            FROM user_achievements 
-            WHERE user_id = :user_id
-        """, {"user_id": current_user.id}).scalar()
-        
-        stats = {
-            "total_study_time_minutes": total_study_time or 0,
-            "completed_courses": completed_courses or 0,
-            "active_assignments": active_assignments or 0,
-            "total_achievements": total_achievements or 0
-        }
-        
+        stats = await AsyncReadService(db).get_student_dashboard_stats(current_user.id)
         return {"success": True, "data": stats}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
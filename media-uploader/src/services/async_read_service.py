@@ -0,0 +1,215 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, desc, text
+from datetime import datetime, timedelta
+import logging
+
+from models import Knowledge, User
+from src.models.v2_models import KnowledgeResponse
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncReadService:
+    """
+    Non-blocking queries for the v2 API's hottest read paths.
+
+    Routes declared ``async def`` must not run sync queries on the event loop;
+    these methods run on the asyncpg-backed session from ``get_async_db``.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _optional_query(self, description: str, statement, params: Dict[str, Any]):
+        """
+        Run a query whose tables may not exist in every deployment.
+
+        Each query runs in a savepoint so a failure does not abort the
+        transaction for the queries after it. Returns None on failure.
+        """
+        try:
+            async with self.db.begin_nested():
+                return (await self.db.execute(statement, params)).fetchall()
+        except Exception as e:
+            logger.warning(f"Could not fetch {description}: {e}")
+            return None
+
+    async def is_teacher(self, user_id: int) -> bool:
+        """Check whether a user has the teacher role."""
+        roles = (await self.db.execute(select(User.roles).where(User.id == user_id))).scalar_one_or_none()
+        return "teacher" in (roles or [])
+
+    async def get_dashboard_stats(self, user_id: int) -> Dict[str, Any]:
+        """Get comprehensive dashboard statistics for a user."""
+        stats = {
+            "total_courses": 0,
+            "completed_lessons": 0,
+            "study_time_this_week": 0,
+            "achievements_earned": 0,
+            "total_time_spent": 0,
+            "completion_rate": 0,
+            "average_score": 0,
+            "streak_days": 0,
+            "total_activities": 0,
+            "current_level": 1
+        }
+        week_ago = datetime.now() - timedelta(days=7)
+
+        progress_rows = await self._optional_query("progress data", text("""
+            SELECT
+                COUNT(DISTINCT knowledge_id) as total_courses,
+                AVG(progress_percentage) as avg_progress,
+                SUM(CASE WHEN progress_percentage >= 100 THEN 1 ELSE 0 END) as completed_courses
+            FROM user_progress
+            WHERE user_id = :user_id
+        """), {"user_id": user_id})
+        if progress_rows:
+            total_courses, avg_progress, completed_courses = progress_rows[0]
+            stats["total_courses"] = total_courses or 0
+            stats["completion_rate"] = round(float(avg_progress or 0), 1)
+            stats["completed_lessons"] = completed_courses or 0
+
+        # Weekly time, session count and active days in one pass over session_info
+        session_rows = await self._optional_query("session data", text("""
+            SELECT
+                COALESCE(SUM(total_time_seconds), 0) / 60 as study_time_minutes,
+                COUNT(*) as session_count,
+                COUNT(DISTINCT DATE(session_start)) as active_days
+            FROM session_info
+            WHERE user_id = :user_id AND session_start >= :week_ago
+        """), {"user_id": user_id, "week_ago": week_ago})
+        if session_rows:
+            study_time_minutes, session_count, active_days = session_rows[0]
+            stats["study_time_this_week"] = int(study_time_minutes or 0)
+            stats["total_activities"] = session_count or 0
+            stats["streak_days"] = active_days or 0
+
+        events_rows = await self._optional_query("analytics events", text("""
+            SELECT
+                event_type,
+                COUNT(*) as count,
+                AVG(CAST(event_data->>'score' AS INTEGER)) as avg_score
+            FROM analytics_events
+            WHERE user_id = :user_id
+                AND event_data->>'score' IS NOT NULL
+                AND event_data->>'score' != 'null'
+            GROUP BY event_type
+        """), {"user_id": user_id})
+        if events_rows:
+            total_score_events = 0
+            total_score_sum = 0
+            for event_type, count, avg_score in events_rows:
+                total_score_events += count
+                if avg_score:
+                    total_score_sum += float(avg_score) * count
+
+                # Count achievements
+                if event_type in ['achievement_earned', 'badge_earned', 'milestone_reached']:
+                    stats["achievements_earned"] += count
+
+            if total_score_events > 0:
+                stats["average_score"] = round(total_score_sum / total_score_events, 1)
+
+        # Calculate level based on total time and activities
+        total_minutes = stats["study_time_this_week"] + (stats["total_activities"] * 10)
+        stats["current_level"] = max(1, min(10, (total_minutes // 60) + 1))
+
+        return stats
+
+    async def get_recent_events(self, user_id: int, limit: int = 10) -> List[Tuple[str, Any, datetime]]:
+        """Get the most recent analytics events as (event_type, event_data, created_at)."""
+        rows = await self._optional_query("recent events", text("""
+            SELECT
+                event_type,
+                event_data,
+                created_at
+            FROM analytics_events
+            WHERE user_id = :user_id
+            ORDER BY created_at DESC
+            LIMIT :limit
+        """), {"user_id": user_id, "limit": limit})
+        return [tuple(row) for row in rows or []]
+
+    async def get_recent_sessions(self, user_id: int, limit: int = 10) -> List[Tuple[datetime, datetime, int, int]]:
+        """Get the most recent sessions as (session_start, session_end, total_time_seconds, pages_visited)."""
+        rows = await self._optional_query("session data", text("""
+            SELECT
+                session_start,
+                session_end,
+                total_time_seconds,
+                pages_visited
+            FROM session_info
+            WHERE user_id = :user_id
+            ORDER BY session_start DESC
+            LIMIT :limit
+        """), {"user_id": user_id, "limit": limit})
+        return [tuple(row) for row in rows or []]
+
+    async def get_student_progress(self, user_id: int) -> List[Dict[str, Any]]:
+        """Get a student's progress per knowledge entry, most recently updated first."""
+        result = await self.db.execute(text("""
+            SELECT
+                sp.knowledge_id,
+                k.name as knowledge_name,
+                sp.progress_percentage,
+                sp.study_time_minutes,
+                sp.completed_at,
+                sp.updated_at
+            FROM student_progress sp
+            JOIN knowledge k ON sp.knowledge_id = k.id
+            WHERE sp.user_id = :user_id
+            ORDER BY sp.updated_at DESC
+        """), {"user_id": user_id})
+        return [dict(row) for row in result.mappings()]
+
+    async def get_student_dashboard_stats(self, user_id: int) -> Dict[str, Any]:
+        """Get student dashboard statistics in a single round trip."""
+        result = await self.db.execute(text("""
+            SELECT
+                (SELECT COALESCE(SUM(study_time_minutes), 0)
+                    FROM student_progress WHERE user_id = :user_id) as total_study_time_minutes,
+                (SELECT COUNT(*)
+                    FROM student_progress WHERE user_id = :user_id AND progress_percentage >= 100) as completed_courses,
+                (SELECT COUNT(*)
+                    FROM content_assignments WHERE student_id = :user_id AND status = 'assigned') as active_assignments,
+                (SELECT COUNT(*)
+                    FROM user_achievements WHERE user_id = :user_id) as total_achievements
+        """), {"user_id": user_id})
+        row = result.mappings().one()
+        return {key: row[key] or 0 for key in row.keys()}
+
+    async def list_knowledge(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None
+    ) -> Tuple[List[KnowledgeResponse], int]:
+        """List knowledge entries for a user."""
+        conditions = [Knowledge.user_id == user_id]
+        if status:
+            conditions.append(Knowledge.status == status)
+
+        total = (await self.db.execute(
+            select(func.count()).select_from(Knowledge).where(*conditions)
+        )).scalar_one()
+
+        # Only the columns the response needs, so large meta_data blobs are never loaded
+        rows = (await self.db.execute(
+            select(
+                Knowledge.id,
+                Knowledge.name,
+                Knowledge.content_type,
+                Knowledge.status,
+                Knowledge.created_at,
+                Knowledge.user_id
+            )
+            .where(*conditions)
+            .order_by(desc(Knowledge.created_at))
+            .offset(skip)
+            .limit(limit)
+        )).mappings()
+
+        items = [KnowledgeResponse(**row) for row in rows]
+        return items, total
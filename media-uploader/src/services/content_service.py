@@ -5,14 +5,14 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
 from models import Knowledge
-from queue_manager import QueueManager
-from database import DatabaseManager
+from queue_manager import get_queue_manager
+from database import get_database_manager
 
 class ContentService:
     def __init__(self, db: Session):
         self.db = db
-        self.db_manager = DatabaseManager()
-        self.queue_manager = QueueManager(self.db_manager)
+        self.db_manager = get_database_manager()
+        self.queue_manager = get_queue_manager()
         self._generation_tasks = {}  # In-memory task tracking
 
     async def validate_user_access(self, knowledge_id: int, user_id: int) -> None:
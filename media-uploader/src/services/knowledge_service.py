@@ -8,15 +8,15 @@ from datetime import datetime
 from models import Knowledge, User, Media
 from src.models.v2_models import KnowledgeResponse
 from src.services.websocket_manager import websocket_manager
-from queue_manager import QueueManager
-from database import DatabaseManager
+from queue_manager import get_queue_manager
+from database import get_database_manager
 from storage import upload_file_to_storage
 
 class KnowledgeService:
     def __init__(self, db: Session):
         self.db = db
-        self.db_manager = DatabaseManager()
-        self.queue_manager = QueueManager(self.db_manager)
+        self.db_manager = get_database_manager()
+        self.queue_manager = get_queue_manager()
 
     async def upload_files(
         self,
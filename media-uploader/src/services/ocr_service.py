@@ -291,6 +291,11 @@ class OCRService:
         self.deepseek = DeepSeekOCR2() if FeatureFlags.USE_DEEPSEEK_OCR else None
         
         logger.info(f"OCR Service initialized with provider: {self.provider_name}")
+
+    @property
+    def available(self) -> bool:
+        """Whether any OCR provider initialized successfully."""
+        return bool((self.docling and self.docling.enabled) or (self.deepseek and self.deepseek.enabled))
     
     async def process(
         self,
@@ -1,6 +1,8 @@
 import os
 import logging
-from typing import Optional, Dict, Any, BinaryIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, BinaryIO, List, Union
 from datetime import datetime, timedelta
 from minio import Minio
 from minio.error import S3Error
@@ -10,6 +12,11 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Uploads in flight at once across the process, for bulk uploads
+MINIO_UPLOAD_WORKERS = int(os.getenv("MINIO_UPLOAD_WORKERS", "8"))
+# Objects larger than this are uploaded in parts of this size (MinIO requires at least 5 MiB)
+MINIO_PART_SIZE = max(int(os.getenv("MINIO_PART_SIZE", str(16 * 1024 * 1024))), 5 * 1024 * 1024)
+
 class MinIOStorage:
     """MinIO client wrapper for handling file storage operations."""
     
@@ -27,9 +34,16 @@ class MinIOStorage:
             access_key=self.access_key,
             secret_key=self.secret_key,
             secure=self.secure,
-            http_client=urllib3.PoolManager(timeout=urllib3.Timeout(connect=5.0, read=10.0))
+            # One pooled connection per concurrent upload, so bulk uploads reuse connections
+            http_client=urllib3.PoolManager(
+                timeout=urllib3.Timeout(connect=5.0, read=10.0),
+                maxsize=max(10, MINIO_UPLOAD_WORKERS)
+            )
         )
         
+        self._upload_executor: Optional[ThreadPoolExecutor] = None
+        self._upload_executor_lock = threading.Lock()
+        
         # Ensure bucket exists
         self._ensure_bucket_exists()
     
@@ -45,19 +59,21 @@ class MinIOStorage:
     
     def upload_file(
         self, 
-        file_data: bytes, 
+        file_data: Union[bytes, memoryview, BinaryIO], 
         object_name: str, 
         content_type: str = "application/octet-stream",
-        metadata: Optional[Dict[str, str]] = None
+        metadata: Optional[Dict[str, str]] = None,
+        length: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Upload a file to MinIO.
         
         Args:
-            file_data: File content as bytes
+            file_data: File content as bytes or a memoryview, or a readable stream
             object_name: Name of the object in MinIO
             content_type: MIME type of the file
             metadata: Optional metadata dictionary
+            length: Size of a stream in bytes; unknown if omitted
             
         Returns:
             Dictionary with upload result information
@@ -65,8 +81,13 @@ class MinIOStorage:
         try:
             from io import BytesIO
             
-            file_stream = BytesIO(file_data)
-            file_size = len(file_data)
+            if hasattr(file_data, "read"):
+                file_stream = file_data
+                # -1 lets MinIO stream an unknown length in parts
+                file_size = -1 if length is None else length
+            else:
+                file_stream = BytesIO(file_data)
+                file_size = len(file_data) if length is None else length
             
             # Upload file
             result = self.client.put_object(
@@ -75,7 +96,8 @@ class MinIOStorage:
                 data=file_stream,
                 length=file_size,
                 content_type=content_type,
-                metadata=metadata or {}
+                metadata=metadata or {},
+                part_size=MINIO_PART_SIZE
             )
             
             logger.info(f"Successfully uploaded {object_name} to {self.bucket_name}")
@@ -97,6 +119,76 @@ class MinIOStorage:
                 "object_name": object_name
             }
     
+    def _get_upload_executor(self) -> ThreadPoolExecutor:
+        with self._upload_executor_lock:
+            if self._upload_executor is None:
+                self._upload_executor = ThreadPoolExecutor(
+                    max_workers=MINIO_UPLOAD_WORKERS,
+                    thread_name_prefix="minio-upload"
+                )
+            return self._upload_executor
+    
+    def _upload_one(self, upload: Dict[str, Any], skip_existing: bool) -> Dict[str, Any]:
+        try:
+            if skip_existing and self.object_exists(upload["object_name"]):
+                return {
+                    "success": True,
+                    "skipped": True,
+                    "bucket_name": self.bucket_name,
+                    "object_name": upload["object_name"]
+                }
+            result = self.upload_file(**upload)
+            result["skipped"] = False
+            return result
+        except Exception as e:
+            logger.error(f"Error uploading {upload.get('object_name')}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "object_name": upload.get("object_name")
+            }
+    
+    def upload_files(
+        self,
+        uploads: List[Dict[str, Any]],
+        skip_existing: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload several files to MinIO concurrently.
+        
+        Uploads share a process-wide pool of MINIO_UPLOAD_WORKERS threads, so
+        concurrent callers together never exceed that many uploads in flight.
+        Large objects are uploaded in MINIO_PART_SIZE parts.
+        
+        Args:
+            uploads: Keyword arguments for upload_file, one dict per file
+            skip_existing: Leave objects that already exist untouched; for
+                content-addressed names whose content cannot differ
+            
+        Returns:
+            Upload results in the order of uploads; each has success, object_name
+            and skipped, or an error
+        """
+        if not uploads:
+            return []
+        
+        executor = self._get_upload_executor()
+        futures = [executor.submit(self._upload_one, upload, skip_existing) for upload in uploads]
+        results = [future.result() for future in futures]
+        
+        uploaded = sum(1 for result in results if result["success"] and not result["skipped"])
+        failed = sum(1 for result in results if not result["success"])
+        logger.info(f"Bulk upload of {len(uploads)} objects: {uploaded} uploaded, "
+                    f"{len(uploads) - uploaded - failed} already stored, {failed} failed")
+        return results
+    
+    def shutdown(self):
+        """Stop the bulk upload pool, if it was started."""
+        with self._upload_executor_lock:
+            if self._upload_executor is not None:
+                self._upload_executor.shutdown(wait=True)
+                self._upload_executor = None
+    
     def download_file(self, object_name: str) -> Optional[bytes]:
         """
         Download a file from MinIO.
@@ -120,6 +212,26 @@ class MinIOStorage:
             logger.error(f"Error downloading {object_name}: {e}")
             return None
     
+    def download_to_file(self, object_name: str, file_path: str) -> bool:
+        """
+        Stream a file from MinIO straight to a local path without buffering it in memory.
+        
+        Args:
+            object_name: Name of the object in MinIO
+            file_path: Local destination path
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self.client.fget_object(self.bucket_name, object_name, file_path)
+            logger.info(f"Successfully downloaded {object_name} to {file_path}")
+            return True
+            
+        except S3Error as e:
+            logger.error(f"Error downloading {object_name} to {file_path}: {e}")
+            return False
+    
     def delete_file(self, object_name: str) -> bool:
         """
         Delete a file from MinIO.
@@ -139,6 +251,24 @@ class MinIOStorage:
             logger.error(f"Error deleting {object_name}: {e}")
             return False
     
+    def object_exists(self, object_name: str) -> bool:
+        """
+        Check whether an object exists, without logging a missing object as an error.
+        
+        Args:
+            object_name: Name of the object in MinIO
+            
+        Returns:
+            True if the object exists, False if it does not or cannot be checked
+        """
+        try:
+            self.client.stat_object(self.bucket_name, object_name)
+            return True
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchObject"):
+                logger.warning(f"Error checking {object_name}: {e}")
+            return False
+    
     def get_file_info(self, object_name: str) -> Optional[Dict[str, Any]]:
         """
         Get file information from MinIO.
@@ -145,6 +145,57 @@ class StressTestRunner:
             
             return successful / num_requests >= 0.95  # 95% success rate
 
+    async def test_connection_churn(self, num_requests: int = 200, concurrency: int = 50):
+        """Benchmark database connection churn under concurrent load"""
+        self.log(f"🗄️ Benchmarking connection churn over {num_requests} requests ({concurrency} concurrent)")
+
+        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
+            demo_response = await client.post("/api/v2/auth/demo-login")
+            if demo_response.status_code != 200:
+                self.log("   ❌ Failed to get demo token")
+                return False
+
+            # Pool stats are only served to authenticated callers
+            headers = {"Authorization": f"Bearer {demo_response.json()['access_token']}"}
+            stats_response = await client.get("/health/db", headers=headers)
+            if stats_response.status_code != 200:
+                self.log("   ❌ Failed to get pool stats")
+                return False
+            before = stats_response.json()
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies: List[float] = []
+
+            async def single_request(i: int):
+                async with semaphore:
+                    start_time = time.time()
+                    try:
+                        response = await client.get("/api/v2/profile", headers=headers)
+                        latencies.append(time.time() - start_time)
+                        return response.status_code == 200
+                    except Exception:
+                        return False
+
+            start_time = time.time()
+            results = await asyncio.gather(*[single_request(i) for i in range(num_requests)])
+            duration = time.time() - start_time
+            after = (await client.get("/health/db", headers=headers)).json()
+
+        successful = sum(1 for r in results if r)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        created = after["connections_created"] - before["connections_created"]
+        checkouts = after["checkouts"] - before["checkouts"]
+
+        self.log(f"   ✅ Success: {successful}/{num_requests} in {duration:.2f}s ({num_requests / duration:.1f} req/s)")
+        self.log(f"   ⏱️  p95 latency: {p95:.3f}s")
+        self.log(f"   🔌 New connections: {created} for {checkouts} checkouts")
+        self.log(f"   📦 Pool: {after.get('checkedout', '?')} checked out, {after.get('overflow', '?')} overflow")
+
+        # A shared pool never holds more than max_connections; opening more than that means churn
+        invalidated = after["invalidations"] - before["invalidations"]
+        max_connections = after.get("max_connections", concurrency)
+        return successful / num_requests >= 0.95 and created <= max_connections + invalidated
+
     async def test_error_handling_resilience(self):
         """Test system resilience to various error conditions"""
         self.log("🛡️ Testing error handling resilience")
@@ -260,6 +311,7 @@ class StressTestRunner:
         results["concurrent_auth"] = await self.test_concurrent_authentication(10)
         results["concurrent_search"] = await self.test_concurrent_search(20)
         results["rapid_requests"] = await self.test_rapid_requests(50)
+        results["connection_churn"] = await self.test_connection_churn(200, 50)
         results["error_resilience"] = await self.test_error_handling_resilience()
         results["memory_resistance"] = await self.test_memory_leak_resistance()
         
@@ -0,0 +1,163 @@
+"""
+Unit tests for the process-wide content generation limiter.
+
+The API server and the queue's job loop run separate event loops on separate
+threads, so several tests drive the limiter from two loops at once.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from content_orchestrator import GenerationLimiter
+
+
+class Tracker:
+    """Records the most tasks and tokens held at once, across threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.tokens = 0
+        self.max_running = 0
+        self.max_tokens = 0
+
+    async def task(self, limiter, tokens, duration=0.02):
+        held = await limiter.acquire(tokens)
+        with self.lock:
+            self.running += 1
+            self.tokens += held
+            self.max_running = max(self.max_running, self.running)
+            self.max_tokens = max(self.max_tokens, self.tokens)
+        await asyncio.sleep(duration)
+        with self.lock:
+            self.running -= 1
+            self.tokens -= held
+        await limiter.release(held)
+
+
+def run_on_two_loops(make_coro):
+    """Run make_coro() to completion on two event loops in two threads at once."""
+    errors = []
+
+    def worker():
+        try:
+            asyncio.run(make_coro())
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not errors
+
+
+def test_concurrency_is_capped_across_event_loops():
+    limiter = GenerationLimiter(max_concurrency=3, token_budget=0)
+    tracker = Tracker()
+
+    async def burst():
+        await asyncio.gather(*(tracker.task(limiter, 100) for _ in range(10)))
+
+    run_on_two_loops(burst)
+
+    assert tracker.max_running == 3
+    assert limiter.in_flight == 0
+
+
+def test_token_budget_is_shared_across_event_loops():
+    limiter = GenerationLimiter(max_concurrency=100, token_budget=1000)
+    tracker = Tracker()
+
+    async def burst():
+        await asyncio.gather(*(tracker.task(limiter, 300) for _ in range(6)))
+
+    run_on_two_loops(burst)
+
+    assert tracker.max_tokens == 900
+    assert limiter.tokens_in_flight == 0
+
+
+def test_oversized_task_runs_alone():
+    limiter = GenerationLimiter(max_concurrency=4, token_budget=1000)
+    tracker = Tracker()
+
+    async def run():
+        await asyncio.gather(tracker.task(limiter, 200), tracker.task(limiter, 5000), tracker.task(limiter, 200))
+
+    asyncio.run(run())
+
+    assert tracker.max_tokens == 1000
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    limiter = GenerationLimiter(max_concurrency=1, token_budget=0)
+    order = []
+
+    async def task(name):
+        held = await limiter.acquire(0)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        await limiter.release(held)
+
+    async def run():
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.create_task(task(name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_cancelled_waiter_does_not_hold_capacity():
+    limiter = GenerationLimiter(max_concurrency=1, token_budget=0)
+
+    async def run():
+        held = await limiter.acquire(0)
+        waiter = asyncio.create_task(limiter.acquire(0))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await limiter.release(held)
+        # The cancelled waiter was not granted the freed slot
+        await asyncio.wait_for(limiter.acquire(0), timeout=1)
+
+    asyncio.run(run())
+
+    assert limiter.in_flight == 1
+
+
+def test_waiter_on_another_loop_is_woken_by_release():
+    limiter = GenerationLimiter(max_concurrency=1, token_budget=0)
+    acquired = threading.Event()
+    released = []
+
+    async def holder():
+        held = await limiter.acquire(0)
+        acquired.set()
+        await asyncio.sleep(0.1)
+        released.append(time.monotonic())
+        await limiter.release(held)
+
+    async def waiter():
+        acquired.wait(5)
+        held = await asyncio.wait_for(limiter.acquire(0), timeout=5)
+        woken = time.monotonic()
+        await limiter.release(held)
+        return woken
+
+    thread = threading.Thread(target=lambda: asyncio.run(holder()))
+    thread.start()
+    woken = asyncio.run(waiter())
+    thread.join(5)
+
+    assert woken >= released[0]
+    assert limiter.in_flight == 0
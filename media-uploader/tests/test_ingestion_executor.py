@@ -0,0 +1,123 @@
+"""
+Unit tests for the ingestion process pool.
+
+extract_media_file is swapped for the tasks below, which spawned workers
+import from this module; they block, crash or echo instead of downloading
+and extracting real files.
+"""
+
+import os
+import signal
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ingestion_executor
+from ingestion_executor import IngestionExecutor
+
+
+def fake_extract(media_id, original_filename, file_path, knowledge_id, knowledge_name, timeout=None):
+    """Echo for ordinary files; block ignoring the alarm, or crash the worker, for the others."""
+    if original_filename.startswith("stuck"):
+        # Like a worker stuck in C code: the in-worker alarm never fires
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        with open(file_path, "w") as pid_file:
+            pid_file.write(str(os.getpid()))
+        time.sleep(120)
+    if original_filename.startswith("crash"):
+        os._exit(1)
+    return {
+        "file_type": "text",
+        "markdown": original_filename,
+        "pid": os.getpid(),
+        "page_workers": os.environ.get("PDF_PAGE_WORKERS"),
+    }
+
+
+def media(media_id, name, path=""):
+    return SimpleNamespace(id=media_id, original_filename=name, file_path=path)
+
+
+def is_running(pid):
+    """Whether a process exists and is not a zombie awaiting its parent."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setattr(ingestion_executor, "extract_media_file", fake_extract)
+    executor = IngestionExecutor(max_workers=1, file_timeout=1)
+    executor.timeout_grace = 0
+    yield executor
+    executor.shutdown()
+
+
+def test_results_keep_the_order_of_the_files(executor):
+    files = [media(i, f"file{i}.txt") for i in range(3)]
+    completed = []
+
+    results = executor.process_files(files, 1, "k", on_complete=lambda f, r: completed.append(f.id))
+
+    assert [result["markdown"] for result in results] == ["file0.txt", "file1.txt", "file2.txt"]
+    assert sorted(completed) == [0, 1, 2]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc to check the worker was killed")
+def test_stuck_worker_is_killed_and_queued_files_still_run(executor, tmp_path):
+    pid_file = tmp_path / "stuck.pid"
+    files = [media(1, "stuck.pdf", str(pid_file)), media(2, "after.txt")]
+
+    start = time.monotonic()
+    results = executor.process_files(files, 1, "k")
+
+    assert time.monotonic() - start < 60
+    assert "timed out" in results[0]["error"]
+    # The only slot was held by the stuck worker; the other file ran on a fresh pool
+    assert results[1]["markdown"] == "after.txt"
+    stuck_pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 10
+    while is_running(stuck_pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not is_running(stuck_pid)
+
+    # The pool has its capacity back for later entries
+    assert executor.process_files([media(3, "later.txt")], 2, "k")[0]["markdown"] == "later.txt"
+
+
+def test_files_running_beside_a_stuck_one_are_resubmitted(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion_executor, "extract_media_file", fake_extract)
+    executor = IngestionExecutor(max_workers=2, file_timeout=1)
+    executor.timeout_grace = 0
+    try:
+        files = [media(1, "stuck.pdf", str(tmp_path / "stuck.pid"))] + [media(i, f"file{i}.txt") for i in range(2, 6)]
+
+        results = executor.process_files(files, 1, "k")
+
+        assert "timed out" in results[0]["error"]
+        assert [result["markdown"] for result in results[1:]] == [f"file{i}.txt" for i in range(2, 6)]
+    finally:
+        executor.shutdown()
+
+
+def test_crashed_worker_fails_its_file_and_the_pool_recovers(executor):
+    results = executor.process_files([media(1, "crash.pdf")], 1, "k")
+
+    assert "error" in results[0]
+    assert executor.process_files([media(2, "after.txt")], 1, "k")[0]["markdown"] == "after.txt"
+
+
+def test_timeout_is_longer_for_videos():
+    executor = IngestionExecutor(file_timeout=10, video_timeout=100)
+
+    assert executor.timeout_for("lecture.MP4") == 100
+    assert executor.timeout_for("notes.pdf") == 10
+
+
+def test_workers_extract_pdf_pages_in_process(executor):
+    # A page pool per ingestion worker would multiply the processes the pool is meant to cap
+    assert executor.process_files([media(1, "paper.pdf")], 1, "k")[0]["page_workers"] == "0"
@@ -0,0 +1,95 @@
+"""
+Unit tests for incremental knowledge graph synchronization.
+
+The database manager and graph writer are replaced with in-memory fakes, so
+these tests need neither PostgreSQL nor Neo4j.
+"""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import knowledge_graph_sync
+from knowledge_graph_sync import KnowledgeGraphSynchronizer
+
+UPDATED = datetime(2026, 10, 1, 12, 0, 0)
+CHANGED = datetime(2026, 10, 2, 9, 30, 0)
+
+
+class FakeDatabaseManager:
+    def __init__(self, versions):
+        self.versions = versions
+
+    def get_knowledge_versions(self):
+        return dict(self.versions)
+
+    def get_knowledge(self, knowledge_id):
+        return SimpleNamespace(id=knowledge_id, updated_at=self.versions[knowledge_id])
+
+
+class FakeWriter:
+    checkpoints = {}
+
+    def __init__(self, service):
+        pass
+
+    def get_sync_checkpoints(self):
+        return dict(FakeWriter.checkpoints)
+
+    def set_sync_checkpoint(self, knowledge_id, source_updated_at):
+        FakeWriter.checkpoints[knowledge_id] = source_updated_at
+
+
+@pytest.fixture
+def synchronizer(monkeypatch):
+    monkeypatch.setattr(knowledge_graph_sync, "KnowledgeGraphWriter", FakeWriter)
+    monkeypatch.setattr(knowledge_graph_sync.graph_service, "create_schema_constraints", lambda: None)
+    FakeWriter.checkpoints = {}
+
+    def make(versions):
+        sync = KnowledgeGraphSynchronizer(db_manager=FakeDatabaseManager(versions))
+        synced = []
+
+        async def sync_knowledge(knowledge_id):
+            synced.append(knowledge_id)
+            return {"success": True, "knowledge_id": knowledge_id}
+
+        sync.sync_knowledge = sync_knowledge
+        return sync, synced
+
+    return make
+
+
+def test_incremental_sync_skips_unchanged_entries(synchronizer):
+    sync, synced = synchronizer({1: UPDATED, 2: CHANGED, 3: UPDATED})
+    FakeWriter.checkpoints = {1: UPDATED.isoformat(), 2: UPDATED.isoformat()}
+
+    result = asyncio.run(sync.sync_all_knowledge(incremental=True))
+
+    assert sorted(synced) == [2, 3]
+    assert result["skipped"] == 1
+    assert result["synced"] == 2
+
+
+def test_full_sync_ignores_checkpoints(synchronizer):
+    sync, synced = synchronizer({1: UPDATED, 2: UPDATED})
+    FakeWriter.checkpoints = {1: UPDATED.isoformat(), 2: UPDATED.isoformat()}
+
+    result = asyncio.run(sync.sync_all_knowledge(incremental=False))
+
+    assert sorted(synced) == [1, 2]
+    assert result["skipped"] == 0
+
+
+def test_sync_knowledge_without_updated_at_fails_without_checkpoint(monkeypatch):
+    monkeypatch.setattr(knowledge_graph_sync, "KnowledgeGraphWriter", FakeWriter)
+    FakeWriter.checkpoints = {}
+    sync = KnowledgeGraphSynchronizer(db_manager=FakeDatabaseManager({7: None}))
+
+    result = asyncio.run(sync.sync_knowledge(7))
+
+    assert result["success"] is False
+    assert "updated_at" in result["error"]
+    assert FakeWriter.checkpoints == {}
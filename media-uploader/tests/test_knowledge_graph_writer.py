@@ -0,0 +1,143 @@
+"""
+Unit tests for the bulk knowledge graph writer and schema setup.
+
+The Neo4j driver is replaced with a fake that records each statement and
+answers the read queries from canned results, so Neo4j is not needed.
+"""
+
+import pytest
+
+from knowledge_graph import KnowledgeGraphWriter, Neo4jGraphService
+
+
+class FakeResult:
+    def __init__(self, records=None):
+        self.records = records or []
+
+    def single(self):
+        return {"id": "knowledge-node"}
+
+    def value(self):
+        return [record["ids"] for record in self.records]
+
+    def data(self):
+        return self.records
+
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, cypher, params=None):
+        self.driver.statements.append((cypher, params or {}))
+        for fragment, error in self.driver.errors.items():
+            if fragment in cypher:
+                raise error
+        for fragment, records in self.driver.results.items():
+            if fragment in cypher:
+                return FakeResult(records)
+        return FakeResult()
+
+    def execute_write(self, work):
+        return work(self)
+
+
+class FakeDriver:
+    def __init__(self, results=None, errors=None):
+        self.results = results or {}
+        self.errors = errors or {}
+        self.statements = []
+
+    def session(self):
+        return FakeSession(self)
+
+    def rows(self, fragment):
+        return [row for cypher, params in self.statements if fragment in cypher for row in params.get("rows", [])]
+
+
+def make_service(driver):
+    service = Neo4jGraphService.__new__(Neo4jGraphService)
+    service.driver = driver
+    service.connected = True
+    return service
+
+
+def chapter(chapter_id, *concepts):
+    return {"chapter_id": chapter_id, "properties": {"title": str(chapter_id)}, "concepts": list(concepts)}
+
+
+def test_chapters_without_an_id_are_skipped_and_reported():
+    driver = FakeDriver()
+    writer = KnowledgeGraphWriter(make_service(driver))
+
+    result = writer.write(7, {}, [chapter("a", "Graphs"), chapter(None, "Trees"), chapter("b", "Graphs")])
+
+    assert result["chapters"] == 2
+    assert result["skipped_chapters"] == 1
+    assert [row["chapter_id"] for row in driver.rows("MERGE (c:Chapter")] == ["a", "b"]
+    # Concepts of a skipped chapter are not written either
+    assert driver.rows("MERGE (c:Concept") == ["Graphs"]
+
+
+def test_skipped_chapters_are_reported_when_neo4j_is_down():
+    service = make_service(FakeDriver())
+    service.connected = False
+
+    assert KnowledgeGraphWriter(service).write(7, {}, [chapter(None)])["skipped_chapters"] == 1
+
+
+def test_rows_are_written_in_batches():
+    driver = FakeDriver()
+    writer = KnowledgeGraphWriter(make_service(driver), batch_size=2)
+
+    result = writer.write(7, {}, [chapter(i) for i in range(5)])
+
+    assert len([cypher for cypher, _ in driver.statements if "MERGE (c:Chapter" in cypher]) == 3
+    assert result["transactions"] == 1 + 3
+
+
+def test_duplicate_concepts_are_merged_into_the_oldest():
+    driver = FakeDriver(results={
+        "collect(elementId(c))": [{"ids": ["graphs-1", "graphs-2", "graphs-3"]}, {"ids": ["trees-1", "trees-2"]}],
+        "MATCH (dup)-[r]-(other)": [
+            {"start": "k", "end": "graphs-2", "type": "TEACHES_CONCEPT", "properties": {"id": "r1"}},
+            {"start": "ch", "end": "graphs-3", "type": "CONTAINS_CONCEPT", "properties": {"id": "r2"}},
+            # Both ends are duplicates; the edge moves to both kept nodes
+            {"start": "graphs-2", "end": "trees-2", "type": "RELATED_TO", "properties": {"weight": 3}},
+            # Between two duplicates of the same concept; dropped
+            {"start": "graphs-2", "end": "graphs-3", "type": "RELATED_TO", "properties": {}},
+        ],
+    })
+    service = make_service(driver)
+
+    assert service.merge_duplicate_concepts() == 3
+
+    assert driver.rows("TEACHES_CONCEPT`") == [{"start": "k", "end": "graphs-1", "properties": {"id": "r1"}}]
+    assert driver.rows("CONTAINS_CONCEPT`") == [{"start": "ch", "end": "graphs-1", "properties": {"id": "r2"}}]
+    assert driver.rows("RELATED_TO`") == [{"start": "graphs-1", "end": "trees-1", "properties": {"weight": 3}}]
+    cypher, params = driver.statements[-1]
+    assert "DETACH DELETE" in cypher
+    assert sorted(params["dups"]) == ["graphs-2", "graphs-3", "trees-2"]
+
+
+def test_no_duplicates_writes_nothing():
+    driver = FakeDriver()
+
+    assert make_service(driver).merge_duplicate_concepts() == 0
+    assert not any("DETACH DELETE" in cypher for cypher, _ in driver.statements)
+
+
+def test_schema_setup_fails_loudly_without_the_concept_name_constraint():
+    driver = FakeDriver(errors={"REQUIRE n.name IS UNIQUE": RuntimeError("constraint violated")})
+
+    with pytest.raises(RuntimeError):
+        make_service(driver).create_schema_constraints()
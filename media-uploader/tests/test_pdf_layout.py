@@ -0,0 +1,122 @@
+"""
+Unit tests for native PDF layout extraction.
+
+Documents are generated with PyMuPDF: text pages carry a text layer, scanned
+pages are a full-page image without one.
+"""
+
+import fitz
+import pytest
+
+import pdf_layout
+from pdf_layout import NativeTextExtractor, PageContent, TextBlock, ImageBlock
+
+
+def make_pdf(page_texts):
+    """A PDF with one page per entry: its text, or None for a scanned page."""
+    document = fitz.open()
+    for text in page_texts:
+        page = document.new_page()
+        if text is None:
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), 0)
+            pixmap.clear_with(200)
+            page.insert_image(page.rect, pixmap=pixmap)
+        else:
+            page.insert_text((72, 72), text, fontsize=18, fontname="helv")
+            page.insert_text((72, 120), f"Body of {text}", fontsize=11, fontname="tiro")
+    return document.tobytes()
+
+
+def text_block(text):
+    return TextBlock(text, 11.0, "Times", False, False, (0, 0, 0), (0, 0, 100, 20), 0, "paragraph", 0)
+
+
+def image_block(bbox):
+    return ImageBlock("img", 0, bbox)
+
+
+def page_summary(pages):
+    return [
+        (page.page_num,
+         [(block.page_num, block.text, block.font_size, block.font_name, block.bbox) for block in page.text_blocks],
+         [(block.page_num, block.bbox) for block in page.image_blocks])
+        for page in pages
+    ]
+
+
+@pytest.fixture
+def page_pool(monkeypatch):
+    monkeypatch.setenv("PDF_PAGE_WORKERS", "2")
+    monkeypatch.setattr(pdf_layout, "PDF_PARALLEL_MIN_PAGES", 4)
+    monkeypatch.setattr(pdf_layout, "PDF_PAGES_PER_TASK", 3)
+    yield
+    pdf_layout.shutdown_page_pool()
+
+
+def test_text_page_is_not_scanned():
+    page = PageContent(0, [text_block("A page with a real text layer")], [image_block((0, 0, 100, 100))], 10000.0)
+    assert not page.is_scanned
+
+
+def test_image_page_without_text_is_scanned():
+    page = PageContent(0, [], [image_block((0, 0, 100, 80))], 10000.0)
+    assert page.image_coverage == pytest.approx(0.8)
+    assert page.is_scanned
+
+
+def test_page_with_a_small_image_and_no_text_is_not_scanned():
+    page = PageContent(0, [text_block("p. 3")], [image_block((0, 0, 10, 10))], 10000.0)
+    assert not page.is_scanned
+
+
+def test_blank_page_is_not_scanned():
+    assert not PageContent(0, [], [], 10000.0).is_scanned
+
+
+def test_pages_keep_their_text_style_and_images():
+    pages = NativeTextExtractor.extract(make_pdf(["Chapter 1 Introduction", None]))
+
+    heading, body = pages[0].text_blocks
+    assert (heading.text, body.text) == ("Chapter 1 Introduction", "Body of Chapter 1 Introduction")
+    assert heading.font_size > body.font_size
+    assert pages[0].image_blocks == []
+    [image] = pages[1].image_blocks
+    assert pages[1].text_blocks == []
+    assert (image.page_num, image.bbox) == (1, (0.0, 0.0, 595.0, 842.0))
+    assert [page.is_scanned for page in pages] == [False, True]
+
+
+def test_parallel_extraction_matches_in_process(page_pool):
+    texts = [None if index % 5 == 4 else f"Section {index}" for index in range(11)]
+    file_data = make_pdf(texts)
+
+    parallel = NativeTextExtractor.extract(file_data)
+    assert pdf_layout._page_pool is not None
+
+    with fitz.open(stream=file_data, filetype="pdf") as document:
+        in_process = NativeTextExtractor.extract_pages(document, 0, len(document))
+
+    assert [page.page_num for page in parallel] == list(range(11))
+    assert page_summary(parallel) == page_summary(in_process)
+    assert [page.is_scanned for page in parallel] == [text is None for text in texts]
+
+
+def test_small_documents_are_extracted_in_process(page_pool):
+    pages = NativeTextExtractor.extract(make_pdf(["One", "Two"]))
+
+    assert [page.text_blocks[0].text for page in pages] == ["One", "Two"]
+    assert pdf_layout._page_pool is None
+
+
+def test_extraction_falls_back_in_process_when_the_pool_breaks(page_pool, monkeypatch):
+    class BrokenPool:
+        def submit(self, *args):
+            raise RuntimeError("pool is broken")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    monkeypatch.setattr(pdf_layout, "get_page_pool", lambda: BrokenPool())
+    pages = NativeTextExtractor.extract(make_pdf([f"Page {index}" for index in range(5)]))
+
+    assert [page.text_blocks[0].text for page in pages] == [f"Page {index}" for index in range(5)]
@@ -0,0 +1,107 @@
+"""
+Unit tests for OCR of scanned PDF pages.
+
+The OCR service is replaced by a fake whose pages finish in reverse order,
+so results have to be merged back by page number rather than completion.
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+import fitz
+import pytest
+
+import pdf_processor
+from pdf_layout import NativeTextExtractor, TextBlock
+from tests.test_pdf_layout import make_pdf
+
+TEXTS = ["Native page zero", None, "Native page two", None, None]
+SCANNED = [1, 3, 4]
+
+
+@pytest.fixture
+def ocr_engine(monkeypatch):
+    """Fake OCR service; pages finish in reverse order and calls are recorded."""
+    calls = []
+
+    def ocr_page(page_path, page_num):
+        calls.append(page_num)
+        with fitz.open(page_path) as page_document:
+            assert len(page_document) == 1
+        time.sleep(0.05 * (len(TEXTS) - page_num))
+        return pdf_processor.markdown_to_blocks(f"# Scanned {page_num}\n\nOCR text of page {page_num}", page_num)
+
+    monkeypatch.setitem(sys.modules, "src.services.ocr_service",
+                        SimpleNamespace(ocr_service=SimpleNamespace(available=True)))
+    monkeypatch.setattr(pdf_processor, "_ocr_page", ocr_page)
+    monkeypatch.setattr(pdf_processor, "PDF_OCR_WORKERS", len(SCANNED))
+    return calls
+
+
+def extract(file_data):
+    with fitz.open(stream=file_data, filetype="pdf") as document:
+        pages = NativeTextExtractor.extract(file_data, document)
+        pdf_processor.ocr_scanned_pages(document, pages)
+    return pages
+
+
+def test_only_scanned_pages_are_ocred(ocr_engine):
+    extract(make_pdf(TEXTS))
+    assert sorted(ocr_engine) == SCANNED
+
+
+def test_ocr_results_are_merged_back_by_page(ocr_engine):
+    pages = extract(make_pdf(TEXTS))
+
+    for page in pages:
+        assert all(block.page_num == page.page_num for block in page.text_blocks)
+    assert pages[0].text_blocks[0].text == "Native page zero"
+    assert [block.text for block in pages[3].text_blocks] == ["Scanned 3", "OCR text of page 3"]
+
+
+def test_document_blocks_stay_in_page_order(ocr_engine):
+    text_blocks, image_blocks = pdf_processor.extract_document_blocks(make_pdf(TEXTS))
+
+    assert [block.page_num for block in text_blocks] == sorted(block.page_num for block in text_blocks)
+    assert [block.text for block in text_blocks if block.text.startswith("Scanned")] == [
+        "Scanned 1", "Scanned 3", "Scanned 4"
+    ]
+    assert [block.page_num for block in image_blocks] == SCANNED
+
+
+def test_failed_page_keeps_its_native_blocks(ocr_engine, monkeypatch):
+    def ocr_page(page_path, page_num):
+        if page_num == 3:
+            raise RuntimeError("OCR engine crashed")
+        return [TextBlock(f"OCR {page_num}", 11.0, "", False, False, (0, 0, 0), (0, 0, 0, 0), page_num, "paragraph", 0)]
+
+    monkeypatch.setattr(pdf_processor, "_ocr_page", ocr_page)
+    pages = extract(make_pdf(TEXTS))
+
+    assert [block.text for block in pages[1].text_blocks] == ["OCR 1"]
+    assert pages[3].text_blocks == []
+    assert [block.text for block in pages[4].text_blocks] == ["OCR 4"]
+
+
+def test_model_extractor_handles_scanned_pages_without_ocr(monkeypatch):
+    class FakeModelExtractor:
+        def extract_text_blocks(self, pdf_document, page_nums):
+            self.page_nums = page_nums
+            # Blocks arrive grouped oddly; they are regrouped per page
+            return [
+                TextBlock(f"Model {page_num}", 11.0, "", False, False, (0, 0, 0), (0, 0, 0, 0), page_num, "paragraph", 0)
+                for page_num in reversed(page_nums)
+            ]
+
+    extractor = FakeModelExtractor()
+    monkeypatch.setitem(sys.modules, "src.services.ocr_service",
+                        SimpleNamespace(ocr_service=SimpleNamespace(available=False)))
+    monkeypatch.setattr(pdf_processor, "get_model_extractor", lambda: extractor)
+
+    pages = extract(make_pdf(TEXTS))
+
+    assert extractor.page_nums == SCANNED
+    assert [[block.text for block in pages[page_num].text_blocks] for page_num in SCANNED] == [
+        ["Model 1"], ["Model 3"], ["Model 4"]
+    ]
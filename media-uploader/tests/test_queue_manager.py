@@ -0,0 +1,230 @@
+"""
+Unit tests for the job queue workers.
+
+FakeJobStore keeps processing_jobs rows in memory and mirrors the lease
+transitions of DatabaseManager, so QueueManager runs against it without
+Postgres. Job handlers are replaced with plain callables.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from queue_manager import QueueManager, JOB_TYPE_INGEST, JOB_TYPE_CONTENT_GENERATION
+
+
+class FakeJobStore:
+    """In-memory stand-in for the job and knowledge methods of DatabaseManager."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.extensions = []
+        self.lose_lease = False
+        self.knowledge_status = {}
+        self.retry_info = {}
+        self.retry_history = []
+        self.lock = threading.Lock()
+
+    def enqueue_job(self, job_type, knowledge_id, payload=None, max_retries=3, delay=0):
+        with self.lock:
+            job_id = len(self.jobs) + 1
+            self.jobs[job_id] = {
+                "id": job_id,
+                "job_type": job_type,
+                "knowledge_id": knowledge_id,
+                "payload": payload or {},
+                "status": "queued",
+                "attempts": 0,
+                "max_retries": max_retries,
+                "run_at": datetime.utcnow() + timedelta(seconds=delay),
+                "leased_until": None,
+                "worker_id": None,
+                "last_error": None,
+            }
+            return job_id
+
+    def lease_job(self, job_type, worker_id, visibility_timeout):
+        now = datetime.utcnow()
+        with self.lock:
+            for job in self.jobs.values():
+                runnable = (
+                    (job["status"] == "queued" and job["run_at"] <= now)
+                    or (job["status"] == "leased" and job["leased_until"] < now)
+                )
+                if job["job_type"] == job_type and runnable:
+                    job.update(
+                        status="leased",
+                        worker_id=worker_id,
+                        leased_until=now + timedelta(seconds=visibility_timeout),
+                        attempts=job["attempts"] + 1,
+                    )
+                    return dict(job)
+        return None
+
+    def extend_job_lease(self, job_id, worker_id, visibility_timeout):
+        with self.lock:
+            self.extensions.append(job_id)
+            job = self.jobs[job_id]
+            if self.lose_lease or job["status"] != "leased" or job["worker_id"] != worker_id:
+                return False
+            job["leased_until"] = datetime.utcnow() + timedelta(seconds=visibility_timeout)
+            return True
+
+    def _finish_job(self, job_id, worker_id, values):
+        with self.lock:
+            job = self.jobs[job_id]
+            if job["worker_id"] != worker_id:
+                return False
+            job.update(values)
+            return True
+
+    def complete_job(self, job_id, worker_id):
+        return self._finish_job(job_id, worker_id, {"status": "completed", "leased_until": None})
+
+    def retry_job(self, job_id, worker_id, delay, error=None):
+        return self._finish_job(job_id, worker_id, {
+            "status": "queued",
+            "run_at": datetime.utcnow() + timedelta(seconds=delay),
+            "leased_until": None,
+            "worker_id": None,
+            "last_error": error,
+        })
+
+    def fail_job(self, job_id, worker_id, error=None):
+        return self._finish_job(job_id, worker_id, {"status": "failed", "leased_until": None, "last_error": error})
+
+    def get_latest_job(self, knowledge_id, job_type=None):
+        matching = [job for job in self.jobs.values() if job["knowledge_id"] == knowledge_id]
+        return dict(matching[-1]) if matching else None
+
+    def update_knowledge_status(self, knowledge_id, status, metadata=None):
+        self.knowledge_status[knowledge_id] = status
+
+    def update_retry_info(self, knowledge_id, retry_count):
+        self.retry_info[knowledge_id] = retry_count
+
+    def add_retry_history(self, knowledge_id, status, message):
+        self.retry_history.append((knowledge_id, status))
+
+
+@pytest.fixture
+def store():
+    return FakeJobStore()
+
+
+@pytest.fixture
+def queue(store):
+    queue = QueueManager(store, worker_counts={JOB_TYPE_INGEST: 1})
+    queue.visibility_timeout = 3
+    queue.poll_interval = 0.05
+    yield queue
+    queue.stop()
+
+
+def lease(store, job_type=JOB_TYPE_INGEST):
+    return store.lease_job(job_type, "worker-1", 3)
+
+
+def test_successful_job_is_completed(store, queue):
+    ran = []
+    queue.job_handlers[JOB_TYPE_INGEST] = ran.append
+    job_id = store.enqueue_job(JOB_TYPE_INGEST, 7)
+
+    queue._run_leased_job(lease(store), "worker-1")
+
+    assert [job["id"] for job in ran] == [job_id]
+    assert store.jobs[job_id]["status"] == "completed"
+    assert store.jobs[job_id]["leased_until"] is None
+
+
+def test_failed_job_is_requeued_with_backoff(store, queue):
+    def fail(job):
+        raise RuntimeError("extraction failed")
+
+    queue.job_handlers[JOB_TYPE_INGEST] = fail
+    job_id = store.enqueue_job(JOB_TYPE_INGEST, 7)
+
+    before = datetime.utcnow()
+    queue._run_leased_job(lease(store), "worker-1")
+
+    job = store.jobs[job_id]
+    assert job["status"] == "queued"
+    assert job["worker_id"] is None
+    assert job["last_error"] == "extraction failed"
+    assert job["run_at"] >= before + timedelta(seconds=queue.retry_delays[0])
+    assert store.retry_info == {7: 1}
+    assert store.retry_history == [(7, "retry_scheduled")]
+    # Not runnable again until the backoff has passed
+    assert lease(store) is None
+
+
+def test_job_fails_permanently_once_retries_run_out(store, queue):
+    def fail(job):
+        raise RuntimeError("still broken")
+
+    queue.job_handlers[JOB_TYPE_INGEST] = fail
+    job_id = store.enqueue_job(JOB_TYPE_INGEST, 7, max_retries=1)
+
+    queue._run_leased_job(lease(store), "worker-1")
+    store.jobs[job_id]["run_at"] = datetime.utcnow()
+    queue._run_leased_job(lease(store), "worker-1")
+
+    job = store.jobs[job_id]
+    assert job["attempts"] == 2
+    assert job["status"] == "failed"
+    assert job["last_error"] == "still broken"
+    assert store.knowledge_status == {7: "failed"}
+    assert store.retry_history == [(7, "retry_scheduled"), (7, "failed")]
+
+
+def test_job_whose_lease_expired_too_often_is_failed_without_running(store, queue):
+    ran = []
+    queue.job_handlers[JOB_TYPE_CONTENT_GENERATION] = ran.append
+    job_id = store.enqueue_job(JOB_TYPE_CONTENT_GENERATION, 7, max_retries=1)
+    # Two earlier workers leased the job and died without reporting back
+    store.jobs[job_id].update(status="leased", attempts=2, leased_until=datetime.utcnow() - timedelta(seconds=1))
+
+    queue._run_leased_job(lease(store, JOB_TYPE_CONTENT_GENERATION), "worker-1")
+
+    assert ran == []
+    assert store.jobs[job_id]["status"] == "failed"
+    assert store.jobs[job_id]["last_error"] == "Job lease expired too many times"
+    # Knowledge bookkeeping is only kept for ingestion jobs
+    assert store.knowledge_status == {}
+
+
+def test_heartbeat_extends_the_lease_while_the_job_runs(store, queue):
+    queue.job_handlers[JOB_TYPE_INGEST] = lambda job: time.sleep(1.5)
+    job_id = store.enqueue_job(JOB_TYPE_INGEST, 7)
+
+    queue._run_leased_job(lease(store), "worker-1")
+
+    # visibility_timeout=3 renews every second
+    assert store.extensions == [job_id]
+    assert store.jobs[job_id]["status"] == "completed"
+
+
+def test_heartbeat_stops_once_the_lease_is_lost(store, queue):
+    queue.job_handlers[JOB_TYPE_INGEST] = lambda job: time.sleep(2.5)
+    store.lose_lease = True
+    job_id = store.enqueue_job(JOB_TYPE_INGEST, 7)
+
+    queue._run_leased_job(lease(store), "worker-1")
+
+    assert store.extensions == [job_id]
+
+
+def test_worker_threads_run_enqueued_jobs(store, queue):
+    done = threading.Event()
+    queue.job_handlers[JOB_TYPE_INGEST] = lambda job: done.set()
+    queue.start()
+
+    job_id = queue.add_job(7)
+
+    assert done.wait(5)
+    deadline = time.monotonic() + 5
+    while store.jobs[job_id]["status"] != "completed" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.jobs[job_id]["status"] == "completed"
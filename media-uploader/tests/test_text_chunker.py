@@ -0,0 +1,113 @@
+"""
+Unit tests for the token-based text chunker.
+
+A whitespace tokenizer stands in for tiktoken, so one word is one token and
+the expected chunks can be worked out by hand.
+"""
+
+import pytest
+
+import text_chunker
+from text_chunker import Tokenizer, chunk_budget, chunk_text
+
+
+class WordTokenizer(Tokenizer):
+    def __init__(self, scale: float = 1.0):
+        self.model = None
+        self.scale = scale
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    word_tokenizer = WordTokenizer()
+    monkeypatch.setattr(text_chunker, "get_tokenizer", lambda model=None: word_tokenizer)
+    return word_tokenizer
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def chunk_tokens(tokenizer: Tokenizer, chunk: str) -> int:
+    return tokenizer.count(chunk)
+
+
+def test_short_text_is_one_chunk(tokenizer):
+    assert chunk_text("One short paragraph.", max_tokens=10, overlap_tokens=0) == ["One short paragraph."]
+
+
+def test_paragraphs_are_packed_up_to_the_limit(tokenizer):
+    a, b, c = words("a", 4), words("b", 4), words("c", 4)
+
+    # 4 + 1 separator + 4 fills a 9-token chunk exactly
+    chunks = chunk_text(f"{a}\n\n{b}\n\n{c}", max_tokens=9, overlap_tokens=0)
+
+    assert chunks == [f"{a}\n\n{b}", c]
+
+
+def test_oversized_paragraph_is_split_at_sentences(tokenizer):
+    sentences = [f"{words(name, 3)}." for name in ("a", "b", "c", "d")]
+
+    chunks = chunk_text(" ".join(sentences), max_tokens=8, overlap_tokens=0)
+
+    assert chunks == [f"{sentences[0]} {sentences[1]}", f"{sentences[2]} {sentences[3]}"]
+
+
+def test_overlap_repeats_whole_trailing_units(tokenizer):
+    a, b, c = words("a", 4), words("b", 2), words("c", 4)
+
+    chunks = chunk_text(f"{a}\n\n{b}\n\n{c}", max_tokens=8, overlap_tokens=3)
+
+    # b (2 tokens + separator) fits the overlap and starts the second chunk; a does not
+    assert chunks == [f"{a}\n\n{b}", f"{b}\n\n{c}"]
+
+
+def test_oversized_sentence_is_cut_into_token_windows(tokenizer):
+    sentence = words("w", 25)
+
+    chunks = chunk_text(sentence, max_tokens=10, overlap_tokens=0)
+
+    assert [chunk_tokens(tokenizer, chunk) for chunk in chunks] == [10, 10, 5]
+    assert " ".join(chunks) == sentence
+
+
+def test_scaled_counts_keep_chunks_within_the_limit(monkeypatch):
+    scaled = WordTokenizer(scale=2.0)
+    monkeypatch.setattr(text_chunker, "get_tokenizer", lambda model=None: scaled)
+
+    chunks = chunk_text(words("w", 12) + "\n\n" + words("x", 3), max_tokens=10, overlap_tokens=0)
+
+    assert all(chunk_tokens(scaled, chunk) <= 10 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == words("w", 12) + " " + words("x", 3)
+
+
+def test_chunks_never_exceed_the_limit(tokenizer):
+    paragraphs = [f"{words('s', 7)}. {words('t', 2)}." for _ in range(6)] + [words("long", 30)]
+
+    for chunk in chunk_text("\n\n".join(paragraphs), max_tokens=12, overlap_tokens=4):
+        assert chunk_tokens(tokenizer, chunk) <= 12
+
+
+def test_chunk_budget_leaves_room_for_prompt_output_and_reserve(tokenizer):
+    prompt = words("p", 10)
+
+    assert chunk_budget(prompt, 20, context_tokens=100, reserve_tokens=5, min_chunk_tokens=1) == 65
+
+
+def test_chunk_budget_counts_the_prompt_with_the_scale(monkeypatch):
+    monkeypatch.setattr(text_chunker, "get_tokenizer", lambda model=None: WordTokenizer(scale=1.5))
+
+    assert chunk_budget(words("p", 10), 20, context_tokens=100, reserve_tokens=5, min_chunk_tokens=1) == 60
+
+
+def test_chunk_budget_raises_when_the_chunk_would_not_fit(tokenizer):
+    prompt = words("p", 50)
+
+    with pytest.raises(ValueError):
+        chunk_budget(prompt, 40, context_tokens=100, reserve_tokens=5, min_chunk_tokens=10)
@@ -0,0 +1,172 @@
+"""
+Unit tests for windowed transcription and transcript packing.
+
+Windows use a sample rate of 1, so sample offsets read as seconds, and a
+whitespace tokenizer stands in for tiktoken when packing segments.
+"""
+
+import pytest
+
+import text_chunker
+from text_chunker import Tokenizer
+from video_processor_v2 import VideoProcessorV2
+
+WINDOWS = [(0, 40), (30, 70), (60, 100)]
+
+
+class WordTokenizer(Tokenizer):
+    def __init__(self):
+        self.model = None
+        self.scale = 1.0
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def tokenizer(monkeypatch):
+    monkeypatch.setattr(text_chunker, "get_tokenizer", lambda model=None: WordTokenizer())
+
+
+def segment(start, end, *words):
+    """A Whisper segment with one word every second from start, relative to its window."""
+    return {
+        "start": start,
+        "end": end,
+        "text": " ".join(words),
+        "words": [
+            {"word": f" {word}", "start": start + i, "end": start + i + 0.5, "probability": 0.9}
+            for i, word in enumerate(words)
+        ],
+    }
+
+
+def texts(segments):
+    return [segment["text"] for segment in segments]
+
+
+def stitch(segments, index):
+    return VideoProcessorV2.stitch_window_segments(segments, WINDOWS, index, 1)
+
+
+# Windows
+
+def test_windows_overlap_and_end_with_the_audio():
+    assert VideoProcessorV2.audio_windows(100, 1, window_seconds=40, overlap_seconds=10) == WINDOWS
+
+
+def test_last_window_is_cut_short():
+    assert VideoProcessorV2.audio_windows(80, 1, window_seconds=40, overlap_seconds=10) == [(0, 40), (30, 70), (60, 80)]
+
+
+def test_short_audio_is_one_window():
+    assert VideoProcessorV2.audio_windows(16000 * 30, 16000, window_seconds=300, overlap_seconds=5) == [(0, 16000 * 30)]
+
+
+def test_empty_audio_has_no_windows():
+    assert VideoProcessorV2.audio_windows(0, 16000) == []
+
+
+def test_window_must_be_longer_than_its_overlap():
+    with pytest.raises(ValueError):
+        VideoProcessorV2.audio_windows(100, 1, window_seconds=10, overlap_seconds=10)
+
+
+# Stitching
+
+def test_words_in_the_overlap_come_from_one_window_only():
+    # Both windows heard "edge words" between 33s and 37s; the split is at 35s
+    first = stitch([segment(31, 38, "before", "the", "edge", "x", "words", "after")], 0)
+    second = stitch([segment(1, 8, "before", "the", "edge", "x", "words", "after")], 1)
+
+    assert texts(first) == ["before the edge x"]
+    assert texts(second) == ["words after"]
+    assert [word["start"] for word in first[0]["words"] + second[0]["words"]] == [31, 32, 33, 34, 35, 36]
+
+
+def test_stitched_segments_use_absolute_time():
+    [stitched] = stitch([segment(10, 13, "a", "b", "c")], 1)
+
+    assert (stitched["start"], stitched["end"]) == (40, 42.5)
+    assert stitched["words"][0] == {"word": " a", "start": 40, "end": 40.5, "probability": 0.9}
+
+
+def test_segments_entirely_in_a_neighbours_half_are_dropped():
+    assert stitch([segment(0, 3, "mine", "not")], 1) == []
+    assert stitch([segment(36, 39, "theirs")], 0) == []
+
+
+def test_edges_of_the_first_and_last_window_are_kept():
+    assert texts(stitch([segment(0, 2, "opening")], 0)) == ["opening"]
+    assert texts(stitch([segment(38, 40, "closing")], 2)) == ["closing"]
+
+
+def test_segments_without_words_are_kept_by_their_midpoint():
+    # Window 0 owns up to 35s and window 1 starts at 30s
+    from_first = [{"start": 30, "end": 34, "text": " kept "}, {"start": 33, "end": 39, "text": " dropped "}]
+    from_second = [{"start": 0, "end": 4, "text": " dropped "}, {"start": 4, "end": 8, "text": " kept "}]
+
+    assert texts(stitch(from_first, 0)) == ["kept"]
+    assert texts(stitch(from_second, 1)) == ["kept"]
+    assert stitch(from_second, 1)[0]["words"] == []
+
+
+def test_stitched_windows_form_one_transcript_without_duplicates():
+    heard = [
+        [segment(0, 5, "one", "two", "three"), segment(32, 38, "four", "five", "six", "seven")],
+        [segment(2, 8, "four", "five", "six", "seven"), segment(32, 38, "eight", "nine", "ten", "eleven")],
+        [segment(2, 8, "eight", "nine", "ten", "eleven"), segment(20, 22, "end")],
+    ]
+
+    stitched = [seg for index, segments in enumerate(heard) for seg in stitch(segments, index)]
+    words = [word["word"].strip() for seg in stitched for word in seg["words"]]
+
+    assert words == ["one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "end"]
+    starts = [word["start"] for seg in stitched for word in seg["words"]]
+    assert starts == sorted(starts)
+
+
+# Packing
+
+def test_segments_are_packed_up_to_the_limit():
+    segments = [{"text": "a b c"}, {"text": "d e f"}, {"text": "g h i"}]
+
+    # Each segment counts 3 tokens plus one for the joining space
+    chunks, leftover = VideoProcessorV2.pack_segments(segments, max_tokens=8)
+
+    assert chunks == [segments[:2]]
+    assert leftover == segments[2:]
+
+
+def test_segment_that_would_overflow_starts_a_new_chunk():
+    segments = [{"text": "a b c"}, {"text": "d e f"}, {"text": "g h i"}]
+
+    chunks, leftover = VideoProcessorV2.pack_segments(segments, max_tokens=7)
+
+    assert chunks == [segments[:1], segments[1:2]]
+    assert leftover == segments[2:]
+
+
+def test_flush_packs_the_leftover():
+    segments = [{"text": "a b c"}, {"text": "d e f"}, {"text": "g h i"}]
+
+    chunks, leftover = VideoProcessorV2.pack_segments(segments, max_tokens=8, flush=True)
+
+    assert chunks == [segments[:2], segments[2:]]
+    assert leftover == []
+
+
+def test_oversized_segment_is_a_chunk_of_its_own():
+    segments = [{"text": "a"}, {"text": "b c d e f g h i j k"}, {"text": "l"}]
+
+    chunks, leftover = VideoProcessorV2.pack_segments(segments, max_tokens=5, flush=True)
+
+    assert chunks == [segments[:1], segments[1:2], segments[2:]]
+    assert leftover == []
+
+
+def test_packing_nothing_gives_nothing():
+    assert VideoProcessorV2.pack_segments([], max_tokens=5, flush=True) == ([], [])
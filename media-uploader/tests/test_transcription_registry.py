@@ -0,0 +1,132 @@
+"""
+Unit tests for the Whisper model registry.
+
+whisper.load_model is replaced with a fake whose models weigh 1 MB per
+"parameter", so the memory budget can be reasoned about in whole models.
+"""
+
+import threading
+import time
+
+import pytest
+import torch
+
+import transcription_service
+from transcription_service import WhisperModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, name, size_mb):
+        self.name = name
+        self.weights = torch.zeros(size_mb * MB, dtype=torch.uint8)
+
+    def parameters(self):
+        return [self.weights]
+
+    def buffers(self):
+        return []
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    loaded = []
+
+    def load_model(name, device=None):
+        loaded.append(name)
+        if name == "broken":
+            raise RuntimeError("no such model")
+        time.sleep(0.05)
+        return FakeModel(name, 1)
+
+    monkeypatch.setattr(transcription_service.whisper, "load_model", load_model)
+    return loaded
+
+
+def make_registry(budget_mb=2):
+    return WhisperModelRegistry(memory_budget_mb=budget_mb, device="cpu")
+
+
+def test_idle_models_are_evicted_least_recently_used(loads):
+    registry = make_registry()
+    for name in ("tiny", "base", "tiny", "small"):
+        with registry.use(name):
+            pass
+
+    assert list(registry.stats()["models"]) == ["tiny", "small"]
+
+
+def test_models_in_use_are_not_evicted(loads):
+    registry = make_registry()
+    with registry.use("tiny") as (tiny, _):
+        with registry.use("base"):
+            pass
+        with registry.use("small"):
+            # Only base was idle, so tiny survives even though it is least recently used
+            assert list(registry.stats()["models"]) == ["tiny", "small"]
+            assert registry.stats()["in_use"] == {"tiny": 1, "small": 1}
+
+        with registry.use("tiny") as (again, _):
+            assert again is tiny
+    assert loads == ["tiny", "base", "small"]
+
+
+def test_loading_over_budget_keeps_models_in_use(loads):
+    registry = make_registry(budget_mb=1)
+    with registry.use("tiny"), registry.use("base"):
+        assert list(registry.stats()["models"]) == ["tiny", "base"]
+
+    with registry.use("small"):
+        pass
+    assert list(registry.stats()["models"]) == ["small"]
+
+
+def test_concurrent_callers_share_one_load(loads):
+    registry = make_registry()
+    models = []
+
+    def worker():
+        with registry.use("base") as (model, _):
+            models.append(model)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["base"]
+    assert all(model is models[0] for model in models)
+    assert registry._loading == set()
+
+
+def test_failed_load_is_retried_by_the_next_caller(loads):
+    registry = make_registry()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with registry.use("broken"):
+                pass
+
+    assert loads == ["broken", "broken"]
+    assert registry._loading == set()
+    assert registry.stats()["models"] == {}
+
+
+def test_acquire_loads_another_replica_when_the_first_is_busy(loads):
+    registry = make_registry(budget_mb=4)
+    with registry.acquire("base", max_replicas=2) as first:
+        with registry.acquire("base", max_replicas=2) as second:
+            assert second is not first
+            assert registry.stats()["in_use"] == {"base": 1, "base#1": 1}
+
+    assert registry.stats()["in_use"] == {}
+
+
+def test_clear_keeps_models_in_use(loads):
+    registry = make_registry()
+    with registry.use("tiny"):
+        with registry.use("base"):
+            pass
+        registry.clear()
+        assert list(registry.stats()["models"]) == ["tiny"]
@@ -0,0 +1,215 @@
+import logging
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Context window of the chaptering/generation models (see llm-service/gateway/config/models.json)
+CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "4096"))
+# Default chunk size leaves room in the context for the prompt and the generated output
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "2000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "100"))
+# Optional Hugging Face tokenizer to count with instead of tiktoken, e.g. for local Llama models
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER")
+# Models unknown to tiktoken are counted with o200k_base, which yields fewer tokens than
+# their own tokenizers (about 1.3x more for 32k-vocabulary Llama/Mistral models); counts
+# are scaled by this factor so chunks still fit their context
+CHUNK_TOKEN_MARGIN = float(os.getenv("CHUNK_TOKEN_MARGIN", "1.4"))
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+class Tokenizer:
+    """
+    Counts, encodes and decodes tokens for one model.
+
+    scale is 1 when counting with the model's own tokenizer, and
+    CHUNK_TOKEN_MARGIN when standing in with o200k_base for a model tiktoken
+    does not know. count() includes the scale; encode() and decode() do not.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        self.scale = 1.0
+        self._hf = None
+        self._encoding = None
+
+        if CHUNK_TOKENIZER:
+            from transformers import AutoTokenizer
+            self._hf = AutoTokenizer.from_pretrained(CHUNK_TOKENIZER)
+            return
+
+        import tiktoken
+        if model is None:
+            self._encoding = tiktoken.get_encoding("o200k_base")
+            return
+        try:
+            self._encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Local and open models are not known to tiktoken
+            logger.info(f"No tokenizer for {model}; counting with o200k_base x {CHUNK_TOKEN_MARGIN}")
+            self._encoding = tiktoken.get_encoding("o200k_base")
+            self.scale = CHUNK_TOKEN_MARGIN
+
+    def encode(self, text: str) -> List[int]:
+        if self._hf is not None:
+            return self._hf.encode(text, add_special_tokens=False)
+        return self._encoding.encode(text, disallowed_special=())
+
+    def decode(self, tokens: List[int]) -> str:
+        if self._hf is not None:
+            return self._hf.decode(tokens)
+        return self._encoding.decode(tokens)
+
+    def scaled(self, encoded_tokens: int) -> int:
+        """The count for a number of encoded tokens."""
+        return math.ceil(encoded_tokens * self.scale)
+
+    def count(self, text: str) -> int:
+        return self.scaled(len(self.encode(text)))
+
+
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Get the process-wide tokenizer for a model, loading it on first use."""
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(model)
+        if tokenizer is None:
+            tokenizer = Tokenizer(model)
+            _tokenizers[model] = tokenizer
+        return tokenizer
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens in text."""
+    return get_tokenizer(model).count(text)
+
+
+def chunk_budget(
+    prompt: str,
+    max_output_tokens: int,
+    model: Optional[str] = None,
+    context_tokens: int = CONTEXT_TOKENS,
+    reserve_tokens: int = 200,
+    min_chunk_tokens: int = CHUNK_TOKENS // 4,
+) -> int:
+    """
+    Largest chunk that fits in the context next to a prompt and the output.
+
+    reserve_tokens covers per-chunk additions such as continuity notes and
+    chat formatting.
+
+    Raises:
+        ValueError: If less than min_chunk_tokens are left for the chunk; the
+            prompt or max_output_tokens must shrink first
+    """
+    budget = context_tokens - count_tokens(prompt, model) - max_output_tokens - reserve_tokens
+    if budget < min_chunk_tokens:
+        raise ValueError(
+            f"Only {budget} of {context_tokens} context tokens are left for text after the prompt, "
+            f"{max_output_tokens} output and {reserve_tokens} reserved tokens (need {min_chunk_tokens})"
+        )
+    return budget
+
+
+@dataclass
+class _Unit:
+    text: str
+    tokens: int
+    separator: str
+
+
+def _split_units(text: str, max_tokens: int, tokenizer: Tokenizer) -> List[_Unit]:
+    """Split text into paragraphs, breaking oversized paragraphs into sentences and oversized sentences into token windows."""
+    units: List[_Unit] = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = tokenizer.count(paragraph)
+        if tokens <= max_tokens:
+            units.append(_Unit(paragraph, tokens, "\n\n"))
+            continue
+
+        separator = "\n\n"
+        # Encoded tokens per window, so each window counts at most max_tokens
+        window_size = max(1, int(max_tokens / tokenizer.scale))
+        for sentence in SENTENCE_BREAK.split(paragraph):
+            ids = tokenizer.encode(sentence)
+            if tokenizer.scaled(len(ids)) <= max_tokens:
+                units.append(_Unit(sentence, tokenizer.scaled(len(ids)), separator))
+            else:
+                for start in range(0, len(ids), window_size):
+                    window = ids[start:start + window_size]
+                    units.append(_Unit(tokenizer.decode(window), tokenizer.scaled(len(window)), separator))
+            separator = " "
+    return units
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: Optional[str] = None,
+) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens tokens.
+
+    Chunks break at paragraph boundaries where possible, then at sentence
+    boundaries; only a single sentence longer than a chunk is cut mid-sentence.
+    Each chunk after the first repeats the last whole paragraphs or sentences of
+    the previous one, up to overlap_tokens, so context carries across the cut.
+
+    Args:
+        text: Text to split
+        max_tokens: Token limit per chunk
+        overlap_tokens: Tokens of trailing context repeated at the start of the next chunk
+        model: Model whose tokenizer to count with
+
+    Returns:
+        List[str]: The chunks, in order
+    """
+    tokenizer = get_tokenizer(model)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    chunks: List[str] = []
+    current: List[_Unit] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        chunks.append("".join(
+            unit.text if i == 0 else unit.separator + unit.text for i, unit in enumerate(current)
+        ))
+
+    for unit in _split_units(text, max_tokens, tokenizer):
+        # Separators count as one token each
+        if current and current_tokens + 1 + unit.tokens > max_tokens:
+            flush()
+            overlap: List[_Unit] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                if overlap_size + previous.tokens + 1 > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous.tokens + 1
+            # The repeated context must leave room for the unit that opened the new chunk
+            while overlap and overlap_size + unit.tokens > max_tokens:
+                overlap_size -= overlap.pop(0).tokens + 1
+            current, current_tokens = overlap, overlap_size
+
+        current_tokens += unit.tokens + (1 if current else 0)
+        current.append(unit)
+
+    if current:
+        flush()
+    return chunks
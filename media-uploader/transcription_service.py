@@ -0,0 +1,275 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Set, Tuple, Union, Iterator
+
+import numpy as np
+import torch
+import whisper
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Audio accepted by the service: a media file path or 16 kHz mono float32 samples
+AudioInput = Union[str, np.ndarray]
+
+
+@dataclass
+class ResidentModel:
+    """A loaded Whisper model with its inference lock and the number of callers using it."""
+    model: Any
+    size: int
+    inference_lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+
+
+class WhisperModelRegistry:
+    """
+    Per-process cache of loaded Whisper models.
+
+    Models stay resident between jobs and are evicted least-recently-used once
+    their combined parameter memory exceeds the configured budget; models that
+    callers are still using are never evicted. Whisper models install decoding
+    hooks on themselves, so each model also carries a lock that callers must
+    hold while running inference.
+    """
+
+    def __init__(self, memory_budget_mb: Optional[int] = None, device: Optional[str] = None):
+        """Initialize the registry."""
+        self.memory_budget_bytes = (memory_budget_mb or int(os.getenv("WHISPER_MODEL_MEMORY_MB", "4096"))) * 1024 * 1024
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self._models: "OrderedDict[str, ResidentModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Keys being loaded right now; callers for the same key wait on _loaded
+        self._loading: Set[str] = set()
+        self._loaded = threading.Condition(self._lock)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _model_size(model: Any) -> int:
+        """Approximate resident size of a model from its parameters and buffers."""
+        size = sum(p.numel() * p.element_size() for p in model.parameters())
+        size += sum(b.numel() * b.element_size() for b in model.buffers())
+        return size
+
+    def _evict(self, incoming_size: int) -> None:
+        """Evict least-recently-used idle models until incoming_size fits the budget. Caller holds _lock."""
+        used = sum(entry.size for entry in self._models.values())
+        for name in list(self._models):
+            if used + incoming_size <= self.memory_budget_bytes:
+                break
+            entry = self._models[name]
+            if entry.users:
+                continue
+            del self._models[name]
+            used -= entry.size
+            logger.info(f"Evicting Whisper model {name} ({entry.size / 1024 / 1024:.0f} MB)")
+        if used + incoming_size > self.memory_budget_bytes:
+            logger.warning(
+                f"Whisper models in use exceed the memory budget "
+                f"({(used + incoming_size) / 1024 / 1024:.0f} MB of {self.memory_budget_bytes / 1024 / 1024:.0f} MB)"
+            )
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+
+    def _checkout(self, key: str, model_name: str) -> ResidentModel:
+        """Get a resident model and count the caller as a user, loading it on first use."""
+        with self._loaded:
+            while True:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry.users += 1
+                    self.hits += 1
+                    return entry
+                if key not in self._loading:
+                    self._loading.add(key)
+                    break
+                self._loaded.wait()
+
+        # Load outside the registry lock; concurrent callers for the same model wait above
+        try:
+            logger.info(f"Loading Whisper model: {key} on {self.device}")
+            model = whisper.load_model(model_name, device=self.device)
+            entry = ResidentModel(model, self._model_size(model), users=1)
+            with self._lock:
+                self.misses += 1
+                self._evict(entry.size)
+                self._models[key] = entry
+            return entry
+        finally:
+            with self._loaded:
+                self._loading.discard(key)
+                self._loaded.notify_all()
+
+    def _release(self, entry: ResidentModel) -> None:
+        """Stop counting a caller as a user of a model, making it evictable once idle."""
+        with self._lock:
+            entry.users -= 1
+
+    @contextmanager
+    def use(self, model_name: str, replica: int = 0) -> Iterator[Tuple[Any, threading.Lock]]:
+        """
+        Keep a model replica resident while it is in use.
+
+        Yields the model and its inference lock, loading the model on first use.
+        """
+        key = model_name if replica == 0 else f"{model_name}#{replica}"
+        entry = self._checkout(key, model_name)
+        try:
+            yield entry.model, entry.inference_lock
+        finally:
+            self._release(entry)
+
+    @contextmanager
+    def acquire(self, model_name: str, max_replicas: int = 1) -> Iterator[Any]:
+        """
+        Hold exclusive use of a model for inference.
+
+        Takes the first idle replica, loading another one (up to max_replicas)
+        when all loaded replicas are busy, so concurrent callers can run in parallel.
+        """
+        for replica in range(max_replicas):
+            with self.use(model_name, replica) as (model, inference_lock):
+                if inference_lock.acquire(blocking=False):
+                    try:
+                        yield model
+                    finally:
+                        inference_lock.release()
+                    return
+
+        # Every replica is busy; wait for the primary one
+        with self.use(model_name) as (model, inference_lock):
+            with inference_lock:
+                yield model
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            return {
+                "device": self.device,
+                "models": {key: entry.size for key, entry in self._models.items()},
+                "in_use": {key: entry.users for key, entry in self._models.items() if entry.users},
+                "memory_used_bytes": sum(entry.size for entry in self._models.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def clear(self) -> None:
+        """Drop all idle cached models."""
+        with self._lock:
+            for key in [key for key, entry in self._models.items() if not entry.users]:
+                del self._models[key]
+
+
+class TranscriptionService:
+    """Transcribes audio with resident Whisper models, batching short segments."""
+
+    # Whisper decodes fixed 30-second windows; shorter segments can share a batch
+    BATCH_WINDOW_SECONDS = 30
+
+    def __init__(self, registry: Optional[WhisperModelRegistry] = None, batch_size: Optional[int] = None):
+        """Initialize the transcription service."""
+        self.registry = registry or WhisperModelRegistry()
+        self.batch_size = batch_size or int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+
+    @property
+    def fp16(self) -> bool:
+        return self.registry.device == "cuda"
+
+    def transcribe(
+        self,
+        audio: AudioInput,
+        model_name: str = "base",
+        max_replicas: int = 1,
+        **options: Any,
+    ) -> Dict[str, Any]:
+        """
+        Transcribe a single audio input of any length.
+
+        Args:
+            audio: Path to a media file or 16 kHz mono float32 samples
+            model_name: Whisper model size (tiny, base, small, medium, large)
+            max_replicas: Model replicas concurrent callers may spread over
+            **options: Extra options passed to model.transcribe
+
+        Returns:
+            Dict: Whisper transcription result with text and segments
+        """
+        options.setdefault("fp16", self.fp16)
+        with self.registry.acquire(model_name, max_replicas) as model:
+            return model.transcribe(audio, **options)
+
+    def transcribe_batch(
+        self,
+        segments: List[AudioInput],
+        model_name: str = "base",
+        language: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Transcribe many audio segments, decoding those up to 30 seconds long in batches.
+
+        Args:
+            segments: Media file paths or 16 kHz mono float32 sample arrays
+            model_name: Whisper model size
+            language: Optional language code; detected per segment when omitted
+
+        Returns:
+            List[str]: Transcribed text for each segment, in input order
+        """
+        # Hold the model for the whole batch so it cannot be evicted mid-way
+        with self.registry.use(model_name) as (model, inference_lock):
+            n_mels = getattr(model.dims, "n_mels", 80)
+            window_samples = self.BATCH_WINDOW_SECONDS * whisper.audio.SAMPLE_RATE
+
+            texts: List[Optional[str]] = [None] * len(segments)
+            short_segments: List[Tuple[int, np.ndarray]] = []
+            long_segments: List[Tuple[int, np.ndarray]] = []
+
+            for index, segment in enumerate(segments):
+                samples = whisper.load_audio(segment) if isinstance(segment, str) else segment
+                if len(samples) <= window_samples:
+                    short_segments.append((index, samples))
+                else:
+                    long_segments.append((index, samples))
+
+            decode_options = whisper.DecodingOptions(language=language, fp16=self.fp16)
+
+            with inference_lock:
+                for start in range(0, len(short_segments), self.batch_size):
+                    batch = short_segments[start:start + self.batch_size]
+                    mels = torch.stack([
+                        whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), n_mels=n_mels)
+                        for _, samples in batch
+                    ]).to(model.device)
+                    results = whisper.decode(model, mels, decode_options)
+                    for (index, _), result in zip(batch, results):
+                        texts[index] = result.text.strip()
+
+                # Segments longer than one window need Whisper's sliding-window transcription
+                for index, samples in long_segments:
+                    result = model.transcribe(samples, language=language, fp16=self.fp16)
+                    texts[index] = result["text"].strip()
+
+        logger.info(f"Transcribed {len(segments)} segments ({len(short_segments)} batched) with {model_name}")
+        return texts
+
+
+# Process-wide transcription service; each ingestion worker process keeps its own models
+_transcription_service: Optional[TranscriptionService] = None
+_transcription_service_lock = threading.Lock()
+
+
+def get_transcription_service() -> TranscriptionService:
+    """Get the process-wide TranscriptionService."""
+    global _transcription_service
+    with _transcription_service_lock:
+        if _transcription_service is None:
+            _transcription_service = TranscriptionService()
+        return _transcription_service
@@ -6,8 +6,9 @@ import json
 from typing import Dict, Tuple, List, Any, Optional
 from datetime import datetime
 
-import torch
 import whisper
+from transcription_service import get_transcription_service
+import text_chunker
 from openai import OpenAI
 
 # Configure logging
@@ -39,14 +40,6 @@ class VideoProcessor:
         Returns:
             str: Transcribed text
         """
-        # Check CUDA availability
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device for transcription: {device}")
-        
-        # Load Whisper model
-        logger.info(f"Loading Whisper model: {model_name}")
-        model = whisper.load_model(model_name)
-        
         # Save video data to temporary file
         with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
             temp_file.write(video_data)
@@ -55,7 +48,7 @@ class VideoProcessor:
         try:
             # Transcribe video
             logger.info(f"Transcribing video")
-            result = model.transcribe(temp_file_path)
+            result = get_transcription_service().transcribe(temp_file_path, model_name)
             return result["text"]
         finally:
             # Clean up temporary file
@@ -63,27 +56,9 @@ class VideoProcessor:
                 os.remove(temp_file_path)
     
     @staticmethod
-    def chunk_text(text: str, max_chunk_size: int = 12000) -> List[str]:
-        """Split text into chunks of specified size."""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        
-        current_size = 0
-        for word in words:
-            word_size = len(word) + 1  # +1 for space
-            if current_size + word_size > max_chunk_size:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_size = word_size
-            else:
-                current_chunk.append(word)
-                current_size += word_size
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
-        return chunks
+    def chunk_text(text: str, max_tokens: int = text_chunker.CHUNK_TOKENS, model: Optional[str] = None) -> List[str]:
+        """Split text into chunks of at most max_tokens tokens."""
+        return text_chunker.chunk_text(text, max_tokens=max_tokens, model=model)
     
     @staticmethod
     def generate_structured_content(
@@ -105,7 +80,7 @@ class VideoProcessor:
         client = OpenAI(api_key=api_key)
         
         # Split transcription into manageable chunks
-        chunks = VideoProcessor.chunk_text(transcription)
+        chunks = VideoProcessor.chunk_text(transcription, model=model_name)
         logger.info(f"Split transcription into {len(chunks)} chunks")
         
         # Process each chunk
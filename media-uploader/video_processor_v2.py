@@ -3,14 +3,16 @@ import os
 import time
 import tempfile
 import json
-from typing import Dict, Tuple, List, Any, Optional
+from typing import Dict, Tuple, List, Any, Optional, Union, Iterator
 from datetime import datetime
 from dataclasses import dataclass, field
 from pydantic import BaseModel
 
 # ML dependencies
-import torch
+import numpy as np
 import whisper
+from transcription_service import get_transcription_service
+import text_chunker
 from openai import OpenAI
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
@@ -48,6 +50,143 @@ class StructuredCourseContent(BaseModel):
     difficulty_level: str
 
 
+@dataclass
+class MediaProbe:
+    """
+    A media file written to disk once, together with its container-level probe.
+
+    The same file is shared by transcription, subtitle extraction and chaptering
+    so the upload is never rewritten or fully decoded just to read metadata.
+    """
+    path: str
+    owns_file: bool = True
+    duration: float = 0.0
+    format_name: str = ""
+    streams: List[Dict[str, Any]] = field(default_factory=list)
+    audio_path: Optional[str] = None
+    owns_audio: bool = False
+
+    @classmethod
+    def from_bytes(cls, data: bytes, suffix: str = ".mp4") -> "MediaProbe":
+        """Write media bytes to a temporary file and probe it."""
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            temp_file.write(data)
+            temp_file_path = temp_file.name
+        return cls.from_path(temp_file_path, owns_file=True)
+
+    @classmethod
+    def from_storage(cls, object_name: str, suffix: str = ".mp4") -> "MediaProbe":
+        """Stream an object from storage to a temporary file and probe it."""
+        from storage import storage
+
+        fd, temp_file_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        if not storage.download_to_file(object_name, temp_file_path):
+            os.remove(temp_file_path)
+            raise ValueError(f"Could not download file: {object_name}")
+        return cls.from_path(temp_file_path, owns_file=True)
+
+    @classmethod
+    def from_path(cls, path: str, owns_file: bool = False) -> "MediaProbe":
+        """Probe an existing media file."""
+        media = cls(path=path, owns_file=owns_file)
+        media.probe()
+        return media
+
+    def probe(self) -> None:
+        """Read duration and stream layout from the container with ffprobe."""
+        cmd = [
+            "ffprobe", "-v", "error", "-show_format", "-show_streams",
+            "-of", "json", self.path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, check=True, timeout=60)
+            info = json.loads(result.stdout or b"{}")
+        except (OSError, subprocess.SubprocessError, json.JSONDecodeError) as e:
+            logger.warning(f"ffprobe failed for {self.path}, reading ffmpeg header instead: {e}")
+            self.duration = self._duration_from_ffmpeg_header(self.path)
+            return
+
+        self.streams = info.get("streams", [])
+        container = info.get("format", {})
+        self.format_name = container.get("format_name", "")
+        self.duration = float(container.get("duration") or 0.0)
+        if not self.duration:
+            stream_durations = [float(s["duration"]) for s in self.streams if s.get("duration")]
+            self.duration = max(stream_durations, default=0.0)
+
+    @staticmethod
+    def _duration_from_ffmpeg_header(path: str) -> float:
+        """Parse Duration from the header ffmpeg prints when given no output (no decoding)."""
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-i", path], stderr=subprocess.PIPE, check=False)
+        duration_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})", result.stderr.decode(errors="ignore"))
+        if duration_match:
+            hours, minutes, seconds, centiseconds = map(int, duration_match.groups())
+            return hours * 3600 + minutes * 60 + seconds + centiseconds / 100
+        return 0.0
+
+    def _streams_of_type(self, codec_type: str) -> List[Dict[str, Any]]:
+        return [s for s in self.streams if s.get("codec_type") == codec_type]
+
+    @property
+    def audio_streams(self) -> List[Dict[str, Any]]:
+        return self._streams_of_type("audio")
+
+    @property
+    def subtitle_streams(self) -> List[Dict[str, Any]]:
+        return self._streams_of_type("subtitle")
+
+    @property
+    def is_probed(self) -> bool:
+        """Whether stream information is available (ffprobe succeeded)."""
+        return bool(self.streams)
+
+    def extract_audio(self, sample_rate: int = whisper.audio.SAMPLE_RATE) -> np.ndarray:
+        """
+        Decode the first audio track once to mono 16-bit PCM on disk.
+
+        Returns the samples memory-mapped from that file, so windows can be read
+        without holding the whole track in memory.
+        """
+        if self.audio_path is None:
+            fd, audio_path = tempfile.mkstemp(suffix=".pcm")
+            os.close(fd)
+            cmd = [
+                "ffmpeg", "-nostdin", "-y", "-v", "error", "-i", self.path,
+                "-vn", "-map", "0:a:0", "-ac", "1", "-ar", str(sample_rate),
+                "-f", "s16le", audio_path
+            ]
+            try:
+                subprocess.run(cmd, check=True, capture_output=True)
+            except subprocess.CalledProcessError as e:
+                os.remove(audio_path)
+                logger.error(f"Error extracting audio from {self.path}: {e.stderr.decode(errors='ignore')}")
+                raise
+            self.audio_path = audio_path
+            self.owns_audio = True
+
+        if os.path.getsize(self.audio_path) == 0:
+            return np.zeros(0, dtype=np.int16)
+        return np.memmap(self.audio_path, dtype=np.int16, mode="r")
+
+    def cleanup(self) -> None:
+        """Remove the file and extracted audio if this probe created them."""
+        if self.owns_audio and self.audio_path and os.path.exists(self.audio_path):
+            os.remove(self.audio_path)
+        if self.owns_file and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self) -> "MediaProbe":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.cleanup()
+
+
+# Video input accepted by VideoProcessorV2: raw bytes or an already-probed file
+VideoInput = Union[bytes, MediaProbe]
+
+
 class VideoProcessorV2:
     """Enhanced processor for video files that transcribes and generates structured content."""
 
@@ -62,98 +201,244 @@ class VideoProcessorV2:
     DEFAULT_BATCH_SIZE = 3
     DEFAULT_MAX_WORKERS = 4
 
+    # Streaming transcription settings
+    TRANSCRIBE_WINDOW_SECONDS = int(os.getenv("TRANSCRIBE_WINDOW_SECONDS", "300"))
+    TRANSCRIBE_OVERLAP_SECONDS = int(os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "5"))
+    TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "2"))
+
+    # Transcript tokens per chaptering chunk
+    MAX_CHUNK_TOKENS = int(os.getenv("TRANSCRIPT_CHUNK_TOKENS", str(text_chunker.CHUNK_TOKENS)))
+
+    @staticmethod
+    def open_media(video_data: VideoInput) -> MediaProbe:
+        """
+        Get a probed media file for the input.
+
+        Bytes are written to a temporary file that the returned probe owns; an
+        existing probe is returned as a non-owning view so callers can use
+        ``with`` without deleting a file shared with other steps.
+        """
+        if isinstance(video_data, MediaProbe):
+            return MediaProbe(
+                path=video_data.path,
+                owns_file=False,
+                duration=video_data.duration,
+                format_name=video_data.format_name,
+                streams=video_data.streams,
+                audio_path=video_data.audio_path,
+            )
+        return MediaProbe.from_bytes(video_data)
+
     @staticmethod
     def transcribe_video(
-        video_data: bytes, model_name: str = DEFAULT_WHISPER_MODEL
+        video_data: VideoInput, model_name: str = DEFAULT_WHISPER_MODEL
     ) -> str:
         """
         Transcribe video using OpenAI Whisper model.
 
         Args:
-            video_data: Binary video data
+            video_data: Binary video data or a probed media file
             model_name: Whisper model size (tiny, base, small, medium, large)
 
         Returns:
             str: Transcribed text
         """
-        # Check CUDA availability
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device for transcription: {device}")
+        segments = VideoProcessorV2.transcribe_video_segments(video_data, model_name)
+        return " ".join(segment["text"] for segment in segments)
+
+    @staticmethod
+    def transcribe_video_segments(
+        video_data: VideoInput, model_name: str = DEFAULT_WHISPER_MODEL
+    ) -> List[Dict[str, Any]]:
+        """
+        Transcribe video into timed segments with word-level timestamps.
 
-        # Load Whisper model
-        logger.info(f"Loading Whisper model: {model_name}")
-        model = whisper.load_model(model_name)
+        Args:
+            video_data: Binary video data or a probed media file
+            model_name: Whisper model size (tiny, base, small, medium, large)
 
-        # Save video data to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            temp_file.write(video_data)
-            temp_file_path = temp_file.name
+        Returns:
+            List[Dict[str, Any]]: Segments with start, end, text and words
+        """
+        segments = []
+        for window_segments in VideoProcessorV2.stream_transcription(video_data, model_name):
+            segments.extend(window_segments)
+        return segments
 
-        try:
-            # Transcribe video
-            logger.info(f"Transcribing video")
-            result = model.transcribe(temp_file_path)
-            return result["text"]
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+    @staticmethod
+    def audio_windows(
+        num_samples: int,
+        sample_rate: int,
+        window_seconds: int = TRANSCRIBE_WINDOW_SECONDS,
+        overlap_seconds: int = TRANSCRIBE_OVERLAP_SECONDS,
+    ) -> List[Tuple[int, int]]:
+        """
+        Split an audio track into overlapping windows.
+
+        Returns:
+            List[Tuple[int, int]]: (start, end) sample offsets of each window
+        """
+        window = int(window_seconds * sample_rate)
+        step = window - int(overlap_seconds * sample_rate)
+        if window <= 0 or step <= 0:
+            raise ValueError("Transcription window must be longer than its overlap")
+
+        windows = []
+        start = 0
+        while start < num_samples:
+            end = min(start + window, num_samples)
+            windows.append((start, end))
+            if end == num_samples:
+                break
+            start += step
+        return windows
 
     @staticmethod
-    def chunk_text(text: str, max_chunk_size: int = 12000) -> List[str]:
+    def stitch_window_segments(
+        segments: List[Dict[str, Any]],
+        windows: List[Tuple[int, int]],
+        index: int,
+        sample_rate: int,
+    ) -> List[Dict[str, Any]]:
         """
-        Split text into chunks of specified size, trying to maintain semantic boundaries.
+        Shift a window's segments to absolute time and drop the overlap it shares with its neighbours.
+
+        Each window owns the audio up to the middle of its overlaps, so words near a
+        window edge (where Whisper has the least context) come from the neighbour.
+        Segments are trimmed word by word; segments without word timings are kept
+        when their midpoint falls inside the owned range.
         """
-        # First attempt to split by paragraphs
-        paragraphs = text.split("\n\n")
-
-        # If paragraphs are too large, split by sentences
-        if any(len(p) > max_chunk_size for p in paragraphs):
-            import re
-
-            # Split by sentences (simple heuristic)
-            sentences = re.split(r"(?<=[.!?])\s+", text)
-
-            chunks = []
-            current_chunk = []
-            current_size = 0
-
-            for sentence in sentences:
-                sentence_size = len(sentence) + 1  # +1 for space
-                if current_size + sentence_size > max_chunk_size:
-                    chunks.append(" ".join(current_chunk))
-                    current_chunk = [sentence]
-                    current_size = sentence_size
-                else:
-                    current_chunk.append(sentence)
-                    current_size += sentence_size
+        start, end = windows[index]
+        offset = start / sample_rate
+        own_start = 0.0 if index == 0 else (start + windows[index - 1][1]) / 2 / sample_rate
+        own_end = float("inf") if index == len(windows) - 1 else (windows[index + 1][0] + end) / 2 / sample_rate
+
+        stitched = []
+        for segment in segments:
+            words = [
+                {
+                    "word": word["word"],
+                    "start": word["start"] + offset,
+                    "end": word["end"] + offset,
+                    "probability": word.get("probability"),
+                }
+                for word in segment.get("words") or []
+            ]
 
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-        else:
-            # Use paragraphs as chunks, combining small ones
-            chunks = []
-            current_chunk = []
-            current_size = 0
-
-            for paragraph in paragraphs:
-                paragraph_size = len(paragraph) + 2  # +2 for newlines
-                if current_size + paragraph_size > max_chunk_size:
-                    chunks.append("\n\n".join(current_chunk))
-                    current_chunk = [paragraph]
-                    current_size = paragraph_size
-                else:
-                    current_chunk.append(paragraph)
-                    current_size += paragraph_size
+            if words:
+                words = [word for word in words if own_start <= word["start"] < own_end]
+                if not words:
+                    continue
+                segment_start, segment_end = words[0]["start"], words[-1]["end"]
+                text = "".join(word["word"] for word in words).strip()
+            else:
+                segment_start, segment_end = segment["start"] + offset, segment["end"] + offset
+                if not own_start <= (segment_start + segment_end) / 2 < own_end:
+                    continue
+                text = segment["text"].strip()
+
+            if text:
+                stitched.append({"start": segment_start, "end": segment_end, "text": text, "words": words})
+        return stitched
+
+    @staticmethod
+    def stream_transcription(
+        video_data: VideoInput,
+        model_name: str = DEFAULT_WHISPER_MODEL,
+        window_seconds: int = TRANSCRIBE_WINDOW_SECONDS,
+        overlap_seconds: int = TRANSCRIBE_OVERLAP_SECONDS,
+        workers: int = TRANSCRIBE_WORKERS,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Transcribe a video window by window.
+
+        The audio track is decoded once to mono 16 kHz, split into overlapping
+        windows and transcribed by parallel workers. Stitched segments are yielded
+        per window in playback order as soon as that window is done, so callers can
+        start on the transcript before the whole video has been transcribed.
+
+        Args:
+            video_data: Binary video data or a probed media file
+            model_name: Whisper model size (tiny, base, small, medium, large)
+            window_seconds: Length of each transcription window
+            overlap_seconds: Audio shared by consecutive windows
+            workers: Windows transcribed concurrently
+
+        Yields:
+            List[Dict[str, Any]]: Segments with absolute start, end, text and words
+        """
+        with VideoProcessorV2.open_media(video_data) as media:
+            if media.is_probed and not media.audio_streams:
+                logger.warning(f"No audio stream found in {media.path}, skipping transcription")
+                return
 
-            if current_chunk:
-                chunks.append("\n\n".join(current_chunk))
+            sample_rate = whisper.audio.SAMPLE_RATE
+            samples = media.extract_audio(sample_rate)
+            windows = VideoProcessorV2.audio_windows(len(samples), sample_rate, window_seconds, overlap_seconds)
+            logger.info(f"Transcribing {len(samples) / sample_rate:.0f}s of audio in {len(windows)} windows")
 
-        return chunks
+            service = get_transcription_service()
+
+            def transcribe_window(start: int, end: int) -> Dict[str, Any]:
+                audio = np.asarray(samples[start:end], dtype=np.float32) / 32768.0
+                return service.transcribe(audio, model_name, max_replicas=workers, word_timestamps=True)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(transcribe_window, start, end) for start, end in windows]
+                try:
+                    for index, future in enumerate(futures):
+                        result = future.result()
+                        yield VideoProcessorV2.stitch_window_segments(
+                            result.get("segments", []), windows, index, sample_rate
+                        )
+                        logger.info(f"Transcribed window {index + 1}/{len(windows)}")
+                finally:
+                    for future in futures:
+                        future.cancel()
+
+    @staticmethod
+    def pack_segments(
+        segments: List[Dict[str, Any]],
+        max_tokens: int = MAX_CHUNK_TOKENS,
+        flush: bool = False,
+        model: Optional[str] = None,
+    ) -> Tuple[List[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Pack consecutive transcript segments into chunks of at most max_tokens tokens.
+
+        Returns:
+            Tuple of the full chunks and the leftover segments that do not fill a
+            chunk yet; with flush the leftover is packed as a final chunk.
+        """
+        tokenizer = text_chunker.get_tokenizer(model)
+        chunks = []
+        current = []
+        current_tokens = 0
+        for segment in segments:
+            segment_tokens = tokenizer.count(segment["text"]) + 1  # +1 for the joining space
+            if current and current_tokens + segment_tokens > max_tokens:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(segment)
+            current_tokens += segment_tokens
+
+        if flush and current:
+            chunks.append(current)
+            current = []
+        return chunks, current
+
+    @staticmethod
+    def chunk_text(text: str, max_tokens: int = MAX_CHUNK_TOKENS, model: Optional[str] = None) -> List[str]:
+        """
+        Split text into chunks of at most max_tokens tokens, keeping paragraph
+        and sentence boundaries and overlapping consecutive chunks slightly.
+        """
+        return text_chunker.chunk_text(text, max_tokens=max_tokens, model=model)
 
     @staticmethod
     def process_chunk_with_structured_output(
-        chunk: str, chunk_index: int, total_chunks: int, client: OpenAI, model_name: str
+        chunk: str, chunk_index: int, total_chunks: Optional[int], client: OpenAI, model_name: str
     ) -> Dict:
         """
         Process a single chunk with structured output.
@@ -161,7 +446,7 @@ class VideoProcessorV2:
         Args:
             chunk: Text chunk to process
             chunk_index: Index of the current chunk
-            total_chunks: Total number of chunks
+            total_chunks: Total number of chunks, or None while the transcript is still streaming
             client: OpenAI client
             model_name: OpenAI model to use
 
@@ -236,6 +521,7 @@ class VideoProcessorV2:
             },
         }
 
+        position = f"part {chunk_index+1} of {total_chunks}" if total_chunks else f"part {chunk_index+1} of a longer transcript"
         prompt = f"""
         Transform this lecture transcript into a structured course chapter, adding 20% new insights or examples.
         
@@ -249,7 +535,7 @@ class VideoProcessorV2:
         2. Preserve all original content and examples
         3. Add approximately 20% new insights, examples, or clarifications
         4. Include all numerical examples and data points from the original
-        5. This is part {chunk_index+1} of {total_chunks}, ensure your section flows with others
+        5. This is {position}, ensure your section flows with others
         
         Structure the content with proper headings, key points, and examples. Be thorough and educational.
         """
@@ -666,24 +952,27 @@ class VideoProcessorV2:
         return "\n".join(markdown)
 
     @staticmethod
-    def extract_timestamps_from_subtitles(video_data: bytes) -> List[Dict[str, Any]]:
+    def extract_timestamps_from_subtitles(video_data: VideoInput) -> List[Dict[str, Any]]:
         """
         Extract subtitle data from video file.
         
         Args:
-            video_data: Binary video data
+            video_data: Binary video data or a probed media file
             
         Returns:
             List[Dict[str, Any]]: List of subtitle entries with start time, end time and text
         """
-        # Save video data to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            temp_file.write(video_data)
-            temp_file_path = temp_file.name
+        media = VideoProcessorV2.open_media(video_data)
+        temp_file_path = media.path
             
         subtitle_entries = []
         
         try:
+            # Skip the ffmpeg run entirely when the probe found no subtitle track
+            if media.is_probed and not media.subtitle_streams:
+                logger.info("No subtitle streams found in video")
+                return []
+
             # Create a temporary file for the subtitles
             with tempfile.NamedTemporaryFile(suffix=".vtt", delete=False) as subtitle_file:
                 subtitle_path = subtitle_file.name
@@ -728,8 +1017,7 @@ class VideoProcessorV2:
                 
         finally:
             # Clean up temporary files
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            media.cleanup()
             if 'subtitle_path' in locals() and os.path.exists(subtitle_path):
                 os.remove(subtitle_path)
                 
@@ -834,48 +1122,76 @@ class VideoProcessorV2:
         return chapters
 
     @staticmethod
-    def get_video_duration(video_data: bytes) -> float:
+    def assign_timestamps_from_chunks(
+        chapters: List[Dict],
+        course_structure: Dict,
+        video_duration: float
+    ) -> List[Dict]:
+        """
+        Assign chapter boundaries from the transcript time span of each chunk.
+
+        Chapters take the span of the transcript chunk they were generated from;
+        sections split their chapter's span in proportion to their content length.
+        Walks the structure in the same order as create_chapters_from_structure.
+
+        Args:
+            chapters: List of chapter entries
+            course_structure: Course structure whose chapters carry timestamp_start/timestamp_end
+            video_duration: Total duration of the video in seconds
+
+        Returns:
+            List[Dict]: Updated chapters with timestamps
+        """
+        if not chapters:
+            return chapters
+
+        chapters[0]["timestamp_start"] = 0.0
+        chapters[0]["timestamp_end"] = video_duration
+
+        chapter_data_list = course_structure.get("chapters", [])
+        position = 1
+        for i, chapter_data in enumerate(chapter_data_list):
+            # Close gaps between chunks so the chapters cover the whole video
+            start = 0.0 if i == 0 else chapter_data["timestamp_start"]
+            end = video_duration if i == len(chapter_data_list) - 1 else chapter_data_list[i + 1]["timestamp_start"]
+            end = max(start, end)
+
+            chapter = chapters[position]
+            chapter["timestamp_start"] = start
+            chapter["timestamp_end"] = end
+            position += 1
+
+            sections = chapters[position:position + len(chapter_data.get("sections", []))]
+            total_size = sum(max(len(section["chapter"]), 1) for section in sections)
+            section_start = start
+            for section in sections:
+                section_end = section_start + (end - start) * max(len(section["chapter"]), 1) / total_size
+                section["timestamp_start"] = section_start
+                section["timestamp_end"] = section_end
+                section_start = section_end
+            if sections:
+                sections[-1]["timestamp_end"] = end
+            position += len(sections)
+
+        return chapters
+
+    @staticmethod
+    def get_video_duration(video_data: VideoInput) -> float:
         """
-        Get the duration of a video in seconds.
+        Get the duration of a video in seconds from its container metadata.
         
         Args:
-            video_data: Binary video data
+            video_data: Binary video data or a probed media file
             
         Returns:
             float: Duration in seconds
         """
-        # Save video data to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            temp_file.write(video_data)
-            temp_file_path = temp_file.name
-            
-        try:
-            # Use ffmpeg to get video duration
-            cmd = [
-                "ffmpeg", "-i", temp_file_path, 
-                "-f", "null", "-"
-            ]
-            
-            result = subprocess.run(cmd, stderr=subprocess.PIPE, check=False)
-            stderr_output = result.stderr.decode()
-            
-            # Extract duration using regex
-            duration_match = re.search(r"Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})", stderr_output)
-            if duration_match:
-                hours, minutes, seconds, centiseconds = map(int, duration_match.groups())
-                duration = hours * 3600 + minutes * 60 + seconds + centiseconds / 100
-                return duration
-                
-            return 0.0  # Default if duration cannot be determined
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+        with VideoProcessorV2.open_media(video_data) as media:
+            return media.duration
 
     @staticmethod
     def process_video_to_chapters(
-        video_data: bytes,
+        video_data: VideoInput,
         knowledge_id: int,
         knowledge_name: str,
         whisper_model: str = DEFAULT_WHISPER_MODEL,
@@ -891,27 +1207,58 @@ class VideoProcessorV2:
         # Initialize OpenAI client
         client = OpenAI(api_key=openai_api_key)
 
-        # Step 1: Transcribe video
-        transcription = VideoProcessorV2.transcribe_video(video_data, whisper_model)
-        
-        # Step 1.5: Extract subtitles and timestamps
-        subtitle_entries = VideoProcessorV2.extract_timestamps_from_subtitles(video_data)
-        video_duration = VideoProcessorV2.get_video_duration(video_data)
-        
-        logger.info(f"Extracted {len(subtitle_entries)} subtitle entries")
-        logger.info(f"Video duration: {video_duration} seconds")
+        transcript_segments: List[Dict[str, Any]] = []
+        chunk_spans: List[Tuple[float, float]] = []
+        subtitle_entries: List[Dict[str, Any]] = []
+
+        # Write and probe the video once; every media step below shares the file
+        with VideoProcessorV2.open_media(video_data) as media:
+            video_duration = media.duration
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = []
+
+                def submit_chunks(segment_chunks: List[List[Dict[str, Any]]]) -> None:
+                    for segment_chunk in segment_chunks:
+                        chunk_spans.append((segment_chunk[0]["start"], segment_chunk[-1]["end"]))
+                        futures.append(executor.submit(
+                            VideoProcessorV2.process_chunk_with_structured_output,
+                            " ".join(segment["text"] for segment in segment_chunk),
+                            len(futures),
+                            None,
+                            client,
+                            openai_model,
+                        ))
+
+                # Steps 1-2: Transcribe window by window, chaptering each full chunk
+                # while later windows are still being transcribed
+                pending: List[Dict[str, Any]] = []
+                for window_segments in VideoProcessorV2.stream_transcription(media, whisper_model):
+                    transcript_segments.extend(window_segments)
+                    segment_chunks, pending = VideoProcessorV2.pack_segments(
+                        pending + window_segments, model=openai_model
+                    )
+                    submit_chunks(segment_chunks)
 
-        # Step 2: Split transcription into chunks
-        chunks = VideoProcessorV2.chunk_text(transcription)
+                segment_chunks, _ = VideoProcessorV2.pack_segments(pending, flush=True, model=openai_model)
+                submit_chunks(segment_chunks)
+                logger.info(f"Transcribed {len(transcript_segments)} segments into {len(futures)} chunks")
 
-        # Step 3: Process chunks in batches
-        chunk_results = VideoProcessorV2.process_chunks_in_batches(
-            chunks=chunks,
-            api_key=openai_api_key,
-            model_name=openai_model,
-            batch_size=batch_size,
-            max_workers=max_workers,
-        )
+                # Step 3: Collect chunk results in transcript order
+                chunk_results = [future.result() for future in futures]
+
+            # Subtitles are only needed when there is no timed transcript to place chapters with
+            if not transcript_segments:
+                subtitle_entries = VideoProcessorV2.extract_timestamps_from_subtitles(media)
+
+        transcription = " ".join(segment["text"] for segment in transcript_segments)
+        logger.info(f"Video duration: {video_duration} seconds")
+
+        # Replace the model's timestamp guesses with the real span of each chunk
+        for chunk_result, (span_start, span_end) in zip(chunk_results, chunk_spans):
+            chunk_result["total_chunks"] = len(chunk_results)
+            chunk_result["timestamp_start"] = span_start
+            chunk_result["timestamp_end"] = span_end
 
         # Step 4: Merge chunks into course structure
         course_structure = VideoProcessorV2.merge_structured_chunks(
@@ -926,6 +1273,10 @@ class VideoProcessorV2:
             "markdown": "",
             "metadata": {
                 "transcription": transcription,
+                "transcript_segments": [
+                    {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                    for segment in transcript_segments
+                ],
                 "video_duration": video_duration,
                 "processed_at": datetime.utcnow().isoformat()
             }
@@ -937,7 +1288,13 @@ class VideoProcessorV2:
         )
         
         # Step 6: Assign timestamps to chapters
-        if subtitle_entries and video_duration > 0:
+        if chunk_results and video_duration > 0:
+            chapters = VideoProcessorV2.assign_timestamps_from_chunks(
+                chapters=chapters,
+                course_structure=course_structure,
+                video_duration=video_duration
+            )
+        elif subtitle_entries and video_duration > 0:
             chapters = VideoProcessorV2.assign_timestamps_to_chapters(
                 chapters=chapters,
                 subtitle_entries=subtitle_entries,